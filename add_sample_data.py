@@ -98,5 +98,12 @@ with app.app_context():
     db.session.commit()
     print(f"Added {orders_created} sample orders")
 
+    # Sample orders bypass checkout, so rebuild the sales rollups
+    from app.analytics.rollups import rebuild_sales_daily
+    from app.analytics.product_sales import rebuild_product_sales
+    rebuild_sales_daily()
+    rebuild_product_sales()
+    db.session.commit()
+
     print("Sample data added successfully!")
     print("You can now view the dashboard with real data.")
\ No newline at end of file
@@ -17,6 +17,21 @@ def create_app(config_class=Config):
     login_manager.init_app(app)
     csrf.init_app(app)
 
+    from .utils.cache import report_cache
+    report_cache.init_app(app)
+
+    from .utils.cart_store import cart_store
+    cart_store.init_app(app)
+
+    from .utils.reservations import hold_sweeper
+    hold_sweeper.init_app(app)
+
+    from .utils.search import product_search
+    product_search.init_app(app)
+
+    from .utils.catalog_cache import catalog_cache
+    catalog_cache.init_app(app)
+
     # Configure login manager
     login_manager.login_view = 'auth.login'
     login_manager.login_message = 'Please log in to access this page.'
@@ -51,7 +66,17 @@ def create_app(config_class=Config):
     app.register_blueprint(orders_bp, url_prefix='/orders')
 
     # Add CLI commands
-    from .utils.cli import create_admin_command
+    from .utils.cli import (create_admin_command, rebuild_sales_daily_command,
+                            rebuild_product_sales_command, rebuild_categories_command,
+                            create_backup_command, restore_backup_command,
+                            import_products_command, expire_holds_command)
     app.cli.add_command(create_admin_command)
+    app.cli.add_command(rebuild_sales_daily_command)
+    app.cli.add_command(rebuild_product_sales_command)
+    app.cli.add_command(rebuild_categories_command)
+    app.cli.add_command(create_backup_command)
+    app.cli.add_command(restore_backup_command)
+    app.cli.add_command(import_products_command)
+    app.cli.add_command(expire_holds_command)
 
     return app
\ No newline at end of file
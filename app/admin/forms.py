@@ -8,10 +8,18 @@ class ProductForm(FlaskForm):
     name = StringField('Product Name',
                       validators=[DataRequired(), Length(min=1, max=100)],
                       render_kw={"placeholder": "Enter product name"})
+    sku = StringField('SKU',
+                     validators=[Optional(), Length(max=64)],
+                     filters=[lambda value: value.strip() if value else value],
+                     render_kw={"placeholder": "Optional"})
     price = DecimalField('Price',
                         validators=[DataRequired(), NumberRange(min=0.01)],
                         places=2,
                         render_kw={"placeholder": "0.00", "step": "0.01"})
+    cost_price = DecimalField('Cost Price',
+                             validators=[Optional(), NumberRange(min=0)],
+                             places=2,
+                             render_kw={"placeholder": "Optional", "step": "0.01"})
     stock_qty = IntegerField('Stock Quantity',
                            validators=[DataRequired(), NumberRange(min=0)],
                            render_kw={"placeholder": "0"})
@@ -33,6 +41,17 @@ class ProductForm(FlaskForm):
                      validators=[FileAllowed(['jpg', 'jpeg', 'png', 'gif'], 'Images only!')])
     submit = SubmitField('Save Product')
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        obj = kwargs.get('obj')
+        self._product_id = obj.id if obj is not None else None
+
+    def validate_sku(self, sku):
+        from ..models import Product
+        product = Product.query.filter_by(sku=sku.data).first()
+        if product and product.id != self._product_id:
+            raise ValidationError(f'SKU is already used by "{product.name}".')
+
 
 class EmployeeForm(FlaskForm):
     username = StringField('Username',
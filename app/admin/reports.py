@@ -0,0 +1,202 @@
+from datetime import datetime, timedelta
+from sqlalchemy import func, desc
+from ..models import db, Category, Product, Order, User
+from ..utils.cache import report_cache, rows_to_dicts
+from ..analytics.rollups import (sales_totals, sales_by_payment_method, sales_by_employee,
+                                 last_n_days)
+from ..analytics.timeseries import sales_series
+from ..analytics.kpi import dashboard_kpis, product_kpis
+from ..analytics.product_sales import top_selling_products, sales_by_category
+
+# Aggregates behind the admin report pages. Each function returns plain data
+# (dicts/numbers) so results can be cached and shared between admins; the
+# ``today`` argument is part of the cache key so periods roll over at midnight.
+
+SALES_TABLES = ('orders', 'order_items', 'sales_daily', 'product_sales_daily', 'users')
+
+
+@report_cache.cached('products', 'categories', *SALES_TABLES)
+def dashboard_metrics(today):
+    """Counters, period sales and top-N widgets for the admin dashboard."""
+    # Header counters: one conditional-aggregation query per table
+    kpis = dashboard_kpis(today)
+
+    # Top selling products and sales by category (last 30 days, per-product rollup)
+    last_30_days = last_n_days(30, today)
+    top_products = top_selling_products(*last_30_days, limit=10)
+    category_sales = sales_by_category(*last_30_days)
+
+    # Top employees by sales (last 30 days)
+    top_employees = sales_by_employee(*last_30_days, limit=5)
+
+    return {
+        **kpis,
+        'top_products': rows_to_dicts(top_products),
+        'category_sales': rows_to_dicts(category_sales),
+        'top_employees': rows_to_dicts(top_employees)
+    }
+
+
+@report_cache.cached('products', 'categories', *SALES_TABLES)
+def analytics_data(today):
+    """Sales, product, category and employee performance for the analytics page."""
+    # Sales and order analytics (calendar days, from the daily rollup)
+    orders_7d, sales_7d = sales_totals(*last_n_days(7, today))
+    orders_30d, sales_30d = sales_totals(*last_n_days(30, today))
+    orders_90d, sales_90d = sales_totals(*last_n_days(90, today))
+
+    # Product and category performance (per-product rollup)
+    last_30_days = last_n_days(30, today)
+    top_products_30d = top_selling_products(*last_30_days, order_by='total_revenue', limit=20)
+    category_performance = sales_by_category(*last_30_days)
+
+    # Employee performance
+    employee_performance = sales_by_employee(*last_30_days)
+
+    # Daily sales trend (last 30 days)
+    daily_sales = [
+        {'date': point['bucket'].strftime('%Y-%m-%d'), 'sales': point['sales']}
+        for point in sales_series('day', *last_n_days(30, today))
+    ]
+
+    return {
+        'sales_7d': sales_7d,
+        'sales_30d': sales_30d,
+        'sales_90d': sales_90d,
+        'orders_7d': orders_7d,
+        'orders_30d': orders_30d,
+        'orders_90d': orders_90d,
+        'top_products': rows_to_dicts(top_products_30d),
+        'category_performance': rows_to_dicts(category_performance),
+        'employee_performance': rows_to_dicts(employee_performance),
+        'daily_sales': daily_sales
+    }
+
+
+@report_cache.cached('products', 'categories')
+def inventory_data():
+    """Stock levels, inventory value and category breakdown for the inventory report."""
+    # Inventory summary and value in one pass over products
+    kpis = product_kpis()
+
+    # Products by category, from the totals maintained on the categories table
+    category_inventory = db.session.query(
+        Category.name.label('category'),
+        Category.product_count,
+        Category.stock_units.label('total_stock'),
+        Category.stock_value.label('inventory_value')
+    ).filter(Category.product_count > 0).order_by(Category.stock_value.desc()).all()
+
+    product_columns = (Product.id, Product.name, Product.category, Product.price, Product.stock_qty)
+
+    # Low stock products (detailed)
+    low_stock_products = db.session.query(*product_columns)\
+                                   .filter(Product.stock_qty <= 10)\
+                                   .order_by(Product.stock_qty).all()
+
+    # Top value products
+    top_value_products = db.session.query(*product_columns)\
+                                   .order_by(desc(Product.price * Product.stock_qty))\
+                                   .limit(20).all()
+
+    return {
+        'total_products': kpis['total_products'],
+        'in_stock': kpis['in_stock'],
+        'low_stock': kpis['low_stock'],
+        'out_of_stock': kpis['out_of_stock'],
+        'inventory_value': kpis['inventory_value'],
+        'category_inventory': rows_to_dicts(category_inventory),
+        'low_stock_products': rows_to_dicts(low_stock_products),
+        'top_value_products': rows_to_dicts(top_value_products)
+    }
+
+
+@report_cache.cached(*SALES_TABLES)
+def sales_report_data(today):
+    """Period totals, payment breakdown, hourly pattern and top sellers for the sales report."""
+    tomorrow = today + timedelta(days=1)
+    yesterday = today - timedelta(days=1)
+    this_week = today - timedelta(days=today.weekday())
+    this_month = today.replace(day=1)
+
+    # Sales and order statistics by period (from the daily rollup)
+    today_orders, today_sales = sales_totals(today, tomorrow)
+    _, yesterday_sales = sales_totals(yesterday, today)
+    week_orders, week_sales = sales_totals(this_week, tomorrow)
+    month_orders, month_sales = sales_totals(this_month, tomorrow)
+
+    # Payment method breakdown
+    payment_methods = sales_by_payment_method()
+
+    # Hourly sales pattern (today)
+    hourly_sales = [
+        {'hour': point['bucket'].hour, 'sales': point['sales']}
+        for point in sales_series('hour', today, tomorrow)
+    ]
+
+    # Top customers (by order frequency)
+    top_customers = sales_by_employee(order_by='order_count', limit=10)
+
+    return {
+        'today_sales': today_sales,
+        'yesterday_sales': yesterday_sales,
+        'week_sales': week_sales,
+        'month_sales': month_sales,
+        'today_orders': today_orders,
+        'week_orders': week_orders,
+        'month_orders': month_orders,
+        'payment_methods': rows_to_dicts(payment_methods),
+        'hourly_sales': hourly_sales,
+        'top_customers': rows_to_dicts(top_customers)
+    }
+
+
+@report_cache.cached('orders', 'users')
+def customer_data(today):
+    """Spending, lifetime value and segments per employee account."""
+    thirty_days_ago = datetime.utcnow() - timedelta(days=30)
+
+    # Top customers by spending
+    top_customers_by_spending = db.session.query(
+        User.username,
+        func.count(Order.id).label('order_count'),
+        func.sum(Order.total_amount).label('total_spent'),
+        func.avg(Order.total_amount).label('avg_order_value'),
+        func.max(Order.created_at).label('last_order_date')
+    ).join(Order).filter(
+        Order.created_at >= thirty_days_ago,
+        User.role == 'employee'
+    ).group_by(User.id, User.username).order_by(
+        desc('total_spent')
+    ).limit(20).all()
+
+    # Customer lifetime value
+    customer_lifetime_value = rows_to_dicts(db.session.query(
+        User.username,
+        func.sum(Order.total_amount).label('lifetime_value'),
+        func.count(Order.id).label('total_orders'),
+        func.min(Order.created_at).label('first_order'),
+        func.max(Order.created_at).label('last_order')
+    ).join(Order).filter(User.role == 'employee').group_by(User.id, User.username).order_by(
+        desc('lifetime_value')
+    ).all())
+
+    # Customer retention (active in last 30 days)
+    active_customers = db.session.query(User.id, User.username).filter(
+        User.role == 'employee',
+        User.id.in_(
+            db.session.query(Order.employee_id).filter(
+                Order.created_at >= thirty_days_ago
+            ).distinct()
+        )
+    ).all()
+
+    # Customer segments
+    return {
+        'top_customers': rows_to_dicts(top_customers_by_spending),
+        'customer_lifetime': customer_lifetime_value,
+        'active_customers': rows_to_dicts(active_customers),
+        'vip_customers': [c for c in customer_lifetime_value if c['lifetime_value'] >= 1000],
+        'regular_customers': [c for c in customer_lifetime_value if 500 <= c['lifetime_value'] < 1000],
+        'new_customers': [c for c in customer_lifetime_value if c['lifetime_value'] < 500]
+    }
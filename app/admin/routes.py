@@ -1,11 +1,23 @@
 from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
 from flask_login import login_required, current_user
-from sqlalchemy import func, desc, and_, or_
+from sqlalchemy import func, desc, and_
 from datetime import datetime, timedelta
 from ..models import db
 from .forms import ProductForm, EmployeeForm
+from .reports import (dashboard_metrics, analytics_data, inventory_data, sales_report_data,
+                      customer_data)
 from ..utils.decorators import admin_required
 from ..utils.cloudinary_upload import upload_image, delete_image
+from ..utils.cache import report_cache
+from ..utils.catalog_cache import catalog_cache
+from ..utils.search import product_search
+from ..utils.categories import category_names
+from ..utils.pagination import paginate_listing
+from ..utils.helpers import order_item_counts
+from ..analytics.rollups import last_n_days, day_bounds
+from ..analytics.timeseries import BUCKETS, sales_series, bucket_label
+from ..analytics.profit import profit_by_period, profit_series
+from ..analytics.product_sales import top_selling_products, recent_units_sold
 from config import Config
 
 admin_bp = Blueprint('admin', __name__)
@@ -15,59 +27,10 @@ admin_bp = Blueprint('admin', __name__)
 @admin_required
 def dashboard():
     """Admin dashboard with key metrics and recent data."""
-    from ..models import Product, Order, OrderItem, User  # Import inside function
-
-    # Key metrics
-    total_products = Product.query.count()
-    total_employees = User.query.filter_by(role='employee').count()
-    total_orders = Order.query.count()
-    low_stock_count = Product.query.filter(Product.stock_qty <= 10).count()
-
-    # Today's sales
-    today = datetime.utcnow().date()
-    today_orders = Order.query.filter(func.date(Order.created_at) == today).all()
-    today_sales = float(sum(order.total_amount for order in today_orders))
-    today_order_count = len(today_orders)
-
-    # This month's sales
-    month_start = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    month_orders = Order.query.filter(Order.created_at >= month_start).all()
-    month_sales = float(sum(order.total_amount for order in month_orders))
-    month_order_count = len(month_orders)
-
-    # This week's sales
-    week_start = datetime.utcnow() - timedelta(days=datetime.utcnow().weekday())
-    week_start = week_start.replace(hour=0, minute=0, second=0, microsecond=0)
-    week_orders = Order.query.filter(Order.created_at >= week_start).all()
-    week_sales = float(sum(order.total_amount for order in week_orders))
-
-    # Yesterday's sales for comparison
-    yesterday = today - timedelta(days=1)
-    yesterday_orders = Order.query.filter(func.date(Order.created_at) == yesterday).all()
-    yesterday_sales = float(sum(order.total_amount for order in yesterday_orders))
-
-    # Top selling products (last 30 days)
-    thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-    top_products = db.session.query(
-        Product.name,
-        func.sum(OrderItem.quantity).label('total_quantity'),
-        func.sum(OrderItem.line_total).label('total_revenue')
-    ).join(OrderItem).join(Order).filter(
-        Order.created_at >= thirty_days_ago
-    ).group_by(Product.id, Product.name).order_by(
-        desc('total_quantity')
-    ).limit(10).all()
-
-    # Sales by category (last 30 days)
-    category_sales = db.session.query(
-        Product.category,
-        func.sum(OrderItem.line_total).label('total_sales'),
-        func.sum(OrderItem.quantity).label('total_quantity')
-    ).join(OrderItem).join(Order).filter(
-        Order.created_at >= thirty_days_ago
-    ).group_by(Product.category).order_by(
-        desc('total_sales')
-    ).all()
+    from ..models import Product, Order  # Import inside function
+
+    # Aggregates are shared between admins through the report cache
+    metrics = dashboard_metrics(datetime.utcnow().date())
 
     # Recent orders (last 10)
     recent_orders = Order.query.order_by(desc(Order.created_at)).limit(10).all()
@@ -76,70 +39,25 @@ def dashboard():
     low_stock_products = Product.query.filter(Product.stock_qty <= 10)\
                                     .order_by(Product.stock_qty).limit(10).all()
 
-    # Out of stock products
-    out_of_stock = Product.query.filter(Product.stock_qty == 0).count()
-
-    # Top employees by sales (last 30 days)
-    top_employees = db.session.query(
-        User.username,
-        func.count(Order.id).label('order_count'),
-        func.sum(Order.total_amount).label('total_sales')
-    ).join(Order).filter(
-        Order.created_at >= thirty_days_ago,
-        User.role == 'employee'
-    ).group_by(User.id, User.username).order_by(
-        desc('total_sales')
-    ).limit(5).all()
-
-    # Inventory value calculation
-    inventory_value = float(db.session.query(func.sum(Product.price * Product.stock_qty)).scalar() or 0)
-
-    # Average order value
-    avg_order_value = float(db.session.query(func.avg(Order.total_amount)).scalar() or 0)
-
     return render_template('admin/dashboard.html',
                          title='Admin Dashboard',
-                         total_products=total_products,
-                         total_employees=total_employees,
-                         total_orders=total_orders,
-                         low_stock_count=low_stock_count,
-                         out_of_stock=out_of_stock,
-                         today_sales=today_sales,
-                         today_order_count=today_order_count,
-                         yesterday_sales=yesterday_sales,
-                         week_sales=week_sales,
-                         month_sales=month_sales,
-                         month_order_count=month_order_count,
-                         top_products=top_products,
-                         category_sales=category_sales,
-                         top_employees=top_employees,
-                         inventory_value=inventory_value,
-                         avg_order_value=avg_order_value,
                          recent_orders=recent_orders,
-                         low_stock_products=low_stock_products)
+                         low_stock_products=low_stock_products,
+                         **metrics)
+
 
 
 @admin_bp.route('/api/sales')
 @admin_required
 def sales_api():
     """API endpoint for sales data (used by dashboard charts)."""
-    from ..models import Order  # Import inside function
     days = int(request.args.get('days', 7))
+    bucket = request.args.get('bucket', 'day')
+    if bucket not in BUCKETS:
+        return jsonify({'error': f'Invalid bucket. Allowed: {", ".join(BUCKETS)}'}), 400
 
-    # Get sales data for the last N days
-    end_date = datetime.utcnow()
-    start_date = end_date - timedelta(days=days)
-
-    sales_data = db.session.query(
-        func.date(Order.created_at).label('date'),
-        func.sum(Order.total_amount).label('total')
-    ).filter(
-        Order.created_at >= start_date
-    ).group_by(
-        func.date(Order.created_at)
-    ).order_by(
-        func.date(Order.created_at)
-    ).all()
+    # Gap-filled sales for the last N days in one grouped query
+    sales_data = sales_series(bucket, *last_n_days(days))
 
     # Convert to dict format for Chart.js
     data = {
@@ -147,9 +65,9 @@ def sales_api():
         'data': []
     }
 
-    for row in sales_data:
-        data['labels'].append(row.date.strftime('%Y-%m-%d'))
-        data['data'].append(float(row.total))
+    for point in sales_data:
+        data['labels'].append(bucket_label(bucket, point['bucket']))
+        data['data'].append(point['sales'])
 
     return jsonify(data)
 
@@ -166,29 +84,24 @@ def products():
 
     query = Product.query
 
-    if search:
-        query = query.filter(
-            or_(Product.name.ilike(f'%{search}%'),
-                Product.category.ilike(f'%{search}%'))
-        )
-
     if category:
         query = query.filter(Product.category == category)
 
-    products = query.order_by(Product.name)\
-                   .paginate(page=page, per_page=Config.ITEMS_PER_PAGE, error_out=False)
+    if search:
+        products = product_search.paginate(query, search, page, Config.ITEMS_PER_PAGE, category=category)
+    else:
+        products = paginate_listing(query, (Product.name, Product.id), total_key=('admin.products', category))
 
-    categories = db.session.query(Product.category)\
-                         .distinct()\
-                         .order_by(Product.category)\
-                         .all()
+    # Units sold in the last 7 days for the whole page in one query
+    units_sold_7d = recent_units_sold([product.id for product in products.items])
 
     return render_template('admin/products_list.html',
                          title='Products',
                          products=products,
+                         units_sold_7d=units_sold_7d,
                          search=search,
                          category=category,
-                         categories=[cat[0] for cat in categories])
+                         categories=category_names())
 
 
 @admin_bp.route('/products/new', methods=['GET', 'POST'])
@@ -214,7 +127,9 @@ def new_product():
         # Create product
         product = Product(
             name=form.name.data,
+            sku=form.sku.data or None,
             price=form.price.data,
+            cost_price=form.cost_price.data,
             stock_qty=form.stock_qty.data,
             category=form.category.data,
             image_url=image_url
@@ -260,7 +175,9 @@ def edit_product(id):
 
         # Update product fields
         product.name = form.name.data
+        product.sku = form.sku.data or None
         product.price = form.price.data
+        product.cost_price = form.cost_price.data
         product.stock_qty = form.stock_qty.data
         product.category = form.category.data
 
@@ -354,295 +271,78 @@ def delete_employee(id):
 @admin_required
 def analytics():
     """Advanced analytics and reporting dashboard."""
-    from ..models import Product, Order, OrderItem, User
-    from datetime import datetime, timedelta
-    from sqlalchemy import func, desc
-
-    # Date range options
-    end_date = datetime.utcnow()
-    start_date_7d = end_date - timedelta(days=7)
-    start_date_30d = end_date - timedelta(days=30)
-    start_date_90d = end_date - timedelta(days=90)
-
-    # Sales analytics
-    sales_7d = db.session.query(func.sum(Order.total_amount)).filter(Order.created_at >= start_date_7d).scalar() or 0
-    sales_30d = db.session.query(func.sum(Order.total_amount)).filter(Order.created_at >= start_date_30d).scalar() or 0
-    sales_90d = db.session.query(func.sum(Order.total_amount)).filter(Order.created_at >= start_date_90d).scalar() or 0
-
-    # Order analytics
-    orders_7d = Order.query.filter(Order.created_at >= start_date_7d).count()
-    orders_30d = Order.query.filter(Order.created_at >= start_date_30d).count()
-    orders_90d = Order.query.filter(Order.created_at >= start_date_90d).count()
-
-    # Product performance
-    top_products_30d = db.session.query(
-        Product.name, Product.category,
-        func.sum(OrderItem.quantity).label('total_quantity'),
-        func.sum(OrderItem.line_total).label('total_revenue'),
-        func.avg(OrderItem.unit_price_snapshot).label('avg_price')
-    ).join(OrderItem).join(Order).filter(
-        Order.created_at >= start_date_30d
-    ).group_by(Product.id, Product.name, Product.category).order_by(
-        desc('total_revenue')
-    ).limit(20).all()
-
-    # Category performance
-    category_performance = db.session.query(
-        Product.category,
-        func.count(func.distinct(Product.id)).label('product_count'),
-        func.sum(OrderItem.quantity).label('total_quantity'),
-        func.sum(OrderItem.line_total).label('total_revenue')
-    ).join(OrderItem).join(Order).filter(
-        Order.created_at >= start_date_30d
-    ).group_by(Product.category).order_by(
-        desc('total_revenue')
-    ).all()
-
-    # Employee performance
-    employee_performance = db.session.query(
-        User.username,
-        func.count(Order.id).label('order_count'),
-        func.sum(Order.total_amount).label('total_sales'),
-        func.avg(Order.total_amount).label('avg_order_value')
-    ).join(Order).filter(
-        Order.created_at >= start_date_30d,
-        User.role == 'employee'
-    ).group_by(User.id, User.username).order_by(
-        desc('total_sales')
-    ).all()
-
-    # Daily sales trend (last 30 days)
-    daily_sales = []
-    for i in range(30):
-        day = end_date - timedelta(days=i)
-        day_start = day.replace(hour=0, minute=0, second=0, microsecond=0)
-        day_end = day.replace(hour=23, minute=59, second=59, microsecond=999999)
-
-        day_sales = db.session.query(func.sum(Order.total_amount)).filter(
-            Order.created_at >= day_start,
-            Order.created_at <= day_end
-        ).scalar() or 0
-
-        daily_sales.append({
-            'date': day.strftime('%Y-%m-%d'),
-            'sales': float(day_sales)
-        })
-
-    daily_sales.reverse()
-
     return render_template('admin/analytics.html',
                          title='Analytics & Reports',
-                         sales_7d=sales_7d,
-                         sales_30d=sales_30d,
-                         sales_90d=sales_90d,
-                         orders_7d=orders_7d,
-                         orders_30d=orders_30d,
-                         orders_90d=orders_90d,
-                         top_products=top_products_30d,
-                         category_performance=category_performance,
-                         employee_performance=employee_performance,
-                         daily_sales=daily_sales)
+                         **analytics_data(datetime.utcnow().date()))
+
 
 
 @admin_bp.route('/inventory-report')
 @admin_required
 def inventory_report():
     """Comprehensive inventory report."""
-    from ..models import Product
-    from sqlalchemy import func
-
-    # Inventory summary
-    total_products = Product.query.count()
-    in_stock = Product.query.filter(Product.stock_qty > 10).count()
-    low_stock = Product.query.filter(Product.stock_qty.between(1, 10)).count()
-    out_of_stock = Product.query.filter(Product.stock_qty == 0).count()
-
-    # Inventory value
-    inventory_value = float(db.session.query(func.sum(Product.price * Product.stock_qty)).scalar() or 0)
-
-    # Products by category
-    category_inventory = db.session.query(
-        Product.category,
-        func.count(Product.id).label('product_count'),
-        func.sum(Product.stock_qty).label('total_stock'),
-        func.sum(Product.price * Product.stock_qty).label('inventory_value')
-    ).group_by(Product.category).order_by(desc('inventory_value')).all()
-
-    # Low stock products (detailed)
-    low_stock_products = Product.query.filter(Product.stock_qty <= 10)\
-                                    .order_by(Product.stock_qty).all()
-
-    # Top value products
-    top_value_products = Product.query.order_by(desc(Product.price * Product.stock_qty)).limit(20).all()
-
     return render_template('admin/inventory_report.html',
                          title='Inventory Report',
-                         total_products=total_products,
-                         in_stock=in_stock,
-                         low_stock=low_stock,
-                         out_of_stock=out_of_stock,
-                         inventory_value=inventory_value,
-                         category_inventory=category_inventory,
-                         low_stock_products=low_stock_products,
-                         top_value_products=top_value_products)
+                         **inventory_data())
+
 
 
 @admin_bp.route('/sales-report')
 @admin_required
 def sales_report():
     """Comprehensive sales report."""
-    from ..models import Order, OrderItem, Product, User
-    from datetime import datetime, timedelta
-    from sqlalchemy import func, desc, and_
-
-    # Date ranges
-    today = datetime.utcnow().date()
-    yesterday = today - timedelta(days=1)
-    this_week = datetime.utcnow() - timedelta(days=datetime.utcnow().weekday())
-    this_month = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-
-    # Sales by period
-    today_sales = db.session.query(func.sum(Order.total_amount)).filter(
-        func.date(Order.created_at) == today
-    ).scalar() or 0
-
-    yesterday_sales = db.session.query(func.sum(Order.total_amount)).filter(
-        func.date(Order.created_at) == yesterday
-    ).scalar() or 0
-
-    week_sales = db.session.query(func.sum(Order.total_amount)).filter(
-        Order.created_at >= this_week
-    ).scalar() or 0
-
-    month_sales = db.session.query(func.sum(Order.total_amount)).filter(
-        Order.created_at >= this_month
-    ).scalar() or 0
-
-    # Order statistics
-    today_orders = Order.query.filter(func.date(Order.created_at) == today).count()
-    week_orders = Order.query.filter(Order.created_at >= this_week).count()
-    month_orders = Order.query.filter(Order.created_at >= this_month).count()
-
-    # Payment method breakdown
-    payment_methods = db.session.query(
-        Order.payment_method,
-        func.count(Order.id).label('count'),
-        func.sum(Order.total_amount).label('total')
-    ).group_by(Order.payment_method).all()
-
-    # Hourly sales pattern (today)
-    hourly_sales = []
-    for hour in range(24):
-        hour_start = datetime.utcnow().replace(hour=hour, minute=0, second=0, microsecond=0)
-        hour_end = hour_start.replace(hour=hour, minute=59, second=59, microsecond=999999)
-
-        hour_total = db.session.query(func.sum(Order.total_amount)).filter(
-            and_(Order.created_at >= hour_start, Order.created_at <= hour_end)
-        ).scalar() or 0
-
-        hourly_sales.append({
-            'hour': hour,
-            'sales': float(hour_total)
-        })
-
-    # Top customers (by order frequency)
-    top_customers = db.session.query(
-        User.username,
-        func.count(Order.id).label('order_count'),
-        func.sum(Order.total_amount).label('total_spent'),
-        func.avg(Order.total_amount).label('avg_order')
-    ).join(Order).filter(User.role == 'employee').group_by(User.id, User.username)\
-     .order_by(desc('order_count')).limit(10).all()
-
     return render_template('admin/sales_report.html',
                          title='Sales Report',
-                         today_sales=today_sales,
-                         yesterday_sales=yesterday_sales,
-                         week_sales=week_sales,
-                         month_sales=month_sales,
-                         today_orders=today_orders,
-                         week_orders=week_orders,
-                         month_orders=month_orders,
-                         payment_methods=payment_methods,
-                         hourly_sales=hourly_sales,
-                         top_customers=top_customers)
+                         **sales_report_data(datetime.utcnow().date()))
+
 
 
 @admin_bp.route('/backup')
 @admin_required
 def backup():
     """Data backup and export functionality."""
-    from ..models import Product, Order, OrderItem, User
-    import json
-    from datetime import datetime
-
-    # Get all data
-    products = Product.query.all()
-    orders = Order.query.all()
-    order_items = OrderItem.query.all()
-    users = User.query.all()
-
-    # Prepare backup data
-    backup_data = {
-        'metadata': {
-            'created_at': datetime.utcnow().isoformat(),
-            'version': '1.0',
-            'total_products': len(products),
-            'total_orders': len(orders),
-            'total_users': len(users)
-        },
-        'products': [
-            {
-                'id': p.id,
-                'name': p.name,
-                'price': float(p.price),
-                'stock_qty': p.stock_qty,
-                'category': p.category,
-                'image_url': p.image_url,
-                'created_at': p.created_at.isoformat() if p.created_at else None,
-                'updated_at': p.updated_at.isoformat() if p.updated_at else None
-            } for p in products
-        ],
-        'users': [
-            {
-                'id': u.id,
-                'username': u.username,
-                'role': u.role,
-                'created_at': u.created_at.isoformat() if u.created_at else None
-            } for u in users
-        ],
-        'orders': [
-            {
-                'id': o.id,
-                'employee_id': o.employee_id,
-                'total_amount': float(o.total_amount),
-                'tax_amount': float(o.tax_amount),
-                'discount_amount': float(o.discount_amount),
-                'payment_method': o.payment_method,
-                'status': o.status,
-                'created_at': o.created_at.isoformat() if o.created_at else None
-            } for o in orders
-        ],
-        'order_items': [
-            {
-                'id': oi.id,
-                'order_id': oi.order_id,
-                'product_id': oi.product_id,
-                'product_name_snapshot': oi.product_name_snapshot,
-                'unit_price_snapshot': float(oi.unit_price_snapshot),
-                'quantity': oi.quantity,
-                'line_total': float(oi.line_total)
-            } for oi in order_items
-        ]
-    }
-
-    # Convert to JSON for display/download
-    backup_json = json.dumps(backup_data, indent=2)
+    from ..models import Product, Order, User
+    from ..utils.backup import BACKUP_VERSION, table_counts
 
+    # Row counts and a small preview; the backup itself is streamed by download_backup
     return render_template('admin/backup.html',
                          title='Data Backup',
-                         backup_data=backup_data,
-                         backup_json=backup_json)
+                         backup_version=BACKUP_VERSION,
+                         counts=table_counts(),
+                         recent_products=Product.query.order_by(desc(Product.id)).limit(5).all(),
+                         recent_orders=Order.query.order_by(desc(Order.id)).limit(5).all(),
+                         recent_users=User.query.order_by(desc(User.id)).limit(5).all())
+
+
+@admin_bp.route('/backup/download')
+@admin_required
+def download_backup():
+    """Stream a full NDJSON backup, optionally gzip-compressed; password hashes only on request."""
+    from flask import Response, stream_with_context, current_app
+    from ..utils.backup import Progress, backup_chunks
+    from ..utils.export import gzip_chunks
+
+    progress = Progress()
+    credentials = request.args.get('credentials') in ('1', 'true')
+
+    def generate():
+        yield from backup_chunks(chunk_size=Config.BACKUP_CHUNK_SIZE, progress=progress, credentials=credentials)
+        current_app.logger.info(f'Backup {"with password hashes " if credentials else ""}downloaded by '
+                                f'{current_user.username}: {progress.summary()}')
+
+    chunks = generate()
+    filename = f'grocery_backup_{datetime.now().strftime("%Y%m%d_%H%M%S")}.ndjson'
+    mimetype = 'application/x-ndjson'
+    if request.args.get('gzip', '1') in ('1', 'true'):
+        chunks = gzip_chunks(chunks)
+        filename += '.gz'
+        mimetype = 'application/gzip'
+
+    return Response(
+        stream_with_context(chunks),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
 
 
 @admin_bp.route('/settings')
@@ -657,53 +357,50 @@ def settings():
 @admin_required
 def export_data():
     """Export data in various formats."""
-    from ..models import Product, Order, OrderItem, User
-    import csv
-    import io
-    from flask import Response
-    from datetime import datetime
+    from flask import Response, stream_with_context
+    from ..utils.export import EXPORT_TABLES, csv_chunks, gzip_chunks
 
     # Get export format from query parameter
     export_format = request.args.get('format', 'csv')
 
     if export_format == 'csv':
-        # Create CSV response
-        output = io.StringIO()
-        writer = csv.writer(output)
-
-        # Products export
-        products = Product.query.all()
-        writer.writerow(['Products'])
-        writer.writerow(['ID', 'Name', 'Price', 'Stock', 'Category', 'Created'])
-        for product in products:
-            writer.writerow([
-                product.id,
-                product.name,
-                float(product.price),
-                product.stock_qty,
-                product.category,
-                product.created_at.strftime('%Y-%m-%d %H:%M:%S') if product.created_at else ''
-            ])
-
-        writer.writerow([])
-        writer.writerow(['Orders'])
-        writer.writerow(['ID', 'Employee', 'Total', 'Payment Method', 'Status', 'Created'])
-        orders = Order.query.all()
-        for order in orders:
-            writer.writerow([
-                order.id,
-                order.employee.username if order.employee else '',
-                float(order.total_amount),
-                order.payment_method,
-                order.status,
-                order.created_at.strftime('%Y-%m-%d %H:%M:%S') if order.created_at else ''
-            ])
-
-        output.seek(0)
+        # Tables to export: ?tables=products,orders or per-table ?products=true flags
+        # (products and orders by default)
+        if request.args.get('tables'):
+            tables = [name.strip() for name in request.args['tables'].split(',') if name.strip()]
+        else:
+            defaults = {'products': 'true', 'orders': 'true'}
+            tables = [name for name in EXPORT_TABLES
+                      if request.args.get(name, defaults.get(name, 'false')) == 'true']
+
+        unknown = [name for name in tables if name not in EXPORT_TABLES]
+        if unknown or not tables:
+            flash(f'Unknown or empty table selection: {", ".join(unknown) or "none"}', 'danger')
+            return redirect(url_for('admin.export_data'))
+
+        # Optional date range on creation time, end date inclusive
+        try:
+            start = datetime.strptime(request.args['start_date'], '%Y-%m-%d') \
+                if request.args.get('start_date') else None
+            end = datetime.strptime(request.args['end_date'], '%Y-%m-%d') + timedelta(days=1) \
+                if request.args.get('end_date') else None
+        except ValueError:
+            flash('Dates must be in YYYY-MM-DD format.', 'danger')
+            return redirect(url_for('admin.export_data'))
+
+        # Stream the file batch by batch instead of building it in memory
+        chunks = csv_chunks(tables, start, end, batch_size=Config.EXPORT_BATCH_SIZE)
+        filename = f'grocery_data_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
+        mimetype = 'text/csv'
+        if request.args.get('gzip') in ('1', 'true'):
+            chunks = gzip_chunks(chunks)
+            filename += '.gz'
+            mimetype = 'application/gzip'
+
         return Response(
-            output.getvalue(),
-            mimetype='text/csv',
-            headers={'Content-Disposition': f'attachment; filename=grocery_data_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'}
+            stream_with_context(chunks),
+            mimetype=mimetype,
+            headers={'Content-Disposition': f'attachment; filename={filename}'}
         )
 
     return render_template('admin/export_data.html', title='Export Data')
@@ -713,11 +410,17 @@ def export_data():
 @admin_required
 def bulk_import():
     """Bulk import products from CSV."""
-    from flask import request, flash, redirect
     import csv
     import io
-    from ..models import Product, db
+    import os
+    from flask import current_app
+    from ..utils.backup import Progress
+    from ..utils.importer import ERROR_REPORT_HEADER, import_products, new_error_report
 
+    # Import mode from the form -> natural key for upserts (None: insert every row)
+    UPSERT_MODES = {'upsert_sku': 'sku', 'upsert_name_category': 'name_category'}
+
+    result = None
     if request.method == 'POST':
         if 'file' not in request.files:
             flash('No file uploaded', 'error')
@@ -729,51 +432,124 @@ def bulk_import():
             return redirect(request.url)
 
         if file and file.filename.endswith('.csv'):
+            # Stream the upload through the CSV reader instead of decoding it whole
+            lines = io.TextIOWrapper(file.stream, encoding='utf-8-sig', newline='')
+            progress = Progress(report=lambda p: current_app.logger.info(f'Importing {file.filename}: {p.summary()}'))
+            token, report_path = new_error_report()
             try:
-                # Read CSV file
-                stream = io.StringIO(file.stream.read().decode("UTF8"), newline=None)
-                csv_reader = csv.DictReader(stream)
-
-                imported_count = 0
-                errors = []
-
-                for row_num, row in enumerate(csv_reader, start=2):
-                    try:
-                        # Validate required fields
-                        if not all(key in row for key in ['name', 'price', 'stock_qty', 'category']):
-                            errors.append(f"Row {row_num}: Missing required fields")
-                            continue
-
-                        # Create product
-                        product = Product(
-                            name=row['name'].strip(),
-                            price=float(row['price']),
-                            stock_qty=int(row['stock_qty']),
-                            category=row['category'].strip(),
-                            image_url=row.get('image_url', '').strip() or None
-                        )
-
-                        db.session.add(product)
-                        imported_count += 1
-
-                    except Exception as e:
-                        errors.append(f"Row {row_num}: {str(e)}")
-
-                db.session.commit()
-
-                if imported_count > 0:
-                    flash(f'Successfully imported {imported_count} products', 'success')
-                if errors:
-                    flash(f'Errors encountered: {" | ".join(errors[:5])}', 'warning')
-
-            except Exception as e:
+                with open(report_path, 'w', newline='', encoding='utf-8') as report:
+                    errors = csv.writer(report)
+                    errors.writerow(ERROR_REPORT_HEADER)
+                    import_products(lines,
+                                    batch_size=current_app.config['IMPORT_BATCH_SIZE'],
+                                    has_headers=bool(request.form.get('has_headers')),
+                                    skip_duplicates=bool(request.form.get('skip_duplicates')),
+                                    default_category=request.form.get('default_category', '').strip() or None,
+                                    upsert=UPSERT_MODES.get(request.form.get('mode')),
+                                    progress=progress,
+                                    errors=errors)
+            except (ValueError, UnicodeDecodeError, csv.Error) as e:
+                db.session.rollback()
                 flash(f'Error processing file: {str(e)}', 'error')
+            except Exception as e:
                 db.session.rollback()
+                current_app.logger.exception(f'Bulk import of {file.filename} failed')
+                flash(f'Import stopped after {progress.counts.get("imported", 0)} products: {str(e)}', 'error')
+
+            current_app.logger.info(f'Imported {file.filename} by {current_user.username}: {progress.summary()}')
+            result = {
+                'filename': file.filename,
+                'imported': progress.counts.get('imported', 0),
+                'updated': progress.counts.get('updated', 0),
+                'unchanged': progress.counts.get('unchanged', 0),
+                'skipped': progress.counts.get('skipped', 0),
+                'errors': progress.counts.get('errors', 0),
+                'processed': progress.rows,
+                'seconds': progress.seconds,
+                'error_report': token if progress.counts.get('errors') else None
+            }
+            if not result['error_report']:
+                os.remove(report_path)
+
+            if result['imported'] or result['updated']:
+                flash(f'Successfully imported {result["imported"]} and updated {result["updated"]} products '
+                      f'in {result["seconds"]:.1f}s ({result["unchanged"]} unchanged)', 'success')
+            elif result['unchanged']:
+                flash(f'All {result["unchanged"]} matching products were already up to date', 'info')
+            if result['errors']:
+                flash(f'{result["errors"]} rows were rejected; download the error report for details', 'warning')
 
         else:
             flash('Please upload a valid CSV file', 'error')
 
-    return render_template('admin/bulk_import.html', title='Bulk Import')
+    return render_template('admin/bulk_import.html', title='Bulk Import', result=result)
+
+
+@admin_bp.route('/bulk-import/errors/<token>')
+@admin_required
+def import_errors(token):
+    """Download the row error report of a bulk import."""
+    import os
+    from flask import send_file, abort
+    from ..utils.importer import error_report_path
+
+    path = error_report_path(token)
+    if not path or not os.path.exists(path):
+        abort(404)
+    return send_file(path, mimetype='text/csv', as_attachment=True,
+                     download_name='import_errors.csv')
+
+
+@admin_bp.route('/stock-adjustments', methods=['GET', 'POST'])
+@admin_required
+def stock_adjustments():
+    """Receive deliveries and correct stock for many products at once from a CSV."""
+    import csv
+    import io
+    from flask import current_app
+    from ..utils.stock import apply_stock_adjustments, read_adjustment_csv
+
+    results = None
+    if request.method == 'POST':
+        file = request.files.get('file')
+        try:
+            if file and file.filename:
+                lines = read_adjustment_csv(io.TextIOWrapper(file.stream, encoding='utf-8-sig', newline=''))
+            else:
+                lines = read_adjustment_csv(io.StringIO(request.form.get('lines', '').strip()))
+        except (ValueError, UnicodeDecodeError, csv.Error) as e:
+            flash(f'Error reading adjustments: {str(e)}', 'error')
+            return redirect(request.url)
+
+        results = apply_stock_adjustments(lines, all_or_nothing=bool(request.form.get('all_or_nothing')))
+        applied = sum(1 for result in results if result['status'] == 'applied')
+        current_app.logger.info(f'Stock adjusted by {current_user.username}: {applied} of {len(results)} lines applied')
+
+        if applied:
+            flash(f'Applied {applied} of {len(results)} stock adjustments', 'success')
+        if applied < len(results):
+            flash(f'{len(results) - applied} lines were not applied; see the results below', 'warning')
+
+    return render_template('admin/stock_adjustments.html', title='Stock Adjustments', results=results)
+
+
+@admin_bp.route('/api/stock-adjustments', methods=['POST'])
+@admin_required
+def stock_adjustments_api():
+    """JSON API: apply a list of stock adjustments and return per-line results."""
+    from ..utils.stock import apply_stock_adjustments
+
+    data = request.get_json(silent=True)
+    adjustments = data.get('adjustments') if isinstance(data, dict) else None
+    if not isinstance(adjustments, list) or not all(isinstance(line, dict) for line in adjustments):
+        return jsonify({'error': 'Expected {"adjustments": [{"product_id" or "sku": ..., "change": ...}, ...]}'}), 400
+
+    results = apply_stock_adjustments(adjustments, all_or_nothing=bool(data.get('all_or_nothing')))
+    return jsonify({
+        'applied': sum(1 for result in results if result['status'] == 'applied'),
+        'rejected': sum(1 for result in results if result['status'] != 'applied'),
+        'results': results
+    })
 
 
 @admin_bp.route('/system-health')
@@ -830,98 +606,44 @@ def system_health():
                          title='System Health',
                          db_stats=db_stats,
                          system_stats=system_stats,
-                         app_health=app_health)
+                         app_health=app_health,
+                         cache_stats=report_cache.stats(),
+                         catalog_stats=catalog_cache.stats())
 
 
 @admin_bp.route('/profit-analysis')
 @admin_required
 def profit_analysis():
     """Profit analysis and financial reporting."""
-    from ..models import Order, OrderItem, Product
-    from datetime import datetime, timedelta
-    from sqlalchemy import func, desc
-    from decimal import Decimal
-
-    # Assume cost price is 70% of selling price (configurable)
-    COST_MARGIN = Decimal('0.7')
-
-    # Calculate profits for different periods
+    # Period starts (all periods run up to now)
+    now = datetime.utcnow()
+    today = now.date()
     periods = {
-        'today': datetime.utcnow().date(),
-        'this_week': datetime.utcnow() - timedelta(days=datetime.utcnow().weekday()),
-        'this_month': datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0),
-        'last_30_days': datetime.utcnow() - timedelta(days=30),
-        'last_90_days': datetime.utcnow() - timedelta(days=90)
+        'today': datetime.combine(today, datetime.min.time()),
+        'this_week': datetime.combine(today - timedelta(days=today.weekday()), datetime.min.time()),
+        'this_month': datetime.combine(today.replace(day=1), datetime.min.time()),
+        'last_30_days': now - timedelta(days=30),
+        'last_90_days': now - timedelta(days=90)
     }
 
-    profit_data = {}
-    for period_name, start_date in periods.items():
-        if period_name == 'today':
-            # For today, filter by date
-            orders = Order.query.filter(func.date(Order.created_at) == start_date).all()
-        else:
-            # For other periods, filter by datetime
-            orders = Order.query.filter(Order.created_at >= start_date).all()
-
-        total_revenue = sum(order.total_amount for order in orders)
-        total_cost = sum(
-            sum(item.quantity * (item.unit_price_snapshot * COST_MARGIN) for item in order.order_items)
-            for order in orders
-        )
-        total_profit = total_revenue - total_cost
-        profit_margin = (total_profit / total_revenue * 100) if total_revenue > 0 else 0
-
-        profit_data[period_name] = {
-            'revenue': float(total_revenue),
-            'cost': float(total_cost),
-            'profit': float(total_profit),
-            'margin': float(profit_margin),
-            'orders': len(orders)
-        }
+    # Revenue, cost and margin for every period in one aggregate query
+    profit_data = profit_by_period(periods, now)
 
-    # Top profitable products
-    top_profitable_products = db.session.query(
-        Product.name,
-        func.sum(OrderItem.quantity).label('total_sold'),
-        func.sum(OrderItem.line_total).label('total_revenue'),
-        (func.sum(OrderItem.line_total) - func.sum(OrderItem.quantity * OrderItem.unit_price_snapshot * COST_MARGIN)).label('total_profit')
-    ).join(OrderItem).join(Order).filter(
-        Order.created_at >= periods['last_30_days']
-    ).group_by(Product.id, Product.name).order_by(
-        desc('total_profit')
-    ).limit(20).all()
+    # Top profitable products (last 30 calendar days, per-product rollup)
+    top_profitable_products = top_selling_products(*last_n_days(30, today), order_by='total_profit', limit=20)
 
     # Profit trend (daily for last 30 days)
-    profit_trend = []
-    for i in range(30):
-        day = datetime.utcnow() - timedelta(days=i)
-        day_start = day.replace(hour=0, minute=0, second=0, microsecond=0)
-        day_end = day.replace(hour=23, minute=59, second=59, microsecond=999999)
-
-        day_orders = Order.query.filter(
-            Order.created_at >= day_start,
-            Order.created_at <= day_end
-        ).all()
-
-        day_revenue = sum(order.total_amount for order in day_orders)
-        day_cost = sum(
-            sum(item.quantity * (item.unit_price_snapshot * COST_MARGIN) for item in order.order_items)
-            for order in day_orders
-        )
-
-        profit_trend.append({
-            'date': day.strftime('%Y-%m-%d'),
-            'profit': float(day_revenue - day_cost)
-        })
-
-    profit_trend.reverse()
+    profit_trend = [
+        {'date': point['bucket'].strftime('%Y-%m-%d'), 'profit': point['profit']}
+        for point in profit_series('day', *day_bounds(*last_n_days(30)))
+    ]
 
     return render_template('admin/profit_analysis.html',
                          title='Profit Analysis',
                          profit_data=profit_data,
                          top_profitable_products=top_profitable_products,
                          profit_trend=profit_trend,
-                         cost_margin=float(COST_MARGIN * 100))
+                         cost_margin=Config.DEFAULT_COST_RATIO * 100)
 
 
 # Additional Admin Features
@@ -929,61 +651,10 @@ def profit_analysis():
 @admin_required
 def customers():
     """Customer management and analytics."""
-    from ..models import Order, User
-    from datetime import datetime, timedelta
-    from sqlalchemy import func, desc
-
-    # Customer analytics
-    thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-
-    # Top customers by spending
-    top_customers_by_spending = db.session.query(
-        User.username,
-        func.count(Order.id).label('order_count'),
-        func.sum(Order.total_amount).label('total_spent'),
-        func.avg(Order.total_amount).label('avg_order_value'),
-        func.max(Order.created_at).label('last_order_date')
-    ).join(Order).filter(
-        Order.created_at >= thirty_days_ago,
-        User.role == 'employee'
-    ).group_by(User.id, User.username).order_by(
-        desc('total_spent')
-    ).limit(20).all()
-
-    # Customer lifetime value
-    customer_lifetime_value = db.session.query(
-        User.username,
-        func.sum(Order.total_amount).label('lifetime_value'),
-        func.count(Order.id).label('total_orders'),
-        func.min(Order.created_at).label('first_order'),
-        func.max(Order.created_at).label('last_order')
-    ).join(Order).filter(User.role == 'employee').group_by(User.id, User.username).order_by(
-        desc('lifetime_value')
-    ).all()
-
-    # Customer retention (active in last 30 days)
-    active_customers = db.session.query(User).filter(
-        User.role == 'employee',
-        User.id.in_(
-            db.session.query(Order.employee_id).filter(
-                Order.created_at >= thirty_days_ago
-            ).distinct()
-        )
-    ).all()
-
-    # Customer segments
-    vip_customers = [c for c in customer_lifetime_value if c.lifetime_value >= 1000]
-    regular_customers = [c for c in customer_lifetime_value if 500 <= c.lifetime_value < 1000]
-    new_customers = [c for c in customer_lifetime_value if c.lifetime_value < 500]
-
     return render_template('admin/customers.html',
                          title='Customer Management',
-                         top_customers=top_customers_by_spending,
-                         customer_lifetime=customer_lifetime_value,
-                         active_customers=active_customers,
-                         vip_customers=vip_customers,
-                         regular_customers=regular_customers,
-                         new_customers=new_customers)
+                         **customer_data(datetime.utcnow().date()))
+
 
 
 @admin_bp.route('/suppliers')
@@ -1220,7 +891,6 @@ def theme_test():
 def orders():
     """List all orders with filters."""
     from ..models import Order, User  # Import inside function
-    page = request.args.get('page', 1, type=int)
     employee_filter = request.args.get('employee', '')
     start_date = request.args.get('start_date', '')
     end_date = request.args.get('end_date', '')
@@ -1239,18 +909,19 @@ def orders():
 
     if end_date:
         try:
-            end = datetime.strptime(end_date, '%Y-%m-%d')
-            end = end.replace(hour=23, minute=59, second=59)
-            query = query.filter(Order.created_at <= end)
+            # Half-open bound: everything before the start of the next day
+            end = datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1)
+            query = query.filter(Order.created_at < end)
         except ValueError:
             pass
 
-    orders = query.order_by(desc(Order.created_at))\
-                 .paginate(page=page, per_page=Config.ITEMS_PER_PAGE, error_out=False)
+    orders = paginate_listing(query, (Order.created_at, Order.id), descending=True,
+                              total_key=('admin.orders', employee_filter, start_date, end_date))
 
     return render_template('admin/orders_list.html',
                          title='Orders',
                          orders=orders,
+                         item_counts=order_item_counts(orders.items),
                          employee_filter=employee_filter,
                          start_date=start_date,
                          end_date=end_date)
\ No newline at end of file
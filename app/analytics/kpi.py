@@ -0,0 +1,97 @@
+from datetime import timedelta
+from sqlalchemy import func, case
+from ..models import db, Product, User, SalesDaily
+
+LOW_STOCK_THRESHOLD = 10
+
+
+def _count_if(condition):
+    return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+
+def _sum_if(condition, value):
+    return func.coalesce(func.sum(case((condition, value), else_=0)), 0)
+
+
+def product_kpis(low_stock_threshold=LOW_STOCK_THRESHOLD):
+    """Product counters and inventory value in one pass over products."""
+    row = db.session.query(
+        func.count(Product.id),
+        _count_if(Product.stock_qty > low_stock_threshold),
+        _count_if(Product.stock_qty <= low_stock_threshold),
+        _count_if(Product.stock_qty.between(1, low_stock_threshold)),
+        _count_if(Product.stock_qty == 0),
+        func.coalesce(func.sum(Product.price * Product.stock_qty), 0)
+    ).one()
+
+    return {
+        'total_products': int(row[0]),
+        'in_stock': int(row[1]),
+        'low_stock_count': int(row[2]),  # includes out of stock
+        'low_stock': int(row[3]),  # 1..threshold units left
+        'out_of_stock': int(row[4]),
+        'inventory_value': float(row[5])
+    }
+
+
+def user_kpis():
+    """Account counters in one pass over users."""
+    row = db.session.query(
+        func.count(User.id),
+        _count_if(User.role == 'employee')
+    ).one()
+
+    return {
+        'total_users': int(row[0]),
+        'total_employees': int(row[1])
+    }
+
+
+def sales_kpis(today):
+    """
+    Lifetime and period sales counters in one pass over the sales_daily rollup.
+
+    Periods (today, yesterday, this week, this month) end with ``today``; the
+    orders table itself is never scanned and no Order objects are loaded.
+    """
+    yesterday = today - timedelta(days=1)
+    week_start = today - timedelta(days=today.weekday())
+    month_start = today.replace(day=1)
+
+    is_today = SalesDaily.day == today
+    is_yesterday = SalesDaily.day == yesterday
+    in_week = SalesDaily.day.between(week_start, today)
+    in_month = SalesDaily.day.between(month_start, today)
+
+    row = db.session.query(
+        func.coalesce(func.sum(SalesDaily.order_count), 0),
+        func.coalesce(func.sum(SalesDaily.gross_amount), 0),
+        _sum_if(is_today, SalesDaily.order_count),
+        _sum_if(is_today, SalesDaily.gross_amount),
+        _sum_if(is_yesterday, SalesDaily.gross_amount),
+        _sum_if(in_week, SalesDaily.gross_amount),
+        _sum_if(in_month, SalesDaily.order_count),
+        _sum_if(in_month, SalesDaily.gross_amount)
+    ).one()
+
+    total_orders = int(row[0])
+    lifetime_sales = float(row[1])
+    return {
+        'total_orders': total_orders,
+        'avg_order_value': lifetime_sales / total_orders if total_orders else 0.0,
+        'today_order_count': int(row[2]),
+        'today_sales': float(row[3]),
+        'yesterday_sales': float(row[4]),
+        'week_sales': float(row[5]),
+        'month_order_count': int(row[6]),
+        'month_sales': float(row[7])
+    }
+
+
+def dashboard_kpis(today):
+    """All dashboard header counters: one query each for products, users and sales."""
+    kpis = {}
+    kpis.update(product_kpis())
+    kpis.update(user_kpis())
+    kpis.update(sales_kpis(today))
+    return kpis
@@ -0,0 +1,205 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+from sqlalchemy import func, desc, insert, delete
+from ..models import db, Category, Order, OrderItem, Product, ProductSalesDaily, ProductSalesStats
+from ..utils.sql import upsert_increment_many
+from .profit import item_cost
+from .rollups import day_bounds
+
+
+def record_order_items(order, order_items):
+    """
+    Fold the lines of a newly created order into the per-product rollups.
+
+    Must be called inside the checkout transaction, after the order has been
+    flushed, so the statistics commit or roll back together with the order.
+    Issues one batched upsert per rollup table regardless of the line count.
+
+    Args:
+        order: The new Order
+        order_items: The order_items rows inserted for it, as dicts with
+            product_id, quantity, line_total and unit_cost_snapshot
+    """
+    created_at = order.created_at or datetime.utcnow()
+    record_sold_items([dict(item, created_at=created_at) for item in order_items])
+
+
+def record_sold_items(items):
+    """
+    Fold order lines from any number of orders into the per-product rollups.
+
+    Same contract as record_order_items, for batches: one upsert per rollup
+    table for the whole batch.
+
+    Args:
+        items: Dicts with product_id, quantity, line_total,
+            unit_cost_snapshot and the created_at of their order
+    """
+    daily_totals = {}
+    last_sold = {}
+    for item in items:
+        key = (item['product_id'], item['created_at'].date())
+        units, revenue, cost = daily_totals.get(key, (0, Decimal('0.00'), Decimal('0.00')))
+        daily_totals[key] = (units + item['quantity'],
+                             revenue + item['line_total'],
+                             cost + item['unit_cost_snapshot'] * item['quantity'])
+        last_sold[item['product_id']] = max(item['created_at'], last_sold.get(item['product_id'], item['created_at']))
+
+    if not daily_totals:
+        return
+
+    daily = [
+        {'product_id': product_id, 'day': day,
+         'units_sold': units, 'revenue': revenue, 'cost': cost}
+        for (product_id, day), (units, revenue, cost) in daily_totals.items()
+    ]
+    upsert_increment_many(ProductSalesDaily.__table__, ['product_id', 'day'], daily)
+
+    totals = {}
+    for (product_id, _), (units, revenue, cost) in daily_totals.items():
+        lifetime_units, lifetime_revenue, lifetime_cost = totals.get(product_id, (0, Decimal('0.00'), Decimal('0.00')))
+        totals[product_id] = (lifetime_units + units, lifetime_revenue + revenue, lifetime_cost + cost)
+
+    lifetime = [
+        {'product_id': product_id, 'units_sold': units, 'revenue': revenue,
+         'cost': cost, 'last_sold_at': last_sold[product_id]}
+        for product_id, (units, revenue, cost) in totals.items()
+    ]
+    upsert_increment_many(ProductSalesStats.__table__, ['product_id'], lifetime,
+                          assign=['last_sold_at'])
+
+
+def rebuild_product_sales(start_day=None, end_day=None):
+    """
+    Recompute product_sales_daily for [start_day, end_day) and all lifetime stats.
+
+    Both tables are rebuilt with DELETE plus INSERT ... SELECT from the order
+    items, so the work stays in the database. Lifetime totals always cover the
+    whole history. The caller is responsible for committing.
+
+    Returns:
+        int: Number of daily rollup rows written
+    """
+    start, end = day_bounds(start_day, end_day)
+
+    clear = delete(ProductSalesDaily)
+    if start_day:
+        clear = clear.where(ProductSalesDaily.day >= start_day)
+    if end_day:
+        clear = clear.where(ProductSalesDaily.day < end_day)
+    db.session.execute(clear)
+
+    order_day = func.date(Order.created_at)
+    source = db.session.query(
+        OrderItem.product_id,
+        order_day,
+        func.sum(OrderItem.quantity),
+        func.coalesce(func.sum(OrderItem.line_total), 0),
+        func.coalesce(func.sum(item_cost()), 0)
+    ).join(Order, Order.id == OrderItem.order_id).filter(Order.created_at.isnot(None))
+    if start:
+        source = source.filter(Order.created_at >= start)
+    if end:
+        source = source.filter(Order.created_at < end)
+    source = source.group_by(OrderItem.product_id, order_day)
+
+    result = db.session.execute(
+        insert(ProductSalesDaily).from_select(
+            ['product_id', 'day', 'units_sold', 'revenue', 'cost'],
+            source.statement
+        )
+    )
+
+    db.session.execute(delete(ProductSalesStats))
+    lifetime = db.session.query(
+        OrderItem.product_id,
+        func.sum(OrderItem.quantity),
+        func.coalesce(func.sum(OrderItem.line_total), 0),
+        func.coalesce(func.sum(item_cost()), 0),
+        func.max(Order.created_at)
+    ).join(Order, Order.id == OrderItem.order_id).group_by(OrderItem.product_id)
+    db.session.execute(
+        insert(ProductSalesStats).from_select(
+            ['product_id', 'units_sold', 'revenue', 'cost', 'last_sold_at'],
+            lifetime.statement
+        )
+    )
+    return result.rowcount
+
+
+def _in_range(query, start_day, end_day):
+    if start_day:
+        query = query.filter(ProductSalesDaily.day >= start_day)
+    if end_day:
+        query = query.filter(ProductSalesDaily.day < end_day)
+    return query
+
+
+def top_selling_products(start_day=None, end_day=None, order_by='total_quantity', limit=10):
+    """
+    Rows of (name, category, total_quantity, total_revenue, total_cost,
+    total_profit, avg_price) per product for [start_day, end_day).
+
+    Args:
+        order_by: Label to rank by, e.g. 'total_quantity', 'total_revenue' or 'total_profit'
+        limit: Number of products to return (None for all)
+    """
+    units = func.sum(ProductSalesDaily.units_sold)
+    revenue = func.sum(ProductSalesDaily.revenue)
+    cost = func.sum(ProductSalesDaily.cost)
+    query = db.session.query(
+        Product.name,
+        Product.category,
+        units.label('total_quantity'),
+        revenue.label('total_revenue'),
+        cost.label('total_cost'),
+        (revenue - cost).label('total_profit'),
+        (revenue / units).label('avg_price')
+    ).join(Product, Product.id == ProductSalesDaily.product_id)
+    query = _in_range(query, start_day, end_day)\
+        .group_by(Product.id, Product.name, Product.category)\
+        .order_by(desc(order_by))
+    if limit:
+        query = query.limit(limit)
+    return query.all()
+
+
+def sales_by_category(start_day=None, end_day=None):
+    """Rows of (category, product_count, total_quantity, total_revenue) for [start_day, end_day)."""
+    query = db.session.query(
+        Category.name.label('category'),
+        func.count(func.distinct(ProductSalesDaily.product_id)).label('product_count'),
+        func.sum(ProductSalesDaily.units_sold).label('total_quantity'),
+        func.sum(ProductSalesDaily.revenue).label('total_revenue')
+    ).select_from(ProductSalesDaily)\
+        .join(Product, Product.id == ProductSalesDaily.product_id)\
+        .join(Category, Category.id == Product.category_id)
+    return _in_range(query, start_day, end_day)\
+        .group_by(Category.id, Category.name)\
+        .order_by(desc('total_revenue')).all()
+
+
+def recent_units_sold(product_ids, days=7, today=None):
+    """
+    Units sold per product over the last ``days`` days including today.
+
+    One indexed query for a whole page of products; products without sales
+    in the window are absent from the result.
+
+    Returns:
+        dict: product id -> units sold
+    """
+    if not product_ids:
+        return {}
+
+    today = today or datetime.utcnow().date()
+    rows = db.session.query(
+        ProductSalesDaily.product_id,
+        func.sum(ProductSalesDaily.units_sold)
+    ).filter(
+        ProductSalesDaily.product_id.in_(product_ids),
+        ProductSalesDaily.day >= today - timedelta(days=days - 1),
+        ProductSalesDaily.day <= today
+    ).group_by(ProductSalesDaily.product_id).all()
+
+    return {product_id: int(units) for product_id, units in rows}
@@ -0,0 +1,86 @@
+from decimal import Decimal
+from sqlalchemy import func, case
+from config import Config
+from ..models import db, Order, OrderItem
+from .timeseries import series
+
+
+def item_cost():
+    """
+    SQL expression for the cost of an order item line.
+
+    Uses the cost captured at checkout, falling back to DEFAULT_COST_RATIO of
+    the sale price for items recorded before cost snapshots existed.
+    """
+    ratio = Decimal(str(Config.DEFAULT_COST_RATIO))
+    return OrderItem.quantity * func.coalesce(
+        OrderItem.unit_cost_snapshot,
+        OrderItem.unit_price_snapshot * ratio
+    )
+
+
+def _items_query(*columns):
+    return db.session.query(*columns)\
+        .select_from(OrderItem)\
+        .join(Order, Order.id == OrderItem.order_id)
+
+
+def _summary(revenue, cost, orders):
+    revenue = float(revenue or 0)
+    cost = float(cost or 0)
+    profit = revenue - cost
+    return {
+        'revenue': revenue,
+        'cost': cost,
+        'profit': profit,
+        'margin': (profit / revenue * 100) if revenue > 0 else 0.0,
+        'orders': int(orders or 0)
+    }
+
+
+def profit_by_period(periods, end):
+    """
+    Revenue, cost, profit and margin for several periods in one query.
+
+    Every period runs from its start up to ``end``; the periods are computed
+    with conditional aggregation over the widest range.
+
+    Args:
+        periods: dict of period name -> start datetime
+        end: Exclusive upper bound shared by all periods
+
+    Returns:
+        dict: period name -> {'revenue', 'cost', 'profit', 'margin', 'orders'}
+    """
+    cost = item_cost()
+    columns = []
+    for start in periods.values():
+        in_period = Order.created_at >= start
+        columns += [
+            func.sum(case((in_period, OrderItem.line_total), else_=0)),
+            func.sum(case((in_period, cost), else_=0)),
+            func.count(func.distinct(case((in_period, OrderItem.order_id))))
+        ]
+
+    row = _items_query(*columns).filter(
+        Order.created_at >= min(periods.values()),
+        Order.created_at < end
+    ).one()
+
+    return {
+        name: _summary(*row[i * 3:i * 3 + 3])
+        for i, name in enumerate(periods)
+    }
+
+
+def profit_series(bucket, start, end):
+    """Gap-filled revenue/cost/profit per ``bucket`` over [start, end) in one query."""
+    points = series(bucket, Order.created_at, {
+        'revenue': func.sum(OrderItem.line_total),
+        'cost': func.sum(item_cost())
+    }, start, end, query=_items_query())
+
+    for point in points:
+        point['profit'] = point['revenue'] - point['cost']
+    return points
+
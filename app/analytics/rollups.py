@@ -0,0 +1,168 @@
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from sqlalchemy import func, desc, insert, delete
+from ..models import db, Order, SalesDaily, User
+from ..utils.sql import upsert_increment, upsert_increment_many
+
+
+def day_bounds(start_day, end_day):
+    """Convert a [start_day, end_day) date range into datetimes for Order.created_at filters."""
+    start = datetime.combine(start_day, time.min) if start_day else None
+    end = datetime.combine(end_day, time.min) if end_day else None
+    return start, end
+
+
+def record_order(order):
+    """
+    Fold a newly created order into the sales_daily rollup.
+
+    Must be called after the order has been flushed, inside the checkout
+    transaction, so the rollup commits or rolls back together with the order.
+    """
+    created_at = order.created_at or datetime.utcnow()
+    upsert_increment(
+        SalesDaily.__table__,
+        key={
+            'day': created_at.date(),
+            'payment_method': order.payment_method,
+            'employee_id': order.employee_id
+        },
+        deltas={
+            'order_count': 1,
+            'gross_amount': order.total_amount,
+            'tax_amount': order.tax_amount or Decimal('0.00'),
+            'discount_amount': order.discount_amount or Decimal('0.00')
+        }
+    )
+
+
+def record_orders(orders):
+    """
+    Fold a batch of newly created orders into the sales_daily rollup.
+
+    Batch form of record_order: one upsert for all orders, with the same
+    transaction requirements.
+
+    Args:
+        orders: Dicts with created_at, payment_method, employee_id,
+            total_amount, tax_amount and discount_amount
+    """
+    totals = {}
+    for order in orders:
+        key = (order['created_at'].date(), order['payment_method'], order['employee_id'])
+        count, gross, tax, discount = totals.get(key, (0, Decimal('0.00'), Decimal('0.00'), Decimal('0.00')))
+        totals[key] = (count + 1, gross + order['total_amount'],
+                       tax + (order['tax_amount'] or Decimal('0.00')),
+                       discount + (order['discount_amount'] or Decimal('0.00')))
+
+    rows = [
+        {'day': day, 'payment_method': payment_method, 'employee_id': employee_id,
+         'order_count': count, 'gross_amount': gross, 'tax_amount': tax, 'discount_amount': discount}
+        for (day, payment_method, employee_id), (count, gross, tax, discount) in totals.items()
+    ]
+    upsert_increment_many(SalesDaily.__table__, ['day', 'payment_method', 'employee_id'], rows)
+
+
+def rebuild_sales_daily(start_day=None, end_day=None):
+    """
+    Recompute sales_daily rows for [start_day, end_day) from the orders table.
+
+    Either bound may be None to rebuild from the first / up to the last order.
+    Runs as one DELETE plus one INSERT ... SELECT, so the work stays in the
+    database regardless of order volume. The caller is responsible for committing.
+
+    Returns:
+        int: Number of rollup rows written
+    """
+    start, end = day_bounds(start_day, end_day)
+
+    clear = delete(SalesDaily)
+    if start_day:
+        clear = clear.where(SalesDaily.day >= start_day)
+    if end_day:
+        clear = clear.where(SalesDaily.day < end_day)
+    db.session.execute(clear)
+
+    order_day = func.date(Order.created_at)
+    source = db.session.query(
+        order_day,
+        Order.payment_method,
+        Order.employee_id,
+        func.count(Order.id),
+        func.coalesce(func.sum(Order.total_amount), 0),
+        func.coalesce(func.sum(Order.tax_amount), 0),
+        func.coalesce(func.sum(Order.discount_amount), 0)
+    ).filter(Order.created_at.isnot(None))
+    if start:
+        source = source.filter(Order.created_at >= start)
+    if end:
+        source = source.filter(Order.created_at < end)
+    source = source.group_by(order_day, Order.payment_method, Order.employee_id)
+
+    result = db.session.execute(
+        insert(SalesDaily).from_select(
+            ['day', 'payment_method', 'employee_id', 'order_count',
+             'gross_amount', 'tax_amount', 'discount_amount'],
+            source.statement
+        )
+    )
+    return result.rowcount
+
+
+def _in_range(query, start_day, end_day):
+    if start_day:
+        query = query.filter(SalesDaily.day >= start_day)
+    if end_day:
+        query = query.filter(SalesDaily.day < end_day)
+    return query
+
+
+def sales_totals(start_day=None, end_day=None):
+    """
+    Order count and gross sales for [start_day, end_day).
+
+    Returns:
+        tuple: (order_count, gross_amount) as (int, float)
+    """
+    query = db.session.query(
+        func.coalesce(func.sum(SalesDaily.order_count), 0),
+        func.coalesce(func.sum(SalesDaily.gross_amount), 0)
+    )
+    order_count, gross = _in_range(query, start_day, end_day).one()
+    return int(order_count), float(gross)
+
+
+def sales_by_payment_method(start_day=None, end_day=None):
+    """Rows of (payment_method, count, total) for [start_day, end_day)."""
+    query = db.session.query(
+        SalesDaily.payment_method,
+        func.sum(SalesDaily.order_count).label('count'),
+        func.sum(SalesDaily.gross_amount).label('total')
+    )
+    return _in_range(query, start_day, end_day)\
+        .group_by(SalesDaily.payment_method)\
+        .order_by(SalesDaily.payment_method).all()
+
+
+def sales_by_employee(start_day=None, end_day=None, order_by='total_sales', limit=None):
+    """Rows of (username, order_count, total_sales, avg_order_value) for employees."""
+    order_count = func.sum(SalesDaily.order_count)
+    total_sales = func.sum(SalesDaily.gross_amount)
+    query = db.session.query(
+        User.username,
+        order_count.label('order_count'),
+        total_sales.label('total_sales'),
+        (total_sales / order_count).label('avg_order_value')
+    ).join(User, User.id == SalesDaily.employee_id).filter(User.role == 'employee')
+    query = _in_range(query, start_day, end_day)\
+        .group_by(User.id, User.username)\
+        .order_by(desc(order_by))
+    if limit:
+        query = query.limit(limit)
+    return query.all()
+
+
+def last_n_days(days, today=None):
+    """Return the [start_day, end_day) range covering the last ``days`` days including today."""
+    today = today or datetime.utcnow().date()
+    return today - timedelta(days=days - 1), today + timedelta(days=1)
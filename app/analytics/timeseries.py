@@ -0,0 +1,179 @@
+from datetime import datetime, time, timedelta
+from sqlalchemy import func, cast, Integer, extract
+from ..models import db, Order, SalesDaily
+from ..utils.sql import dialect_name
+
+BUCKETS = ('hour', 'day', 'week', 'month', 'dow_hour')
+DAY_NAMES = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+
+# Canonical string formats shared by the SQL bucket keys and the gap filler
+_HOUR_FORMAT = '%Y-%m-%d %H:00:00'
+_DAY_FORMAT = '%Y-%m-%d'
+
+
+def _bucket_keys(bucket, column, dialect):
+    """
+    Return the SQL expressions identifying the ``bucket`` a ``column`` value falls in.
+
+    hour/day/week/month produce a single string key in _HOUR_FORMAT or
+    _DAY_FORMAT (weeks start on Monday, months on the 1st). dow_hour produces
+    two integer keys: day of week (Monday=0) and hour of day.
+    """
+    if bucket not in BUCKETS:
+        raise ValueError(f'Unknown bucket {bucket!r}; expected one of {", ".join(BUCKETS)}')
+
+    if dialect == 'sqlite':
+        if bucket == 'hour':
+            return [func.strftime(_HOUR_FORMAT, column)]
+        if bucket == 'day':
+            return [func.strftime(_DAY_FORMAT, column)]
+        if bucket == 'week':
+            return [func.date(column, '-6 days', 'weekday 1')]
+        if bucket == 'month':
+            return [func.strftime('%Y-%m-01', column)]
+        return [(cast(func.strftime('%w', column), Integer) + 6) % 7,
+                cast(func.strftime('%H', column), Integer)]
+
+    if dialect == 'mysql':
+        if bucket == 'hour':
+            return [func.date_format(column, _HOUR_FORMAT)]
+        if bucket == 'day':
+            return [func.date_format(column, _DAY_FORMAT)]
+        if bucket == 'week':
+            return [func.date_format(func.subdate(column, func.weekday(column)), _DAY_FORMAT)]
+        if bucket == 'month':
+            return [func.date_format(column, '%Y-%m-01')]
+        return [func.weekday(column), func.hour(column)]
+
+    # PostgreSQL and other dialects supporting date_trunc / to_char
+    if bucket == 'hour':
+        return [func.to_char(func.date_trunc('hour', column), 'YYYY-MM-DD HH24:00:00')]
+    if bucket in ('day', 'week', 'month'):
+        return [func.to_char(func.date_trunc(bucket, column), 'YYYY-MM-DD')]
+    return [cast(extract('isodow', column), Integer) - 1, cast(extract('hour', column), Integer)]
+
+
+def _as_datetime(value):
+    return value if isinstance(value, datetime) else datetime.combine(value, time.min)
+
+
+def _parse_key(bucket, values):
+    if bucket == 'dow_hour':
+        return int(values[0]), int(values[1])
+    if bucket == 'hour':
+        return datetime.strptime(values[0], _HOUR_FORMAT)
+    return datetime.strptime(values[0], _DAY_FORMAT).date()
+
+
+def bucket_start(bucket, value):
+    """Return the key of the bucket containing the date/datetime ``value``."""
+    if bucket == 'dow_hour':
+        return value.weekday(), getattr(value, 'hour', 0)
+    if bucket == 'hour':
+        return _as_datetime(value).replace(minute=0, second=0, microsecond=0)
+    day = value.date() if isinstance(value, datetime) else value
+    if bucket == 'week':
+        return day - timedelta(days=day.weekday())
+    if bucket == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def bucket_range(bucket, start, end):
+    """Yield every bucket key touching [start, end), in order."""
+    if bucket == 'dow_hour':
+        for dow in range(7):
+            for hour in range(24):
+                yield dow, hour
+        return
+
+    key = bucket_start(bucket, start)
+    end = _as_datetime(end)
+    while _as_datetime(key) < end:
+        yield key
+        if bucket == 'hour':
+            key += timedelta(hours=1)
+        elif bucket == 'day':
+            key += timedelta(days=1)
+        elif bucket == 'week':
+            key += timedelta(weeks=1)
+        else:
+            key = (key.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def series(bucket, time_column, measures, start, end, query=None):
+    """
+    Aggregate ``measures`` per ``bucket`` over [start, end) in one GROUP BY.
+
+    Args:
+        bucket: One of BUCKETS
+        time_column: Date/DateTime column to bucket on
+        measures: dict of name -> SQL aggregate expression
+        start, end: Half-open range bounds compared directly against ``time_column``
+        query: Optional base Query carrying extra joins/filters
+
+    Returns:
+        list of dict: One entry per bucket, gaps filled with zeros, each with a
+        'bucket' key plus one float per measure
+    """
+    keys = _bucket_keys(bucket, time_column, dialect_name())
+    names = list(measures)
+
+    base = query if query is not None else db.session.query()
+    rows = base.add_columns(
+        *[key.label(f'bucket_{i}') for i, key in enumerate(keys)],
+        *[func.coalesce(expr, 0).label(name) for name, expr in measures.items()]
+    ).filter(
+        time_column >= start,
+        time_column < end
+    ).group_by(*keys).all()
+
+    found = {}
+    for row in rows:
+        values = tuple(row)
+        found[_parse_key(bucket, values[:len(keys)])] = values[len(keys):]
+
+    result = []
+    for key in bucket_range(bucket, start, end):
+        values = found.get(key)
+        entry = {'bucket': key}
+        for i, name in enumerate(names):
+            entry[name] = float(values[i]) if values else 0.0
+        result.append(entry)
+    return result
+
+
+def _day_aligned(value):
+    return not isinstance(value, datetime) or value.time() == time.min
+
+
+def sales_series(bucket, start, end):
+    """
+    Gap-filled sales ('sales', 'orders') per ``bucket`` over [start, end).
+
+    Day, week and month buckets over whole days are answered from the
+    sales_daily rollup; everything else groups the orders table directly.
+    """
+    if bucket in ('day', 'week', 'month') and _day_aligned(start) and _day_aligned(end):
+        start_day = start.date() if isinstance(start, datetime) else start
+        end_day = end.date() if isinstance(end, datetime) else end
+        return series(bucket, SalesDaily.day, {
+            'sales': func.sum(SalesDaily.gross_amount),
+            'orders': func.sum(SalesDaily.order_count)
+        }, start_day, end_day)
+
+    return series(bucket, Order.created_at, {
+        'sales': func.sum(Order.total_amount),
+        'orders': func.count(Order.id)
+    }, _as_datetime(start), _as_datetime(end))
+
+
+def bucket_label(bucket, key):
+    """Human-readable label for a bucket key (used for chart axes)."""
+    if bucket == 'dow_hour':
+        return f'{DAY_NAMES[key[0]]} {key[1]:02d}:00'
+    if bucket == 'hour':
+        return key.strftime('%Y-%m-%d %H:00')
+    if bucket == 'month':
+        return key.strftime('%Y-%m')
+    return key.strftime('%Y-%m-%d')
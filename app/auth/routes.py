@@ -1,4 +1,5 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, current_app
+from flask_wtf.csrf import generate_csrf
 from flask_login import login_user, logout_user, login_required, current_user
 from werkzeug.urls import url_parse
 from .forms import LoginForm
@@ -44,4 +45,17 @@ def login():
 def logout():
     logout_user()
     flash('You have been logged out.', 'info')
-    return redirect(url_for('auth.login'))
\ No newline at end of file
+    return redirect(url_for('auth.login'))
+
+
+@auth_bp.route('/csrf-token')
+def csrf_token():
+    """
+    JSON API: CSRF token of the caller's session, for clients without a page to read it from.
+
+    Tills and scripts fetch it once, log in by posting it as the login form's
+    csrf_token field, then send it in the X-CSRFToken header of their JSON
+    POSTs. The token lasts for the session, up to WTF_CSRF_TIME_LIMIT seconds.
+    """
+    return jsonify({'csrf_token': generate_csrf(),
+                    'expires_in': current_app.config.get('WTF_CSRF_TIME_LIMIT')})
@@ -1,6 +1,7 @@
+import uuid
 from flask_wtf import FlaskForm
 from wtforms import IntegerField, SelectField, SubmitField, HiddenField
-from wtforms.validators import DataRequired, NumberRange
+from wtforms.validators import DataRequired, NumberRange, Optional, Length
 
 
 class AddToCartForm(FlaskForm):
@@ -22,4 +23,7 @@ class CheckoutForm(FlaskForm):
     payment_method = SelectField('Payment Method',
                                choices=[('cash', 'Cash'), ('upi', 'UPI')],
                                validators=[DataRequired()])
+    # New per rendering of the form; a resubmission carries the same key
+    idempotency_key = HiddenField(validators=[Optional(), Length(max=64)],
+                                default=lambda: uuid.uuid4().hex)
     submit = SubmitField('Complete Order')
\ No newline at end of file
@@ -1,17 +1,36 @@
 from flask import Blueprint, render_template, redirect, url_for, flash, request, session, current_app
 from flask_login import login_required, current_user
-from sqlalchemy import or_
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
 from ..models import db
 from .forms import AddToCartForm, UpdateCartForm, CheckoutForm
 from ..utils.decorators import employee_required
-from ..utils.helpers import (get_cart, add_to_cart, update_cart_item, remove_from_cart,
-                          clear_cart, get_cart_total, calculate_tax, validate_cart_stock)
+from ..analytics.rollups import record_order
+from ..analytics.product_sales import record_order_items
+from ..utils.helpers import (add_to_cart, update_cart_item, remove_from_cart,
+                          clear_cart, get_cart_count, order_item_counts)
+from ..utils.cart_view import CartView
+from ..utils.stock import decrement_stock
+from ..utils.reservations import held_quantities, release_holds
+from ..utils.search import product_search
+from ..utils.catalog_cache import catalog_cache
+from ..utils.categories import category_names
+from ..utils.pagination import paginate_listing
+from ..utils.timing import PhaseTimer
 from config import Config
 from decimal import Decimal
 
 employee_bp = Blueprint('employee', __name__)
 
 
+@employee_bp.context_processor
+def inject_cart_count():
+    """Number of lines in the cart, for the navbar badge."""
+    if not current_user.is_authenticated:
+        return {'cart_count': 0}
+    return {'cart_count': get_cart_count()}
+
+
 @employee_bp.route('/dashboard')
 @employee_required
 def dashboard():
@@ -39,23 +58,21 @@ def products():
 
     query = Product.query.filter(Product.stock_qty > 0)  # Only show products in stock
 
-    if search:
-        query = query.filter(
-            or_(Product.name.ilike(f'%{search}%'),
-                Product.id.ilike(f'%{search}%'),
-                Product.category.ilike(f'%{search}%'))
-        )
-
     if category:
         query = query.filter(Product.category == category)
 
-    products = query.order_by(Product.name)\
-                   .paginate(page=page, per_page=Config.ITEMS_PER_PAGE, error_out=False)
+    def load_page():
+        if search:
+            # Best matches first, from the search index rather than a table scan
+            return product_search.paginate(query, search, page, Config.ITEMS_PER_PAGE, category=category)
+        return paginate_listing(query, (Product.name, Product.id), total_key=('employee.products', category))
 
-    categories = db.session.query(Product.category)\
-                         .distinct()\
-                         .order_by(Product.category)\
-                         .all()
+    # Served from the per-worker catalog cache; stock figures lag by at most CATALOG_CACHE_STOCK_TTL
+    products = catalog_cache.get_page((search, category, page, request.args.get('cursor')), load_page)
+
+    # Stock not held by any cart, from one grouped SUM over the page's products
+    held = held_quantities([product.id for product in products.items])
+    available = {product.id: product.stock_qty - held.get(product.id, 0) for product in products.items}
 
     # Add cart form for each product
     cart_forms = {}
@@ -69,7 +86,8 @@ def products():
                          products=products,
                          search=search,
                          category=category,
-                         categories=[cat[0] for cat in categories],
+                         categories=category_names(),
+                         available=available,
                          cart_forms=cart_forms)
 
 
@@ -84,10 +102,19 @@ def add_to_cart_route(product_id):
         flash(f'Sorry, {product.name} is out of stock.', 'warning')
         return redirect(url_for('employee.products'))
 
+    # Units held by carts (this one included) are not available to add
+    available = product.stock_qty - held_quantities([product.id]).get(product.id, 0)
+    if available <= 0:
+        flash(f'Sorry, all remaining {product.name} stock is held in carts.', 'warning')
+        return redirect(url_for('employee.products'))
+
     form = AddToCartForm()
     if form.validate_on_submit():
-        add_to_cart(product_id, form.quantity.data)
-        flash(f'Added {form.quantity.data} x {product.name} to cart.', 'success')
+        if form.quantity.data > available:
+            flash(f'Only {available} more {product.name} available.', 'warning')
+        else:
+            add_to_cart(product_id, form.quantity.data)
+            flash(f'Added {form.quantity.data} x {product.name} to cart.', 'success')
     else:
         flash('Invalid quantity.', 'danger')
 
@@ -98,37 +125,14 @@ def add_to_cart_route(product_id):
 @employee_required
 def cart():
     """View and manage cart."""
-    from ..models import Product  # type: ignore[attr-defined]  # Import inside function
-    cart_data = get_cart()
-    cart_items = []
-    total = Decimal('0.00')
-
-    if cart_data:
-        # Get products for cart items
-        product_ids = list(cart_data.keys())
-        products = Product.query.filter(Product.id.in_(product_ids)).all()
-        products_dict = {str(p.id): p for p in products}
-
-        for product_id, quantity in cart_data.items():
-            product = products_dict.get(product_id)
-            if product:
-                line_total = product.price * quantity
-                cart_items.append({
-                    'product': product,
-                    'quantity': quantity,
-                    'line_total': line_total
-                })
-                total += line_total
-
-        # Sort cart items by product name
-        cart_items.sort(key=lambda x: x['product'].name)
+    cart_view = CartView.current()
 
     # Handle cart updates
     if request.method == 'POST':
         action = request.form.get('action')
 
         if action == 'update':
-            for item in cart_items:
+            for item in cart_view:
                 quantity_field = f'quantity_{item["product"].id}'
                 new_quantity = request.form.get(quantity_field, type=int)
 
@@ -137,19 +141,18 @@ def cart():
                         remove_from_cart(item['product'].id)
                         flash(f'Removed {item["product"].name} from cart.', 'info')
                     elif new_quantity != item['quantity']:
-                        if new_quantity > item['product'].stock_qty:
-                            flash(f'Cannot update {item["product"].name}. Only {item["product"].stock_qty} in stock.', 'warning')
+                        if new_quantity > item['product'].available:
+                            flash(f'Cannot update {item["product"].name}. Only {item["product"].available} available.', 'warning')
                         else:
                             update_cart_item(item['product'].id, new_quantity)
                             flash(f'Updated {item["product"].name} quantity to {new_quantity}.', 'success')
 
         elif action == 'remove':
             product_id = request.form.get('product_id', type=int)
-            if product_id:
-                product = products_dict.get(str(product_id))
-                if product:
-                    remove_from_cart(product_id)
-                    flash(f'Removed {product.name} from cart.', 'info')
+            item = cart_view.get(product_id) if product_id else None
+            if item:
+                remove_from_cart(product_id)
+                flash(f'Removed {item["product"].name} from cart.', 'info')
 
         elif action == 'clear':
             clear_cart()
@@ -157,15 +160,12 @@ def cart():
 
         return redirect(url_for('employee.cart'))
 
-    tax = calculate_tax(total)
-    grand_total = total + tax
-
     return render_template('employee/cart.html',
                          title='Shopping Cart',
-                         cart_items=cart_items,
-                         total=total,
-                         tax=tax,
-                         grand_total=grand_total)
+                         cart_items=cart_view.lines,
+                         total=cart_view.subtotal,
+                         tax=cart_view.tax,
+                         grand_total=cart_view.total)
 
 
 @employee_bp.route('/cart/remove/<int:product_id>', methods=['POST'])
@@ -192,83 +192,125 @@ def clear_cart_route():
     return redirect(url_for('employee.cart'))
 
 
+def _replayed_checkout(key):
+    """
+    Redirect to the order an earlier submission of the checkout form completed, if any.
+
+    One probe of the unique idempotency_key index; only run when a submission
+    cannot go through normally, so the happy path does not pay for it.
+    """
+    from ..models import Order  # type: ignore[attr-defined]  # Import inside function
+    if not key:
+        return None
+    order_id = db.session.scalar(
+        select(Order.id).where(Order.idempotency_key == key, Order.employee_id == current_user.id)
+    )
+    if order_id is None:
+        return None
+    flash(f'Order #{order_id} was already completed.', 'info')
+    return redirect(url_for('employee.orders'))
+
+
 @employee_bp.route('/checkout', methods=['GET', 'POST'])
 @employee_required
 def checkout():
     """Checkout process."""
-    from ..models import Product, Order, OrderItem  # type: ignore[attr-defined]  # Import inside function
-    cart_data = get_cart()
-
-    if not cart_data:
+    from ..models import Order, OrderItem  # type: ignore[attr-defined]  # Import inside function
+    timer = PhaseTimer()
+    cart_view = CartView.current()
+    # Key of a submitted form; a double submit sends the same one again
+    idempotency_key = request.form.get('idempotency_key') or None
+
+    if not cart_view:
+        # The first submission may have completed and emptied the cart
+        replayed = _replayed_checkout(idempotency_key)
+        if replayed:
+            return replayed
         flash('Your cart is empty.', 'warning')
         return redirect(url_for('employee.products'))
-
-    # Get cart items with validation
-    product_ids = list(cart_data.keys())
-    products = Product.query.filter(Product.id.in_(product_ids)).all()
-    products_dict = {str(p.id): p for p in products}
-
-    cart_items = []
-    subtotal = Decimal('0.00')
-
-    for product_id, quantity in cart_data.items():
-        product = products_dict.get(product_id)
-        if product:
-            line_total = product.price * quantity
-            cart_items.append({
-                'product': product,
-                'quantity': quantity,
-                'line_total': line_total
-            })
-            subtotal += line_total
+    timer.mark('hydrate')
 
     # Validate stock availability
-    stock_validation = validate_cart_stock(cart_data, [item['product'] for item in cart_items])
+    stock_validation = cart_view.validate()
     if not stock_validation['valid']:
+        replayed = _replayed_checkout(idempotency_key)
+        if replayed:
+            return replayed
         for error in stock_validation['errors']:
             flash(error, 'danger')
         return redirect(url_for('employee.cart'))
 
-    tax = calculate_tax(subtotal)
-    total = subtotal + tax
-
     form = CheckoutForm()
+    timer.mark('validate')
 
     if form.validate_on_submit():
         try:
-            # Create order in transaction
-            with db.session.begin():
-                # Create order
-                order = Order(
-                    employee_id=current_user.id,
-                    total_amount=total,
-                    tax_amount=tax,
-                    discount_amount=Decimal('0.00'),
-                    payment_method=form.payment_method.data
-                )
-                db.session.add(order)
-                db.session.flush()  # Get order ID
-
-                # Create order items and update stock
-                for item in cart_items:
-                    order_item = OrderItem(
-                        order_id=order.id,
-                        product_id=item['product'].id,
-                        product_name_snapshot=item['product'].name,
-                        unit_price_snapshot=item['product'].price,
-                        quantity=item['quantity'],
-                        line_total=item['line_total']
-                    )
-                    db.session.add(order_item)
-
-                    # Update product stock
-                    item['product'].stock_qty -= item['quantity']
-
-                # Clear cart
-                clear_cart()
+            # Take the stock first, all lines in one conditional UPDATE; it fails
+            # rather than oversells, or takes units other carts hold, when another
+            # checkout or cart got there since validation
+            if not decrement_stock({item.product.id: item.quantity for item in cart_view}, holder=current_user.id):
+                db.session.rollback()
+                replayed = _replayed_checkout(idempotency_key)
+                if replayed:
+                    return replayed
+                cart_view.load()  # Re-read stock to say which line fell short
+                stock_validation = cart_view.validate()
+                for error in stock_validation['errors'] or ['Stock changed during checkout. Please try again.']:
+                    flash(error, 'danger')
+                return redirect(url_for('employee.cart'))
+            # The cart's holds become this sale, in the same transaction
+            release_holds(current_user.id, [item.product.id for item in cart_view])
+            timer.mark('stock')
+
+            # Create order in the session's current transaction
+            order = Order(
+                employee_id=current_user.id,
+                total_amount=cart_view.total,
+                tax_amount=cart_view.tax,
+                discount_amount=Decimal('0.00'),
+                payment_method=form.payment_method.data,
+                idempotency_key=idempotency_key
+            )
+            db.session.add(order)
+            db.session.flush()  # Get order ID
+
+            # All order items in one executemany
+            order_items = [{
+                'order_id': order.id,
+                'product_id': item.product.id,
+                'product_name_snapshot': item.product.name,
+                'unit_price_snapshot': item.product.price,
+                'unit_cost_snapshot': item.product.unit_cost,
+                'quantity': item.quantity,
+                'line_total': item.line_total
+            } for item in cart_view]
+            db.session.execute(insert(OrderItem), order_items)
+
+            # Keep the daily sales and per-product rollups in step with the order
+            record_order(order)
+            record_order_items(order, order_items)
+            timer.mark('insert')
+
+            db.session.commit()
+            timer.mark('commit')
+            current_app.logger.info(f'Checkout #{order.id} ({len(order_items)} lines): {timer.summary()}')
+
+            # Clear cart
+            clear_cart()
 
             flash(f'Order #{order.id} completed successfully!', 'success')
-            return redirect(url_for('employee.orders'))
+            response = redirect(url_for('employee.orders'))
+            response.headers['Server-Timing'] = timer.server_timing()
+            return response
+
+        except IntegrityError as e:
+            # A concurrent submission with the same key got its order in first
+            db.session.rollback()
+            replayed = _replayed_checkout(idempotency_key)
+            if replayed:
+                return replayed
+            flash('An error occurred while processing your order. Please try again.', 'danger')
+            current_app.logger.error(f'Checkout error: {str(e)}')
 
         except Exception as e:
             db.session.rollback()
@@ -277,10 +319,10 @@ def checkout():
 
     return render_template('employee/checkout.html',
                          title='Checkout',
-                         cart_items=cart_items,
-                         subtotal=subtotal,
-                         tax=tax,
-                         total=total,
+                         cart_items=cart_view.lines,
+                         subtotal=cart_view.subtotal,
+                         tax=cart_view.tax,
+                         total=cart_view.total,
                          form=form)
 
 
@@ -289,12 +331,12 @@ def checkout():
 def orders():
     """View employee's order history."""
     from ..models import Order  # type: ignore[attr-defined]  # Import inside function
-    page = request.args.get('page', 1, type=int)
-
-    orders = Order.query.filter_by(employee_id=current_user.id)\
-                       .order_by(Order.created_at.desc())\
-                       .paginate(page=page, per_page=Config.ITEMS_PER_PAGE, error_out=False)
+    # Newest first by cursor, seeking into the (employee_id, created_at) index
+    orders = paginate_listing(Order.query.filter_by(employee_id=current_user.id),
+                              (Order.created_at, Order.id), descending=True,
+                              total_key=('employee.orders', current_user.id))
 
     return render_template('employee/orders_list.html',
                          title='My Orders',
-                         orders=orders)
\ No newline at end of file
+                         orders=orders,
+                         item_counts=order_item_counts(orders.items))
\ No newline at end of file
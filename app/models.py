@@ -1,7 +1,9 @@
 from datetime import datetime
+from decimal import Decimal, ROUND_HALF_UP
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import UserMixin
 from flask_sqlalchemy import SQLAlchemy
+from config import Config
 
 # Create db instance here to avoid circular imports
 db = SQLAlchemy()
@@ -35,17 +37,42 @@ class User(UserMixin, db.Model):
         return f'<User {self.username} ({self.role})>'
 
 
+class Category(db.Model):
+    # Product categories with counts and stock totals maintained by utils.categories
+    __tablename__ = 'categories'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(50), unique=True, nullable=False)
+    product_count = db.Column(db.Integer, nullable=False, default=0)
+    stock_units = db.Column(db.Integer, nullable=False, default=0)
+    stock_value = db.Column(db.Numeric(14, 2), nullable=False, default=0)  # sum of price x stock_qty
+
+    def __repr__(self):
+        return f'<Category {self.name} ({self.product_count} products)>'
+
+
 class Product(db.Model):
     __tablename__ = 'products'
+    __table_args__ = (
+        db.UniqueConstraint('sku', name='uq_products_sku'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False, index=True)
-    price = db.Column(db.Numeric(10, 2), nullable=False)
-    stock_qty = db.Column(db.Integer, nullable=False, default=0)
+    sku = db.Column(db.String(64), nullable=True)  # supplier stock-keeping unit
+    # Active history: the category totals (utils.categories) need the values an
+    # edit replaces, even when the attribute was expired by a commit beforehand
+    price = db.column_property(db.Column(db.Numeric(10, 2), nullable=False), active_history=True)
+    cost_price = db.Column(db.Numeric(10, 2), nullable=True)
+    stock_qty = db.column_property(db.Column(db.Integer, nullable=False, default=0), active_history=True)
     category = db.Column(db.String(50), nullable=False, index=True)
+    # Set from ``category`` on every write (utils.categories); reports group on it
+    category_id = db.column_property(db.Column(db.Integer, db.ForeignKey('categories.id'), nullable=True, index=True),
+                                     active_history=True)
     image_url = db.Column(db.String(500), nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Indexed for incremental backups (utils.backup) and the search refresh (utils.search)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
 
     # Relationships
     order_items = db.relationship('OrderItem', backref='product', lazy='dynamic')
@@ -60,21 +87,35 @@ class Product(db.Model):
     def display_price(self):
         return f"${self.price}"
 
+    @property
+    def unit_cost(self):
+        """Cost price, falling back to DEFAULT_COST_RATIO of the selling price."""
+        if self.cost_price is not None:
+            return self.cost_price
+        ratio = Decimal(str(Config.DEFAULT_COST_RATIO))
+        return (self.price * ratio).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
     def __repr__(self):
         return f'<Product {self.name} (${self.price})>'
 
 
 class Order(db.Model):
     __tablename__ = 'orders'
+    __table_args__ = (
+        # Per-employee order history and date-ranged employee reports
+        db.Index('ix_orders_employee_id_created_at', 'employee_id', 'created_at'),
+        db.UniqueConstraint('idempotency_key', name='uq_orders_idempotency_key'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     employee_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     total_amount = db.Column(db.Numeric(10, 2), nullable=False)
     tax_amount = db.Column(db.Numeric(10, 2), nullable=False, default=0)
     discount_amount = db.Column(db.Numeric(10, 2), nullable=False, default=0)
     payment_method = db.Column(db.String(20), nullable=False)  # 'cash' or 'upi'
     status = db.Column(db.String(20), nullable=False, default='completed')
+    idempotency_key = db.Column(db.String(64), nullable=True)  # from the checkout form, see employee.checkout
 
     # Relationships
     order_items = db.relationship('OrderItem', backref='order', lazy='dynamic', cascade='all, delete-orphan')
@@ -101,14 +142,107 @@ class Order(db.Model):
 
 class OrderItem(db.Model):
     __tablename__ = 'order_items'
+    __table_args__ = (
+        # Per-product sales joined back to their orders
+        db.Index('ix_order_items_product_id_order_id', 'product_id', 'order_id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    order_id = db.Column(db.Integer, db.ForeignKey('orders.id'), nullable=False)
+    order_id = db.Column(db.Integer, db.ForeignKey('orders.id'), nullable=False, index=True)
     product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False)
     product_name_snapshot = db.Column(db.String(100), nullable=False)
     unit_price_snapshot = db.Column(db.Numeric(10, 2), nullable=False)
+    unit_cost_snapshot = db.Column(db.Numeric(10, 2), nullable=True)
     quantity = db.Column(db.Integer, nullable=False)
     line_total = db.Column(db.Numeric(10, 2), nullable=False)
 
     def __repr__(self):
-        return f'<OrderItem {self.product_name_snapshot} x{self.quantity} (${self.line_total})>'
\ No newline at end of file
+        return f'<OrderItem {self.product_name_snapshot} x{self.quantity} (${self.line_total})>'
+
+
+class CartItem(db.Model):
+    # One line of an employee's open cart, kept server-side by utils.cart_store
+    __tablename__ = 'cart_items'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'product_id', name='uq_cart_items_user_product'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id', ondelete='CASCADE'), nullable=False)
+    quantity = db.Column(db.Integer, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<CartItem user={self.user_id} product={self.product_id} x{self.quantity}>'
+
+
+class StockHold(db.Model):
+    # Stock set aside for a cart line until expires_at, see utils.reservations
+    __tablename__ = 'stock_holds'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'product_id', name='uq_stock_holds_user_product'),
+        # Active holds per product are summed from this index alone
+        db.Index('ix_stock_holds_product_expires', 'product_id', 'expires_at', 'quantity'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id', ondelete='CASCADE'), nullable=False)
+    quantity = db.Column(db.Integer, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<StockHold user={self.user_id} product={self.product_id} x{self.quantity} until {self.expires_at}>'
+
+
+class SalesDaily(db.Model):
+    # Rollup of orders per day x payment method x employee, maintained by checkout
+    __tablename__ = 'sales_daily'
+    __table_args__ = (
+        db.UniqueConstraint('day', 'payment_method', 'employee_id', name='uq_sales_daily_key'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False, index=True)
+    payment_method = db.Column(db.String(20), nullable=False)
+    employee_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    order_count = db.Column(db.Integer, nullable=False, default=0)
+    gross_amount = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    tax_amount = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    discount_amount = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<SalesDaily {self.day} {self.payment_method} user={self.employee_id} (${self.gross_amount})>'
+
+
+class ProductSalesDaily(db.Model):
+    # Units, revenue and cost per product per day, maintained by checkout
+    __tablename__ = 'product_sales_daily'
+    __table_args__ = (
+        db.UniqueConstraint('product_id', 'day', name='uq_product_sales_daily_key'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False)
+    day = db.Column(db.Date, nullable=False, index=True)
+    units_sold = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    cost = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<ProductSalesDaily {self.day} product={self.product_id} x{self.units_sold}>'
+
+
+class ProductSalesStats(db.Model):
+    # Lifetime sales totals per product, maintained by checkout
+    __tablename__ = 'product_sales_stats'
+
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), primary_key=True)
+    units_sold = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    cost = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    last_sold_at = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f'<ProductSalesStats product={self.product_id} x{self.units_sold}>'
@@ -1,4 +1,4 @@
-from flask import Blueprint, render_template, abort
+from flask import Blueprint, render_template, abort, request, jsonify, current_app
 from flask_login import login_required, current_user
 from ..utils.decorators import admin_or_employee_required
 from config import Config
@@ -34,4 +34,28 @@ def invoice(order_id):
                          store_address=Config.STORE_ADDRESS,
                          store_phone=Config.STORE_PHONE,
                          store_email=Config.STORE_EMAIL,
-                         auto_print=auto_print)
\ No newline at end of file
+                         auto_print=auto_print)
+
+
+@orders_bp.route('/api/batch', methods=['POST'])
+@admin_or_employee_required
+def batch_checkout_api():
+    """JSON API: record a batch of orders made offline by a till and return per-order results."""
+    from ..utils.order_sync import sync_orders
+
+    data = request.get_json(silent=True)
+    orders = data.get('orders') if isinstance(data, dict) else None
+    if not isinstance(orders, list):
+        return jsonify({'error': 'Expected {"orders": [{"client_id": ..., "created_at": ..., '
+                                 '"payment_method": ..., "items": [{"product_id" or "sku": ..., "quantity": ...}]}]}'}), 400
+    max_batch = current_app.config.get('ORDER_SYNC_MAX_BATCH', 1000)
+    if len(orders) > max_batch:
+        return jsonify({'error': f'At most {max_batch} orders per batch'}), 413
+
+    results = sync_orders(orders, current_user.id)
+    return jsonify({
+        'created': sum(1 for result in results if result['status'] == 'created'),
+        'duplicates': sum(1 for result in results if result['status'] == 'duplicate'),
+        'rejected': sum(1 for result in results if result['status'] not in ('created', 'duplicate')),
+        'results': results
+    })
@@ -0,0 +1,507 @@
+import json
+import os
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from sqlalchemy import Date, DateTime, Numeric, delete, func, insert, or_, select, text
+from ..models import db
+from .sql import upsert_rows
+
+BACKUP_FORMAT = 'gsms-backup'
+BACKUP_VERSION = '2.0'
+
+# Tables in foreign-key-safe order: parents before children. Backups are
+# written in this order and restores insert in it (and delete in reverse).
+# Rollup tables are not backed up; they are rebuilt after a restore, and so
+# are the categories' totals.
+BACKUP_TABLES = ('users', 'categories', 'products', 'orders', 'order_items')
+
+# Tables that are not backed up but reference users or products: a truncating
+# restore empties them first, children before parents, or the foreign keys
+# block the delete. The rollups are rebuilt after the restore; carts and stock
+# holds of the replaced catalog are dropped.
+DEPENDENT_TABLES = ('stock_holds', 'cart_items', 'product_sales_stats', 'product_sales_daily', 'sales_daily')
+
+# Columns holding credentials. They are only written when a backup asks for
+# them (the CLI's server-side backups do, the admin download does not by
+# default); users restored from a backup without them get LOCKED_PASSWORD,
+# which matches no password, until an admin resets theirs.
+CREDENTIAL_COLUMNS = {'users': ('password_hash',)}
+LOCKED_PASSWORD = '!'
+
+# How incremental backups find new or changed rows, per table:
+#   ('id', column)        rows whose id is above the previous high-water mark
+#                         (orders and their items are never edited after checkout)
+#   ('timestamp', column) rows modified since the previous high-water mark
+#   None                  small tables, re-exported in full every time
+# Deleted rows are not tracked; take a new full backup to drop them.
+WATERMARKS = {
+    'users': None,
+    'categories': None,
+    'products': ('timestamp', 'updated_at'),
+    'orders': ('id', 'id'),
+    'order_items': ('id', 'id')
+}
+
+# Rows of a transaction still open when a backup's marks are read can land
+# at or below them: auto-increment ids are taken at insert, not at commit.
+# Such rows are not in the backup's snapshot, so the ids missing below an
+# id mark ("holes") are recorded with it and the next incremental re-reads
+# them; a row is only lost if its transaction stays open from one backup
+# until after the next. Ids of rolled-back inserts stay missing for good, so
+# holes are kept for one backup and capped at the MAX_HOLES highest ranges
+# (in-flight rows sit just below the mark). Timestamp marks are re-read
+# TIME_OVERLAP back instead. Replays upsert, so re-read rows are harmless.
+MAX_HOLES = 1000
+TIME_OVERLAP = timedelta(minutes=5)
+
+MANIFEST_NAME = 'manifest.json'
+
+
+class Progress:
+    """
+    Per-table row counter with elapsed time and throughput.
+
+    If ``report`` is given it is called with the Progress every time another
+    ``every`` rows have been counted, e.g. to print a progress line.
+    """
+
+    def __init__(self, report=None, every=100000):
+        self.counts = {}
+        self.started = time.monotonic()
+        self.report = report
+        self.every = every
+        self._next_report = every
+
+    def add(self, table, rows):
+        self.counts[table] = self.counts.get(table, 0) + rows
+        if self.report and self.rows >= self._next_report:
+            self._next_report = (self.rows // self.every + 1) * self.every
+            self.report(self)
+
+    @property
+    def rows(self):
+        return sum(self.counts.values())
+
+    @property
+    def seconds(self):
+        return time.monotonic() - self.started
+
+    @property
+    def rate(self):
+        seconds = self.seconds
+        return self.rows / seconds if seconds > 0 else 0.0
+
+    def summary(self):
+        tables = ', '.join(f'{name}={count}' for name, count in self.counts.items())
+        return f'{self.rows} rows in {self.seconds:.1f}s ({self.rate:,.0f} rows/s) [{tables}]'
+
+
+def _encode(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def _decoder(column):
+    if isinstance(column.type, DateTime):
+        return lambda value: datetime.fromisoformat(value) if value is not None else None
+    if isinstance(column.type, Date):
+        return lambda value: date.fromisoformat(value) if value is not None else None
+    if isinstance(column.type, Numeric):
+        return lambda value: Decimal(value) if value is not None else None
+    return lambda value: value
+
+
+def table_chunks(table, chunk_size=1000, after=None, conditions=(), columns=None):
+    """
+    Yield lists of rows of ``table`` in primary-key order, ``chunk_size`` at a time.
+
+    Uses keyset pagination (WHERE id > :last ORDER BY id LIMIT n), so each
+    chunk is a short indexed query and no cursor stays open between chunks.
+
+    Args:
+        table: SQLAlchemy Table with a single-column primary key
+        chunk_size: Rows per chunk
+        after: Optional primary key value to start after
+        conditions: Extra WHERE clauses restricting the rows
+        columns: Optional columns to read, including the primary key; all by default
+    """
+    pk = table.primary_key.columns.values()[0]
+    last = after
+    while True:
+        statement = select(*(columns or [table])).where(*conditions).order_by(pk).limit(chunk_size)
+        if last is not None:
+            statement = statement.where(pk > last)
+        rows = db.session.execute(statement).all()
+        if not rows:
+            return
+        yield rows
+        last = rows[-1]._mapping[pk]
+
+
+def current_watermarks(tables=BACKUP_TABLES):
+    """
+    High-water mark (max id or max timestamp) of every watermarked table.
+
+    Read children first: an order item within its table's mark then always
+    belongs to an order within the orders mark. backup_chunks reads them as
+    the first statement of the export's transaction, so under REPEATABLE
+    READ (MySQL's default) the marks and the exported rows share a snapshot.
+    """
+    marks = {}
+    for name in reversed(tables):
+        if WATERMARKS.get(name):
+            column = db.metadata.tables[name].c[WATERMARKS[name][1]]
+            marks[name] = _encode(db.session.query(func.max(column)).scalar())
+    return marks
+
+
+def _incremental_conditions(name, since, until, holes=()):
+    """
+    WHERE clauses selecting the rows of ``name`` changed after ``since``.
+
+    Id-watermarked tables also stop at ``until``, so a backup holds the
+    orders and items up to one consistent point, and re-read the ``holes``
+    (id ranges) the previous backup found missing below its mark.
+    Timestamp-watermarked tables are read without an upper bound: a product
+    written while the backup runs must still be in it for the order items
+    referencing it, and a full backup also keeps the rows whose timestamp
+    is NULL.
+    """
+    if not WATERMARKS.get(name):
+        return []
+    kind, column_name = WATERMARKS[name]
+    column = db.metadata.tables[name].c[column_name]
+    decode = _decoder(column)
+
+    conditions = []
+    if kind == 'id' and until is not None:
+        conditions.append(column <= decode(until))
+    if since is not None:
+        if kind == 'id':
+            conditions.append(or_(column > decode(since),
+                                  *[column.between(first, last) for first, last in holes]))
+        else:
+            conditions.append(column >= decode(since) - TIME_OVERLAP)
+    return conditions
+
+
+class _HoleFinder:
+    """Collects the id ranges missing from an ascending run of ids up to a mark."""
+
+    def __init__(self, after):
+        self.last = after
+        self.holes = []
+
+    def add(self, ids):
+        for row_id in ids:
+            # Ids at or below the previous mark are re-read holes, not new ground
+            if self.last is not None and row_id > self.last + 1:
+                self.holes.append([self.last + 1, row_id - 1])
+            if self.last is None or row_id > self.last:
+                self.last = row_id
+
+    def finish(self, mark):
+        if self.last is not None and mark is not None and mark > self.last:
+            self.holes.append([self.last + 1, mark])
+        return self.holes[-MAX_HOLES:]
+
+
+def backup_chunks(tables=BACKUP_TABLES, chunk_size=1000, progress=None, since=None, parent=None, holes=None,
+                  credentials=True):
+    """
+    Generate an NDJSON backup of ``tables`` as text chunks.
+
+    The stream is a meta line, then for every table a header line naming its
+    columns followed by one JSON array per row, and finally an end line with
+    the row counts so restores can detect truncated files.
+
+    The meta line records the high-water marks the backup was taken up to.
+    Passing a previous backup's marks as ``since`` produces an incremental
+    backup holding only rows added or changed after them (see WATERMARKS).
+    The end line records the holes below the id marks, which the next
+    incremental takes as ``holes``.
+
+    Args:
+        tables: Table names, in foreign-key-safe order
+        chunk_size: Rows read and emitted per chunk
+        progress: Optional Progress updated as rows are written
+        since: Optional watermarks of the previous backup (incremental mode)
+        parent: Optional file name of the previous backup, recorded in the meta line
+        holes: Optional holes of the previous backup, {table: [[first, last], ...]}
+        credentials: Whether to write CREDENTIAL_COLUMNS (password hashes)
+    """
+    progress = progress or Progress()
+    watermarks = current_watermarks(tables)
+    yield json.dumps({
+        'type': 'meta',
+        'format': BACKUP_FORMAT,
+        'version': BACKUP_VERSION,
+        'created_at': datetime.utcnow().isoformat(),
+        'tables': list(tables),
+        'mode': 'incremental' if since is not None else 'full',
+        'parent': parent,
+        'since': since,
+        'watermarks': watermarks,
+        'credentials': credentials
+    }) + '\n'
+
+    counts = {}
+    found = {}
+    for name in tables:
+        table = db.metadata.tables[name]
+        previous = (since or {}).get(name)
+        conditions = _incremental_conditions(name, previous, watermarks.get(name), (holes or {}).get(name, ()))
+        finder = None
+        if (WATERMARKS.get(name) or ('',))[0] == 'id':
+            finder = _HoleFinder(_decoder(table.c[WATERMARKS[name][1]])(previous) if previous is not None else None)
+        columns = [column for column in table.columns
+                   if credentials or column.name not in CREDENTIAL_COLUMNS.get(name, ())]
+        yield json.dumps({'type': 'table', 'name': name,
+                          'columns': [column.name for column in columns]}) + '\n'
+        counts[name] = 0
+        for rows in table_chunks(table, chunk_size, conditions=conditions, columns=columns):
+            yield ''.join(
+                json.dumps([_encode(value) for value in row], separators=(',', ':')) + '\n'
+                for row in rows
+            )
+            if finder:
+                finder.add(row._mapping[WATERMARKS[name][1]] for row in rows)
+            counts[name] += len(rows)
+            progress.add(name, len(rows))
+        if finder:
+            found[name] = finder.finish(watermarks.get(name))
+
+    yield json.dumps({'type': 'end', 'counts': counts, 'holes': found}) + '\n'
+
+
+def _reset_sequences(tables):
+    # PostgreSQL serial sequences don't advance on explicit ids
+    if db.engine.dialect.name != 'postgresql':
+        return
+    for name in tables:
+        table = db.metadata.tables[name]
+        pk = table.primary_key.columns.values()[0]
+        db.session.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{name}', '{pk.name}'), "
+            f"COALESCE((SELECT MAX({pk.name}) FROM {name}), 1))"
+        ))
+
+
+def restore_backup(lines, batch_size=1000, truncate=False, progress=None):
+    """
+    Load an NDJSON backup produced by backup_chunks.
+
+    Rows are inserted with one executemany per ``batch_size`` rows and
+    committed per batch, so memory stays bounded for any file size. Tables
+    must appear in foreign-key-safe order (as backup_chunks writes them).
+    Incremental backups are upserted on the primary key, since they contain
+    changed rows and overlap with the previous backup.
+
+    Args:
+        lines: Iterable of text lines (e.g. an open file)
+        batch_size: Rows per INSERT batch and commit
+        truncate: Delete existing rows of the backed-up tables first, and
+            every row of DEPENDENT_TABLES
+        progress: Optional Progress updated as rows are loaded
+
+    Returns:
+        dict: The backup's meta line (mode, watermarks, ...)
+
+    Raises:
+        ValueError: If the file is not a backup, is out of order or is truncated
+    """
+    progress = progress or Progress()
+    lines = iter(lines)
+
+    try:
+        meta = json.loads(next(lines))
+    except (StopIteration, ValueError):
+        raise ValueError('Empty or unreadable backup file')
+    if meta.get('type') != 'meta' or meta.get('format') != BACKUP_FORMAT:
+        raise ValueError('Not a GSMS NDJSON backup file')
+    upsert = meta.get('mode') == 'incremental'
+
+    if truncate:
+        for name in DEPENDENT_TABLES:
+            db.session.execute(delete(db.metadata.tables[name]))
+        for name in reversed(BACKUP_TABLES):
+            if name in meta['tables']:
+                db.session.execute(delete(db.metadata.tables[name]))
+        db.session.commit()
+
+    table = None
+    columns = []
+    decoders = []
+    locked = {}
+    batch = []
+    loaded = {}
+    position = -1
+    finished = False
+
+    def flush():
+        if batch:
+            if upsert:
+                upsert_rows(table, [column.name for column in table.primary_key.columns], batch)
+            else:
+                db.session.execute(insert(table), batch)
+            db.session.commit()
+            loaded[table.name] = loaded.get(table.name, 0) + len(batch)
+            progress.add(table.name, len(batch))
+            batch.clear()
+
+    for line in lines:
+        if not line.strip():
+            continue
+        record = json.loads(line)
+
+        if isinstance(record, list):
+            if table is None:
+                raise ValueError('Row found before any table header')
+            batch.append(dict(locked, **{column: decode(value)
+                                         for column, decode, value in zip(columns, decoders, record)
+                                         if column is not None}))
+            if len(batch) >= batch_size:
+                flush()
+        elif record.get('type') == 'table':
+            flush()
+            name = record['name']
+            if name not in BACKUP_TABLES or BACKUP_TABLES.index(name) < position:
+                raise ValueError(f'Table "{name}" is unknown or out of foreign-key order')
+            position = BACKUP_TABLES.index(name)
+            table = db.metadata.tables[name]
+            # Columns missing from the current schema are skipped
+            columns = [column if column in table.c else None for column in record['columns']]
+            decoders = [_decoder(table.c[column]) if column else None for column in columns]
+            # Credentials left out of the backup: new rows get a locked password
+            locked = {} if upsert else {column: LOCKED_PASSWORD for column in CREDENTIAL_COLUMNS.get(name, ())
+                                        if column not in record['columns']}
+        elif record.get('type') == 'end':
+            flush()
+            finished = True
+            for name, expected in record.get('counts', {}).items():
+                if loaded.get(name, 0) != expected:
+                    raise ValueError(f'Table "{name}": expected {expected} rows, '
+                                     f'loaded {loaded.get(name, 0)}')
+
+    flush()
+    if not finished:
+        raise ValueError(f'Backup file is truncated (no end marker); loaded {progress.summary()}')
+
+    _reset_sequences([name for name in BACKUP_TABLES if name in meta['tables']])
+    db.session.commit()
+    return meta
+
+
+def table_counts(tables=BACKUP_TABLES):
+    """Row count per backed-up table."""
+    return {name: db.session.query(func.count()).select_from(db.metadata.tables[name]).scalar()
+            for name in tables}
+
+
+# Backup directories: full and incremental files plus a manifest.json listing
+# them in order. Every incremental names its parent, so a restore replays the
+# latest full backup followed by each incremental taken after it.
+
+def load_manifest(directory):
+    """Read ``directory``/manifest.json, or return an empty manifest."""
+    path = os.path.join(directory, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {'format': BACKUP_FORMAT + '-manifest', 'version': BACKUP_VERSION, 'backups': []}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_manifest(directory, manifest):
+    """Write the manifest atomically so a crash never leaves it half-written."""
+    path = os.path.join(directory, MANIFEST_NAME)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+def latest_chain(manifest):
+    """Manifest entries of the newest full backup and the incrementals after it."""
+    backups = manifest['backups']
+    for index in range(len(backups) - 1, -1, -1):
+        if backups[index]['mode'] == 'full':
+            return backups[index:]
+    return []
+
+
+def create_backup(directory, incremental=False, chunk_size=1000, progress=None, open_file=open):
+    """
+    Write a full or incremental backup file into ``directory`` and record it in the manifest.
+
+    An incremental backup continues the latest chain from its last entry's
+    watermarks; without a previous full backup a full one is taken instead.
+
+    Args:
+        open_file: Callable opening a path for text writing (e.g. gzip-aware)
+
+    Returns:
+        dict: The manifest entry for the new file
+    """
+    progress = progress or Progress()
+    os.makedirs(directory, exist_ok=True)
+    manifest = load_manifest(directory)
+    chain = latest_chain(manifest)
+    previous = chain[-1] if incremental and chain else None
+
+    mode = 'incremental' if previous else 'full'
+    filename = f'{mode}_{datetime.utcnow().strftime("%Y%m%d_%H%M%S_%f")}.ndjson.gz'
+    path = os.path.join(directory, filename)
+
+    meta = chunk = None
+    with open_file(path, 'w') as f:
+        for chunk in backup_chunks(chunk_size=chunk_size, progress=progress,
+                                   since=previous['watermarks'] if previous else None,
+                                   parent=previous['file'] if previous else None,
+                                   holes=previous.get('holes') if previous else None):
+            if meta is None:
+                meta = json.loads(chunk)
+            f.write(chunk)
+    end = json.loads(chunk)
+
+    entry = {
+        'file': filename,
+        'mode': mode,
+        'parent': previous['file'] if previous else None,
+        'created_at': meta['created_at'],
+        'watermarks': meta['watermarks'],
+        'holes': end['holes'],
+        'counts': dict(progress.counts)
+    }
+    manifest['backups'].append(entry)
+    save_manifest(directory, manifest)
+    return entry
+
+
+def restore_chain(directory, batch_size=1000, truncate=False, progress=None, open_file=open):
+    """
+    Replay the latest backup chain in ``directory``: its full backup, then every incremental.
+
+    Raises:
+        ValueError: If there is no full backup or the chain is broken
+    """
+    progress = progress or Progress()
+    chain = latest_chain(load_manifest(directory))
+    if not chain:
+        raise ValueError(f'No full backup listed in {os.path.join(directory, MANIFEST_NAME)}')
+
+    parent = None
+    for entry in chain:
+        if entry['parent'] != parent:
+            raise ValueError(f'Backup chain broken at {entry["file"]}: '
+                             f'expected parent {parent}, found {entry["parent"]}')
+        with open_file(os.path.join(directory, entry['file']), 'r') as f:
+            meta = restore_backup(f, batch_size=batch_size,
+                                  truncate=truncate and entry['mode'] == 'full',
+                                  progress=progress)
+        if meta.get('parent') != parent:
+            raise ValueError(f'{entry["file"]} does not match its manifest entry')
+        parent = entry['file']
+    return chain
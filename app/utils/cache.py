@@ -0,0 +1,251 @@
+import hashlib
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+_MISSING = object()
+
+
+class MemoryBackend:
+    """
+    In-process cache backend: a size-bounded LRU with per-entry expiry.
+
+    Table versions live in the same process, so with several gunicorn workers
+    each worker only sees its own invalidations and relies on the TTL for
+    writes made elsewhere. Use RedisBackend when that is not acceptable.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return _MISSING
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return _MISSING
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_versions(self, tables):
+        with self._lock:
+            return [self._versions.get(table, 0) for table in tables]
+
+    def bump_versions(self, tables):
+        with self._lock:
+            for table in tables:
+                self._versions[table] = self._versions.get(table, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def size(self):
+        return len(self._entries)
+
+
+class RedisBackend:
+    """
+    Shared cache backend so every worker sees the same entries and versions.
+
+    Requires the optional ``redis`` package. Size-bounded LRU eviction is
+    delegated to the server (configure ``maxmemory-policy allkeys-lru``).
+    """
+
+    def __init__(self, url, prefix='gsms:report:'):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError('REPORT_CACHE_BACKEND=redis requires the "redis" package')
+
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self.evictions = 0
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        return _MISSING if raw is None else pickle.loads(raw)
+
+    def set(self, key, value, ttl):
+        self.client.set(self.prefix + key, pickle.dumps(value), ex=int(ttl))
+
+    def get_versions(self, tables):
+        raw = self.client.mget([f'{self.prefix}v:{table}' for table in tables])
+        return [int(value or 0) for value in raw]
+
+    def bump_versions(self, tables):
+        pipe = self.client.pipeline()
+        for table in tables:
+            pipe.incr(f'{self.prefix}v:{table}')
+        pipe.execute()
+
+    def clear(self):
+        for key in self.client.scan_iter(self.prefix + '*'):
+            self.client.delete(key)
+
+    def size(self):
+        return None
+
+
+class ReportCache:
+    """
+    Result cache for report aggregates, invalidated by per-table versions.
+
+    Cached values are keyed on (name, params, versions of the tables they read).
+    Writes to a table bump its version (see _track_writes), which changes the
+    key of every entry depending on it; stale entries are never read again and
+    age out through TTL/LRU eviction.
+    """
+
+    def __init__(self):
+        self.backend = None
+        self.ttl = 300
+        self.hits = 0
+        self.misses = 0
+
+    def init_app(self, app):
+        kind = app.config.get('REPORT_CACHE_BACKEND', 'memory')
+        self.ttl = app.config.get('REPORT_CACHE_TTL', 300)
+
+        if kind == 'redis':
+            self.backend = RedisBackend(app.config['REPORT_CACHE_URL'])
+        elif kind == 'memory':
+            self.backend = MemoryBackend(app.config.get('REPORT_CACHE_MAX_ENTRIES', 256))
+        else:
+            self.backend = None  # Caching disabled
+
+        app.extensions['report_cache'] = self
+
+    def get_or_compute(self, name, params, tables, compute, ttl=None):
+        """
+        Return the cached value for (name, params), computing and storing it on a miss.
+
+        Args:
+            name: Identifier of the cached computation (e.g. the endpoint)
+            params: Hashable/reprable parameters the result depends on
+            tables: Table names whose writes invalidate the result
+            compute: Zero-argument callable producing the value
+            ttl: Optional override of REPORT_CACHE_TTL in seconds
+        """
+        if self.backend is None:
+            return compute()
+
+        tables = sorted(tables)
+        versions = self.backend.get_versions(tables)
+        raw_key = f'{name}|{params!r}|' + ','.join(f'{t}:{v}' for t, v in zip(tables, versions))
+        key = hashlib.sha1(raw_key.encode('utf-8')).hexdigest()
+
+        value = self.backend.get(key)
+        if value is not _MISSING:
+            self.hits += 1
+            return value
+
+        self.misses += 1
+        value = compute()
+        self.backend.set(key, value, ttl or self.ttl)
+        return value
+
+    def cached(self, *tables, ttl=None):
+        """Decorator caching a function's result per call arguments, invalidated by ``tables``."""
+        def decorator(f):
+            name = f'{f.__module__}.{f.__qualname__}'
+
+            @wraps(f)
+            def decorated_function(*args, **kwargs):
+                params = (args, tuple(sorted(kwargs.items())))
+                return self.get_or_compute(name, params, tables,
+                                           lambda: f(*args, **kwargs), ttl=ttl)
+            return decorated_function
+        return decorator
+
+    def invalidate(self, *tables):
+        """Bump the version of ``tables`` so every dependent entry is recomputed."""
+        if self.backend is not None and tables:
+            self.backend.bump_versions(sorted(set(tables)))
+
+    def stats(self):
+        """Hit/miss counters for this process plus backend size and evictions."""
+        lookups = self.hits + self.misses
+        return {
+            'backend': type(self.backend).__name__ if self.backend else 'disabled',
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups * 100, 1) if lookups else 0.0,
+            'entries': self.backend.size() if self.backend else 0,
+            'evictions': self.backend.evictions if self.backend else 0
+        }
+
+
+report_cache = ReportCache()
+
+
+def rows_to_dicts(rows):
+    """Convert SQLAlchemy result rows into plain dicts that are safe to cache."""
+    return [row._asdict() for row in rows]
+
+
+# Commits made by this process per table, for in-process indexes that follow
+# writes (see utils.search); kept whichever REPORT_CACHE_BACKEND is configured
+table_versions = {}
+
+
+def mark_written(session, *tables):
+    """
+    Record that the session's transaction wrote ``tables``; their versions are
+    bumped when it commits. The listeners below call this for every table a
+    flush or DML statement touches; call it directly for keys that are not
+    tables, such as a list derived from only some of a table's changes.
+    """
+    session.info.setdefault('written_tables', set()).update(tables)
+
+
+# Track which tables a transaction writes and bump their versions on commit.
+# Covers ORM unit-of-work flushes as well as bulk/Core DML run through the session.
+
+@event.listens_for(Session, 'after_flush')
+def _track_flush(session, flush_context):
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        table = getattr(obj, '__tablename__', None)
+        if table:
+            mark_written(session, table)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _track_execute(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, 'table', None)
+        if table is not None:
+            mark_written(orm_execute_state.session, table.name)
+
+
+@event.listens_for(Session, 'after_commit')
+def _bump_on_commit(session):
+    written = session.info.pop('written_tables', None)
+    if written:
+        for table in written:
+            table_versions[table] = table_versions.get(table, 0) + 1
+        report_cache.invalidate(*written)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_on_rollback(session):
+    session.info.pop('written_tables', None)
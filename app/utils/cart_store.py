@@ -0,0 +1,152 @@
+import threading
+from datetime import datetime
+from sqlalchemy import delete, func, select, update
+
+
+class DatabaseCartStore:
+    """
+    Carts kept in the cart_items table, one row per (user, product).
+
+    Every change is a single-row statement committed on its own, so a cart is
+    shared by all workers and survives logging in at another terminal.
+    """
+
+    def get(self, owner):
+        from ..models import db, CartItem
+        rows = db.session.execute(
+            select(CartItem.product_id, CartItem.quantity)
+            .where(CartItem.user_id == owner)
+            .order_by(CartItem.id)
+        )
+        return {str(product_id): quantity for product_id, quantity in rows}
+
+    def add(self, owner, product_id, quantity):
+        from ..models import db, CartItem
+        from .sql import upsert_increment
+        upsert_increment(CartItem.__table__,
+                         key={'user_id': owner, 'product_id': int(product_id)},
+                         deltas={'quantity': quantity},
+                         assign={'updated_at': datetime.utcnow()})
+        db.session.commit()
+
+    def update(self, owner, product_id, quantity):
+        from ..models import db, CartItem
+        db.session.execute(
+            update(CartItem)
+            .where(CartItem.user_id == owner, CartItem.product_id == int(product_id))
+            .values(quantity=quantity, updated_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+
+    def remove(self, owner, product_id):
+        from ..models import db, CartItem
+        db.session.execute(
+            delete(CartItem)
+            .where(CartItem.user_id == owner, CartItem.product_id == int(product_id))
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+
+    def clear(self, owner):
+        from ..models import db, CartItem
+        db.session.execute(
+            delete(CartItem).where(CartItem.user_id == owner).execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+
+    def line_count(self, owner):
+        from ..models import db, CartItem
+        return db.session.scalar(select(func.count()).where(CartItem.user_id == owner))
+
+
+class MemoryCartStore:
+    """
+    Carts kept in a dict in this process.
+
+    Each worker has its own carts and they are lost on restart, so this is
+    for development, tests and single-process deployments only.
+    """
+
+    def __init__(self):
+        self._carts = {}  # owner -> {product_id: quantity}, in insertion order
+        self._lock = threading.Lock()
+
+    def get(self, owner):
+        with self._lock:
+            return dict(self._carts.get(owner, {}))
+
+    def add(self, owner, product_id, quantity):
+        with self._lock:
+            cart = self._carts.setdefault(owner, {})
+            cart[str(product_id)] = cart.get(str(product_id), 0) + quantity
+
+    def update(self, owner, product_id, quantity):
+        with self._lock:
+            cart = self._carts.get(owner, {})
+            if str(product_id) in cart:
+                cart[str(product_id)] = quantity
+
+    def remove(self, owner, product_id):
+        with self._lock:
+            self._carts.get(owner, {}).pop(str(product_id), None)
+
+    def clear(self, owner):
+        with self._lock:
+            self._carts.pop(owner, None)
+
+    def line_count(self, owner):
+        with self._lock:
+            return len(self._carts.get(owner, {}))
+
+
+class CartStore:
+    """
+    Server-side carts keyed by user id.
+
+    The session cookie only carries the login, not the cart, so it stays
+    small whatever the basket size. Quantities are ints keyed by the product
+    id as a string, the shape the cookie cart used to have.
+    """
+
+    def __init__(self):
+        self.backend = None
+
+    def init_app(self, app):
+        kind = app.config.get('CART_BACKEND', 'database')
+
+        if kind == 'database':
+            self.backend = DatabaseCartStore()
+        elif kind == 'memory':
+            self.backend = MemoryCartStore()
+        else:
+            raise ValueError(f'Unknown CART_BACKEND "{kind}" (expected "database" or "memory")')
+
+        app.extensions['cart_store'] = self
+
+    def get(self, owner):
+        """Return the cart of ``owner`` as {product_id: quantity}."""
+        return self.backend.get(owner)
+
+    def add(self, owner, product_id, quantity):
+        """Add ``quantity`` of a product, creating the line if needed."""
+        self.backend.add(owner, product_id, quantity)
+
+    def update(self, owner, product_id, quantity):
+        """Set the quantity of a line already in the cart."""
+        self.backend.update(owner, product_id, quantity)
+
+    def remove(self, owner, product_id):
+        """Drop one line from the cart."""
+        self.backend.remove(owner, product_id)
+
+    def clear(self, owner):
+        """Empty the cart."""
+        self.backend.clear(owner)
+
+    def line_count(self, owner):
+        """Number of distinct products in the cart."""
+        return self.backend.line_count(owner)
+
+
+cart_store = CartStore()
@@ -0,0 +1,119 @@
+from decimal import Decimal
+from flask import g
+from flask_login import current_user
+from sqlalchemy import select
+from ..models import db, Product
+from .helpers import calculate_tax, get_cart
+from .reservations import held_by_others
+
+# Product columns a cart line needs: pricing, stock checks and display
+CART_PRODUCT_COLUMNS = ('id', 'name', 'price', 'cost_price', 'stock_qty', 'category', 'image_url')
+
+
+class CartProduct:
+    """
+    The columns of a Product in a cart, without the ORM instance behind them,
+    plus ``available``: stock less what other carts hold.
+    """
+    __slots__ = CART_PRODUCT_COLUMNS + ('available',)
+
+    # Same fallback rule as the model, it only reads price and cost_price
+    unit_cost = Product.unit_cost
+
+    def __init__(self, row):
+        for column in self.__slots__:
+            setattr(self, column, getattr(row, column))
+
+    def can_fulfill_quantity(self, quantity):
+        return self.available >= quantity
+
+
+class CartLine:
+    """One product in the cart with its quantity and line total."""
+    __slots__ = ('product', 'quantity', 'line_total')
+
+    def __init__(self, product, quantity):
+        self.product = product
+        self.quantity = quantity
+        self.line_total = product.price * quantity
+
+    # Lines used to be dicts; keep item['product'] working for callers and templates
+    def __getitem__(self, key):
+        return getattr(self, key)
+
+
+class CartView:
+    """
+    The current user's cart, hydrated with product data in one query.
+
+    Built at most once per request by ``CartView.current()`` and shared by
+    the cart page, checkout, stock validation and the navbar count. Cart
+    changes made through utils.helpers drop the memoised view.
+    """
+
+    def __init__(self, quantities, owner=None):
+        self.quantities = quantities  # {product_id (str): quantity}, as stored
+        self.owner = owner
+        self.lines = []
+        self.subtotal = self.tax = self.total = Decimal('0.00')
+        self.load()
+
+    @classmethod
+    def current(cls):
+        """Return this request's view of the current user's cart, hydrating it on first use."""
+        view = g.get('cart_view')
+        if view is None:
+            view = g.cart_view = cls(get_cart(), current_user.id)
+        return view
+
+    def load(self):
+        """(Re)read the products of the cart, e.g. for fresh stock after a failed checkout."""
+        products = {}
+        if self.quantities:
+            ids = [int(product_id) for product_id in self.quantities]
+            columns = [Product.__table__.c[column] for column in CART_PRODUCT_COLUMNS]
+            # Other carts' active holds, summed per product in the same statement
+            available = (Product.stock_qty - held_by_others(Product.id, self.owner)).label('available')
+            rows = db.session.execute(select(*columns, available).where(Product.id.in_(ids)))
+            products = {str(row.id): CartProduct(row) for row in rows}
+
+        self.lines = [CartLine(products[product_id], quantity)
+                      for product_id, quantity in self.quantities.items() if product_id in products]
+        self.lines.sort(key=lambda line: line.product.name)
+
+        self.subtotal = sum((line.line_total for line in self.lines), Decimal('0.00'))
+        self.tax = calculate_tax(self.subtotal)
+        self.total = self.subtotal + self.tax
+
+    def __bool__(self):
+        return bool(self.quantities)
+
+    def __iter__(self):
+        return iter(self.lines)
+
+    def __len__(self):
+        return len(self.quantities)
+
+    def get(self, product_id):
+        """The line for ``product_id``, or None."""
+        return next((line for line in self.lines if line.product.id == int(product_id)), None)
+
+    @property
+    def products(self):
+        return [line.product for line in self.lines]
+
+    def validate(self):
+        """
+        Check every line against the stock other carts have not held, as read by ``load``.
+
+        Returns:
+            dict: {'valid': bool, 'errors': list of error messages}
+        """
+        found = {str(line.product.id) for line in self.lines}
+        errors = [f'Product {product_id} not found' for product_id in self.quantities if product_id not in found]
+        errors += [f'Insufficient stock for {line.product.name}. Available: {line.product.available}'
+                   for line in self.lines if not line.product.can_fulfill_quantity(line.quantity)]
+        return {
+            'valid': len(errors) == 0,
+            'errors': errors
+        }
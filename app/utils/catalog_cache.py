@@ -0,0 +1,189 @@
+import copy
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from flask_sqlalchemy.pagination import Pagination
+from sqlalchemy import select
+from ..models import db, Product
+from .cache import table_versions
+
+# What the product grid shows of a product, cached instead of ORM instances
+CatalogRow = namedtuple('CatalogRow', 'id name category price stock_qty image_url')
+
+
+class CachedPagination(Pagination):
+    """Numbered page whose items and total were captured when it was cached."""
+
+    def _query_items(self):
+        return list(self._query_args['items'])
+
+    def _query_count(self):
+        return self._query_args['total']
+
+
+class _Entry:
+    __slots__ = ('page', 'created', 'checked')
+
+    def __init__(self, page, now):
+        self.page = page
+        self.created = now  # when the page was computed
+        self.checked = now  # when its stock figures were last read
+
+
+class CatalogCache:
+    """
+    Read-through cache of the employee product grid, per worker.
+
+    Pages are keyed on (search, category, page or cursor) and hold
+    CatalogRow tuples plus their page links. The cache follows the catalog
+    version, the number of commits this process made that wrote products
+    (cache.table_versions): any Product write, be it an edit, an import, a
+    stock adjustment or the stock decrement of a checkout, bumps it and
+    empties the cache.
+
+    Writes made by other workers do not bump this worker's version, so
+    entries also age: a page older than CATALOG_CACHE_STOCK_TTL seconds has
+    its products' stock re-read by primary key (one query) before it is
+    served, and one older than CATALOG_CACHE_TTL is recomputed. Stock
+    figures are therefore never more than CATALOG_CACHE_STOCK_TTL seconds
+    old; names, prices and which products are listed at most
+    CATALOG_CACHE_TTL.
+    """
+
+    def __init__(self):
+        self.max_entries = 0  # Disabled until init_app
+        self.ttl = 60
+        self.stock_ttl = 5
+        self.hits = 0
+        self.misses = 0
+        self.stock_refreshes = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._version = None
+        self._entries = OrderedDict()  # key -> _Entry
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.max_entries = app.config.get('CATALOG_CACHE_MAX_ENTRIES', 1024)
+        self.ttl = app.config.get('CATALOG_CACHE_TTL', 60)
+        self.stock_ttl = app.config.get('CATALOG_CACHE_STOCK_TTL', 5)
+        if self.stock_ttl > self.ttl:
+            raise ValueError(f'CATALOG_CACHE_STOCK_TTL ({self.stock_ttl}) must not exceed '
+                             f'CATALOG_CACHE_TTL ({self.ttl})')
+        app.extensions['catalog_cache'] = self
+
+    @staticmethod
+    def version():
+        """The catalog version: commits this process made that wrote products."""
+        return table_versions.get('products', 0)
+
+    def get_page(self, key, compute):
+        """
+        Return the page for ``key``, from the cache or from ``compute``.
+
+        Args:
+            key: Hashable identifying the page, e.g. (search, category, page, cursor)
+            compute: Zero-argument callable returning a Pagination or
+                KeysetPagination of Products
+
+        Returns:
+            The pagination, with CatalogRow tuples as its items
+        """
+        if not self.max_entries:
+            return self._snapshot(compute())
+
+        # Read before computing: a write committed meanwhile empties the cache again
+        version = self.version()
+        now = time.monotonic()
+        with self._lock:
+            if version != self._version:
+                if self._entries:
+                    self.invalidations += 1
+                self._entries.clear()
+                self._version = version
+            entry = self._entries.get(key)
+            if entry is not None and now - entry.created >= self.ttl:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                page = entry.page
+                # Past the bound every request re-reads the stock itself, none serves it stale
+                refresh = now - entry.checked >= self.stock_ttl
+                if refresh:
+                    self.stock_refreshes += 1
+
+        if entry is None:
+            page = self._snapshot(compute())
+            with self._lock:
+                if version == self._version:
+                    self._entries[key] = _Entry(page, now)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+                        self.evictions += 1
+            return page
+
+        if refresh:
+            # A new page replaces the entry's: pages already handed out are never modified
+            page = self._refresh_stock(page)
+            with self._lock:
+                # Keep the most recent read; ``now`` was taken before it
+                if self._entries.get(key) is entry and entry.checked < now:
+                    entry.page = page
+                    entry.checked = now
+        return page
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Hit/miss counters for this process plus size, stock refreshes and invalidations."""
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups * 100, 1) if lookups else 0.0,
+            'stock_refreshes': self.stock_refreshes,
+            'entries': len(self._entries),
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+            'version': self.version()
+        }
+
+    @staticmethod
+    def _snapshot(page):
+        """Copy of ``page`` holding CatalogRow tuples, detached from the session and query."""
+        return CatalogCache._with_items(page, [
+            CatalogRow(product.id, product.name, product.category, product.price,
+                       product.stock_qty, product.image_url) for product in page.items
+        ])
+
+    @staticmethod
+    def _with_items(page, rows):
+        """Copy of ``page`` (a pagination of either kind) listing ``rows`` instead."""
+        if getattr(page, 'cursor_based', False):
+            copied = copy.copy(page)
+            copied.items = rows
+            return copied
+        return CachedPagination(page=page.page, per_page=page.per_page, error_out=False,
+                                items=rows, total=page.total)
+
+    @staticmethod
+    def _refresh_stock(page):
+        """
+        Copy of ``page`` with its products' stock re-read; a deleted product
+        shows as out of stock.
+        """
+        if not page.items:
+            return page
+        stock = dict(db.session.execute(
+            select(Product.id, Product.stock_qty).where(Product.id.in_([row.id for row in page.items]))
+        ).all())
+        return CatalogCache._with_items(page, [row._replace(stock_qty=stock.get(row.id, 0)) for row in page.items])
+
+
+catalog_cache = CatalogCache()
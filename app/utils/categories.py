@@ -0,0 +1,217 @@
+from decimal import Decimal
+from sqlalchemy import bindparam, event, exists, func, insert, inspect, or_, select, update
+from sqlalchemy.orm import Session
+from ..models import db, Category, Product
+from .cache import mark_written, report_cache
+from .sql import upsert_increment_many
+
+# Products per maintenance statement; keeps the bind count well under SQLite's limit
+UPDATE_CHUNK = 500
+
+# Cache key of the category list, bumped when a category's product count
+# changes. Checkouts rewrite the categories table's stock totals all day, so
+# the list is not keyed on the table itself.
+NAMES_KEY = 'category_names'
+
+
+def category_names():
+    """
+    Names of the categories that have products, alphabetically.
+
+    Served from the report cache without reading products; recomputed from
+    the (small) categories table when a product is added, deleted or moved
+    to another category, never because stock moved.
+    """
+    return report_cache.get_or_compute('category_names', (), (NAMES_KEY,), lambda: list(db.session.scalars(
+        select(Category.name).where(Category.product_count > 0).order_by(Category.name)
+    )))
+
+
+def category_ids(names):
+    """
+    Ids of the categories called ``names``, creating the missing ones.
+
+    Names are matched the way the database compares them, so on MySQL's
+    case-insensitive collation "Dairy" finds the existing "dairy".
+
+    Returns:
+        dict: name -> category id
+    """
+    names = set(names)
+    if not names:
+        return {}
+
+    def lookup():
+        rows = db.session.execute(select(Category.name, Category.id).where(Category.name.in_(names))).all()
+        exact = dict(rows)
+        folded = {name.casefold(): category_id for name, category_id in rows}
+        return {name: exact.get(name, folded.get(name.casefold())) for name in names}
+
+    ids = lookup()
+    missing = [name for name, category_id in ids.items() if category_id is None]
+    if missing:
+        # Insert-or-ignore, so two sessions creating the same category do not collide
+        upsert_increment_many(Category.__table__, ['name'], [
+            {'name': name, 'product_count': 0, 'stock_units': 0, 'stock_value': 0} for name in missing
+        ])
+        ids = lookup()
+    return ids
+
+
+def tally(totals, before, after):
+    """
+    Add a product's move from ``before`` to ``after`` to ``totals``.
+
+    Args:
+        totals: Dict category id -> [product_count, stock_units, stock_value]
+            changes, updated in place
+        before: (category_id, price, stock_qty) of the product before the
+            write, or None if it is new
+        after: The same after the write, or None if it is deleted
+    """
+    for sign, state in ((-1, before), (1, after)):
+        if state is None or state[0] is None:
+            continue
+        category_id, price, stock_qty = state
+        stock_qty = stock_qty or 0
+        entry = totals.setdefault(category_id, [0, 0, Decimal(0)])
+        entry[0] += sign
+        entry[1] += sign * stock_qty
+        entry[2] += sign * Decimal(str(price)) * stock_qty
+
+
+def add_to_totals(totals):
+    """Apply the changes gathered by tally with one executemany UPDATE of categories."""
+    rows = [{'b_id': category_id, 'b_count': count, 'b_units': units, 'b_value': value}
+            for category_id, (count, units, value) in totals.items() if count or units or value]
+    if not rows:
+        return
+
+    categories = Category.__table__
+    db.session.execute(
+        update(categories)
+        .where(categories.c.id == bindparam('b_id'))
+        .values(product_count=categories.c.product_count + bindparam('b_count'),
+                stock_units=categories.c.stock_units + bindparam('b_units'),
+                stock_value=categories.c.stock_value + bindparam('b_value')),
+        rows
+    )
+    if any(row['b_count'] for row in rows):
+        mark_written(db.session, NAMES_KEY)
+
+
+def add_stock(quantities):
+    """
+    Apply stock changes of products to their categories' totals.
+
+    Written for the checkout path: the products were just updated, so their
+    rows are locked; their category and price are read by primary key and
+    the totals written by add_to_totals, two statements per UPDATE_CHUNK
+    products. (A correlated UPDATE ... SET stock_units = stock_units +
+    (SELECT SUM(...) FROM products WHERE category_id = categories.id ...)
+    would be one statement, but optimizers tend to drive it from the
+    category_id index and read the whole category.)
+
+    Args:
+        quantities: Dict {product_id: units added}, negative when taken out
+    """
+    ids = sorted(quantities)
+    for offset in range(0, len(ids), UPDATE_CHUNK):
+        rows = db.session.execute(
+            select(Product.id, Product.category_id, Product.price)
+            .where(Product.id.in_(ids[offset:offset + UPDATE_CHUNK]))
+        )
+        totals = {}
+        for row in rows:
+            entry = totals.setdefault(row.category_id, [0, 0, Decimal(0)])
+            entry[1] += quantities[row.id]
+            entry[2] += row.price * quantities[row.id]
+        totals.pop(None, None)
+        add_to_totals(totals)
+
+
+def rebuild_categories():
+    """
+    Recompute every category from the products table.
+
+    Creates categories for names not seen yet, points every product at its
+    category and recomputes the totals with set-based statements, as the
+    migration's backfill does. Categories left without products are kept
+    with zero totals. The caller is responsible for committing.
+
+    Returns:
+        int: Number of products whose category_id was (re)assigned
+    """
+    db.session.execute(
+        insert(Category).from_select(
+            ['name'],
+            select(Product.category).distinct()
+            .where(~exists().where(Category.name == Product.category))
+        )
+    )
+
+    # updated_at is kept: category_id is derived, the product itself did not change
+    category_id = select(Category.id).where(Category.name == Product.category).scalar_subquery()
+    assigned = db.session.execute(
+        update(Product)
+        .where(or_(Product.category_id.is_(None), Product.category_id != category_id))
+        .values(category_id=category_id, updated_at=Product.updated_at)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+    totals = select(
+        Product.category_id,
+        func.count(Product.id).label('product_count'),
+        func.sum(Product.stock_qty).label('stock_units'),
+        func.sum(Product.price * Product.stock_qty).label('stock_value')
+    ).group_by(Product.category_id).subquery()
+    categories = Category.__table__
+    db.session.execute(update(categories).values(product_count=0, stock_units=0, stock_value=0))
+    db.session.execute(
+        update(categories)
+        .where(categories.c.id == totals.c.category_id)
+        .values(product_count=totals.c.product_count,
+                stock_units=totals.c.stock_units,
+                stock_value=totals.c.stock_value)
+    )
+    mark_written(db.session, NAMES_KEY)
+    return assigned
+
+
+# Products written through the ORM (the admin product form, sample data) are
+# pointed at their category and counted here, just before the flush. Bulk
+# writes call category_ids/tally/add_to_totals or add_stock themselves.
+
+def _state(product, committed):
+    """(category_id, price, stock_qty) of ``product``, as last loaded or as it is now."""
+    if not committed:
+        return product.category_id, product.price, product.stock_qty
+    attrs = inspect(product).attrs
+    values = []
+    for name in ('category_id', 'price', 'stock_qty'):
+        history = attrs[name].load_history()
+        values.append(history.deleted[0] if history.deleted else (history.unchanged or [None])[0])
+    return tuple(values)
+
+
+@event.listens_for(Session, 'before_flush')
+def _count_products(session, flush_context, instances):
+    new = [obj for obj in session.new if isinstance(obj, Product)]
+    dirty = [obj for obj in session.dirty if isinstance(obj, Product) and session.is_modified(obj)]
+    deleted = [obj for obj in session.deleted if isinstance(obj, Product)]
+    if not (new or dirty or deleted):
+        return
+
+    with session.no_autoflush:
+        ids = category_ids(product.category for product in new + dirty)
+        totals = {}
+        for product in new:
+            product.category_id = ids[product.category]
+            tally(totals, None, _state(product, committed=False))
+        for product in dirty:
+            before = _state(product, committed=True)
+            product.category_id = ids[product.category]
+            tally(totals, before, _state(product, committed=False))
+        for product in deleted:
+            tally(totals, _state(product, committed=True), None)
+        add_to_totals(totals)
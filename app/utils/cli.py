@@ -34,4 +34,193 @@ def create_admin_command(username, password):
     db.session.add(admin)
     db.session.commit()
 
-    click.echo(f'Admin user "{admin_user}" created successfully.')
\ No newline at end of file
+    click.echo(f'Admin user "{admin_user}" created successfully.')
+
+
+def _parse_day_range(since, until):
+    """Parse the --since/--until options of the rebuild commands into dates."""
+    from datetime import datetime
+
+    try:
+        start_day = datetime.strptime(since, '%Y-%m-%d').date() if since else None
+        end_day = datetime.strptime(until, '%Y-%m-%d').date() if until else None
+    except ValueError:
+        raise click.BadParameter('Dates must be in YYYY-MM-DD format.')
+    return start_day, end_day
+
+
+@click.command('rebuild-sales-daily')
+@click.option('--since', default=None, help='First day to rebuild (YYYY-MM-DD); defaults to all history')
+@click.option('--until', default=None, help='Day to stop before (YYYY-MM-DD); defaults to no upper bound')
+def rebuild_sales_daily_command(since, until):
+    """Rebuild the sales_daily rollup from the orders table."""
+    from ..analytics.rollups import rebuild_sales_daily
+
+    rows = rebuild_sales_daily(*_parse_day_range(since, until))
+    db.session.commit()
+
+    click.echo(f'Rebuilt sales_daily: {rows} rollup rows written.')
+
+
+@click.command('rebuild-product-sales')
+@click.option('--since', default=None, help='First day to rebuild (YYYY-MM-DD); defaults to all history')
+@click.option('--until', default=None, help='Day to stop before (YYYY-MM-DD); defaults to no upper bound')
+def rebuild_product_sales_command(since, until):
+    """Rebuild product_sales_daily and product_sales_stats from the order items."""
+    from ..analytics.product_sales import rebuild_product_sales
+
+    rows = rebuild_product_sales(*_parse_day_range(since, until))
+    db.session.commit()
+
+    click.echo(f'Rebuilt product_sales_daily: {rows} rollup rows written; lifetime stats refreshed.')
+
+
+@click.command('rebuild-categories')
+def rebuild_categories_command():
+    """Recompute the categories and their product counts and stock totals from the products table."""
+    from .categories import rebuild_categories
+
+    assigned = rebuild_categories()
+    db.session.commit()
+
+    click.echo(f'Rebuilt categories: {assigned} products reassigned; totals recomputed.')
+
+
+def _open_text(path, mode, newline=None):
+    """Open a backup or CSV file as text, gzip-compressed when the name ends in .gz."""
+    import gzip
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8', newline=newline)
+    return open(path, mode, encoding='utf-8', newline=newline)
+
+
+def _echo_progress(progress):
+    click.echo(f'  ... {progress.summary()}')
+
+
+@click.command('create-backup')
+@click.option('--output', default=None, help='File to write (default: grocery_backup_<timestamp>.ndjson.gz)')
+@click.option('--dir', 'directory', default=None,
+              help='Backup directory with a manifest.json chaining full and incremental backups')
+@click.option('--incremental', is_flag=True,
+              help='With --dir: only rows added or changed since the previous backup in the chain')
+@click.option('--chunk-size', default=None, type=int, help='Rows read per chunk (default: BACKUP_CHUNK_SIZE)')
+def create_backup_command(output, directory, incremental, chunk_size):
+    """Write an NDJSON backup, gzip-compressed if the file name ends in .gz."""
+    from datetime import datetime
+    from ..utils.backup import Progress, backup_chunks, create_backup
+
+    chunk_size = chunk_size or current_app.config['BACKUP_CHUNK_SIZE']
+    progress = Progress(report=_echo_progress)
+
+    if directory:
+        entry = create_backup(directory, incremental=incremental, chunk_size=chunk_size,
+                              progress=progress, open_file=_open_text)
+        parent = f' (after {entry["parent"]})' if entry['parent'] else ''
+        click.echo(f'{entry["mode"].title()} backup {entry["file"]}{parent} written to {directory}: '
+                   f'{progress.summary()}')
+        return
+
+    if incremental:
+        raise click.UsageError('--incremental needs --dir to find the previous backup.')
+
+    output = output or f'grocery_backup_{datetime.now().strftime("%Y%m%d_%H%M%S")}.ndjson.gz'
+    with _open_text(output, 'w') as f:
+        for chunk in backup_chunks(chunk_size=chunk_size, progress=progress):
+            f.write(chunk)
+
+    click.echo(f'Backup written to {output}: {progress.summary()}')
+
+
+@click.command('restore-backup')
+@click.argument('path')
+@click.option('--batch-size', default=None, type=int, help='Rows per INSERT batch (default: BACKUP_CHUNK_SIZE)')
+@click.option('--truncate', is_flag=True,
+              help='Delete existing users, categories, products, orders and order items first '
+                   '(and the sales rollups, carts and stock holds that reference them)')
+@click.option('--skip-rollups', is_flag=True,
+              help='Do not rebuild the sales rollups and category totals after loading')
+def restore_backup_command(path, batch_size, truncate, skip_rollups):
+    """Load an NDJSON backup file, or replay the latest chain of a backup directory."""
+    import os
+    from sqlalchemy.exc import IntegrityError
+    from ..utils.backup import Progress, restore_backup, restore_chain
+
+    batch_size = batch_size or current_app.config['BACKUP_CHUNK_SIZE']
+    progress = Progress(report=_echo_progress)
+    try:
+        if os.path.isdir(path):
+            chain = restore_chain(path, batch_size=batch_size, truncate=truncate,
+                                  progress=progress, open_file=_open_text)
+            click.echo(f'Replayed {len(chain)} backup(s): ' + ' -> '.join(entry['file'] for entry in chain))
+        else:
+            with _open_text(path, 'r') as f:
+                meta = restore_backup(f, batch_size=batch_size, truncate=truncate, progress=progress)
+            if not meta.get('credentials', True):
+                click.echo('The backup holds no password hashes: restored users cannot log in until '
+                           'their passwords are reset (flask create-admin for an administrator).')
+    except IntegrityError as e:
+        db.session.rollback()
+        raise click.ClickException(f'Restore failed after {progress.summary()}: {e.orig} '
+                                   '(use --truncate to replace existing rows)')
+    except (OSError, ValueError) as e:
+        db.session.rollback()
+        raise click.ClickException(f'Restore failed: {e}')
+
+    click.echo(f'Restored {path}: {progress.summary()}')
+
+    if not skip_rollups:
+        from ..analytics.rollups import rebuild_sales_daily
+        from ..analytics.product_sales import rebuild_product_sales
+        from .categories import rebuild_categories
+        rebuild_sales_daily()
+        rebuild_product_sales()
+        rebuild_categories()
+        db.session.commit()
+        click.echo('Sales rollups and category totals rebuilt.')
+
+
+@click.command('import-products')
+@click.argument('path')
+@click.option('--batch-size', default=None, type=int, help='Rows per INSERT and commit (default: IMPORT_BATCH_SIZE)')
+@click.option('--skip-duplicates', is_flag=True, help='Skip products whose name already exists')
+@click.option('--upsert', type=click.Choice(['sku', 'name_category']), default=None,
+              help='Update products matched on this key instead of only inserting')
+@click.option('--default-category', default=None, help='Category for rows that leave it blank')
+@click.option('--errors', 'errors_path', default=None,
+              help='CSV file for rejected rows (default: <path>.errors.csv, written only if needed)')
+def import_products_command(path, batch_size, skip_duplicates, upsert, default_category, errors_path):
+    """Import products from a CSV file, gzip-compressed if the name ends in .gz."""
+    import csv
+    import os
+    from ..utils.backup import Progress
+    from ..utils.importer import ERROR_REPORT_HEADER, import_products
+
+    batch_size = batch_size or current_app.config['IMPORT_BATCH_SIZE']
+    errors_path = errors_path or f'{path}.errors.csv'
+    progress = Progress(report=_echo_progress)
+    try:
+        with _open_text(path, 'r', newline='') as lines, open(errors_path, 'w', newline='', encoding='utf-8') as report:
+            errors = csv.writer(report)
+            errors.writerow(ERROR_REPORT_HEADER)
+            import_products(lines, batch_size=batch_size, skip_duplicates=skip_duplicates,
+                            default_category=default_category, upsert=upsert,
+                            progress=progress, errors=errors)
+    except (OSError, ValueError, csv.Error) as e:
+        db.session.rollback()
+        raise click.ClickException(f'Import failed after {progress.summary()}: {e}')
+
+    click.echo(f'Imported {path}: {progress.summary()}')
+    if progress.counts.get('errors'):
+        click.echo(f'Rejected rows written to {errors_path}')
+    else:
+        os.remove(errors_path)
+
+
+@click.command('expire-holds')
+def expire_holds_command():
+    """Delete stock holds whose TTL has passed (for cron when the sweeper thread is disabled)."""
+    from .reservations import expire_holds
+
+    removed = expire_holds()
+    click.echo(f'Expired {removed} stock holds.')
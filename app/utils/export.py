@@ -0,0 +1,115 @@
+import csv
+import io
+import zlib
+from sqlalchemy import select
+from ..models import db, Product, Order, OrderItem, User
+
+# Tables that can be exported: name -> (section title, header, query builder).
+# Query builders select plain columns (no ORM entities, no lazy loads) and
+# return the statement plus the column that date ranges filter on.
+
+
+def _products_query():
+    return select(Product.id, Product.name, Product.price, Product.stock_qty,
+                  Product.category, Product.created_at)\
+        .order_by(Product.id), Product.created_at
+
+
+def _orders_query():
+    return select(Order.id, User.username, Order.total_amount, Order.tax_amount,
+                  Order.discount_amount, Order.payment_method, Order.status,
+                  Order.created_at)\
+        .outerjoin(User, User.id == Order.employee_id)\
+        .order_by(Order.id), Order.created_at
+
+
+def _order_items_query():
+    return select(OrderItem.order_id, OrderItem.product_id, OrderItem.product_name_snapshot,
+                  OrderItem.unit_price_snapshot, OrderItem.quantity, OrderItem.line_total,
+                  Order.created_at)\
+        .join(Order, Order.id == OrderItem.order_id)\
+        .order_by(OrderItem.order_id, OrderItem.id), Order.created_at
+
+
+def _users_query():
+    return select(User.id, User.username, User.role, User.created_at)\
+        .order_by(User.id), User.created_at
+
+
+EXPORT_TABLES = {
+    'products': ('Products', ['ID', 'Name', 'Price', 'Stock', 'Category', 'Created'], _products_query),
+    'orders': ('Orders', ['ID', 'Employee', 'Total', 'Tax', 'Discount', 'Payment Method',
+                          'Status', 'Created'], _orders_query),
+    'order_items': ('Order Items', ['Order ID', 'Product ID', 'Product', 'Unit Price',
+                                    'Quantity', 'Line Total', 'Order Created'], _order_items_query),
+    'users': ('Users', ['ID', 'Username', 'Role', 'Created'], _users_query)
+}
+
+
+def _format_value(value):
+    if value is None:
+        return ''
+    if hasattr(value, 'strftime'):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    return value
+
+
+def stream_rows(statement, batch_size=1000):
+    """
+    Yield lists of result rows, ``batch_size`` at a time, from a server-side cursor.
+
+    Only one batch is held in memory at any point, whatever the table size.
+    """
+    result = db.session.execute(statement.execution_options(yield_per=batch_size))
+    for partition in result.partitions():
+        yield partition
+
+
+def csv_chunks(tables, start=None, end=None, batch_size=1000):
+    """
+    Generate a CSV export of ``tables`` as text chunks, one per batch of rows.
+
+    Each table is written as a section: a title row, a header row, the data
+    rows in primary-key order, and a blank separator row.
+
+    Args:
+        tables: Names from EXPORT_TABLES, in output order
+        start: Optional inclusive lower bound on the rows' creation time
+        end: Optional exclusive upper bound on the rows' creation time
+        batch_size: Rows fetched and written per chunk
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush():
+        chunk = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return chunk
+
+    for name in tables:
+        title, header, build_query = EXPORT_TABLES[name]
+        statement, created_at = build_query()
+        if start:
+            statement = statement.where(created_at >= start)
+        if end:
+            statement = statement.where(created_at < end)
+
+        writer.writerow([title])
+        writer.writerow(header)
+        for rows in stream_rows(statement, batch_size):
+            writer.writerows([_format_value(value) for value in row] for row in rows)
+            yield flush()
+        writer.writerow([])
+
+    yield flush()
+
+
+def gzip_chunks(chunks, level=6):
+    """Gzip-compress a stream of text chunks on the fly, yielding compressed bytes."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits=31: gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
@@ -1,57 +1,68 @@
-from flask import session, flash
+from flask import session, flash, g
+from flask_login import current_user
 from decimal import Decimal, ROUND_HALF_UP
 from config import Config
+from ..models import db
+from .cart_store import cart_store
+from .reservations import hold_stock, set_hold, release_holds
 
 
 def get_cart():
-    """Get cart from session, creating empty cart if none exists."""
-    return session.get('cart', {})
+    """
+    Get the current user's cart from the cart store.
 
+    A cart still held in the session cookie from before the server-side
+    store is moved into it, holding its stock like any cart change, so the
+    cookie only carries the login.
+    """
+    legacy = session.pop('cart', None)
+    if legacy:
+        for product_id, quantity in legacy.items():
+            hold_stock(current_user.id, product_id, quantity)
+            cart_store.add(current_user.id, product_id, quantity)
+        _cart_changed()
+    return cart_store.get(current_user.id)
 
-def add_to_cart(product_id, quantity=1):
-    """Add item to cart in session."""
-    cart = get_cart()
-    product_id = str(product_id)
 
-    if product_id in cart:
-        cart[product_id] += quantity
-    else:
-        cart[product_id] = quantity
+def _cart_changed():
+    """
+    Commit the stock hold that goes with a cart change and drop this
+    request's CartView (see utils.cart_view) so it is re-read.
+    """
+    db.session.commit()
+    g.pop('cart_view', None)
+
 
-    session['cart'] = cart
-    session.modified = True
+def add_to_cart(product_id, quantity=1):
+    """Add item to cart, creating the line if it is not there yet, and hold the stock."""
+    hold_stock(current_user.id, product_id, quantity)
+    cart_store.add(current_user.id, product_id, quantity)
+    _cart_changed()
 
 
 def update_cart_item(product_id, quantity):
     """Update quantity of item in cart."""
-    cart = get_cart()
-    product_id = str(product_id)
-
     if quantity <= 0:
         remove_from_cart(product_id)
         return
 
-    if product_id in cart:
-        cart[product_id] = quantity
-        session['cart'] = cart
-        session.modified = True
+    set_hold(current_user.id, product_id, quantity)
+    cart_store.update(current_user.id, product_id, quantity)
+    _cart_changed()
 
 
 def remove_from_cart(product_id):
     """Remove item from cart."""
-    cart = get_cart()
-    product_id = str(product_id)
-
-    if product_id in cart:
-        del cart[product_id]
-        session['cart'] = cart
-        session.modified = True
+    release_holds(current_user.id, [product_id])
+    cart_store.remove(current_user.id, product_id)
+    _cart_changed()
 
 
 def clear_cart():
-    """Clear entire cart."""
-    session['cart'] = {}
-    session.modified = True
+    """Clear entire cart and release its holds."""
+    release_holds(current_user.id)
+    cart_store.clear(current_user.id)
+    _cart_changed()
 
 
 def get_cart_total(cart_items):
@@ -108,9 +119,18 @@ def format_currency(amount, currency='both'):
 
 
 def get_cart_count():
-    """Get total number of items in cart."""
-    cart = get_cart()
-    return sum(cart.values())
+    """
+    Get the number of products (lines) in the cart.
+
+    Reuses the CartView when this request has already loaded the cart, and
+    otherwise counts the lines in the store without loading them.
+    """
+    view = g.get('cart_view')
+    if view is not None:
+        return len(view)
+    if 'cart' in session:
+        return len(get_cart())
+    return cart_store.line_count(current_user.id)
 
 
 def validate_cart_stock(cart, products):
@@ -137,4 +157,15 @@ def validate_cart_stock(cart, products):
     return {
         'valid': len(errors) == 0,
         'errors': errors
-    }
\ No newline at end of file
+    }
+
+def order_item_counts(orders):
+    """Number of item lines of each order as {order_id: count}, from one grouped query."""
+    from ..models import OrderItem  # type: ignore[attr-defined]  # Import inside function
+    order_ids = [order.id for order in orders]
+    if not order_ids:
+        return {}
+    return dict(db.session.query(OrderItem.order_id, db.func.count(OrderItem.id))
+                .filter(OrderItem.order_id.in_(order_ids))
+                .group_by(OrderItem.order_id)
+                .all())
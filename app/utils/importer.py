@@ -0,0 +1,315 @@
+import csv
+import os
+import re
+import tempfile
+import uuid
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from sqlalchemy import insert, select, update
+from ..models import db, Product
+from .backup import Progress
+from .categories import add_to_totals, category_ids, tally
+
+# Columns read from a product CSV, in the order assumed for files without a header row
+PRODUCT_COLUMNS = ['name', 'price', 'stock_qty', 'category', 'image_url', 'cost_price', 'sku']
+REQUIRED_COLUMNS = ['name', 'price', 'stock_qty', 'category']
+
+# Natural keys an upsert import matches existing products on
+UPSERT_KEYS = {
+    'sku': ('sku',),
+    'name_category': ('name', 'category')
+}
+
+# Error reports: one CSV per import, named by a random token
+ERROR_REPORT_HEADER = ['row', 'error'] + PRODUCT_COLUMNS
+_TOKEN = re.compile(r'^[0-9a-f]{32}$')
+
+
+# VARCHAR limits of the text columns, checked before the INSERT rejects a whole batch
+_LENGTHS = {column: Product.__table__.c[column].type.length for column in ('name', 'category', 'image_url', 'sku')}
+
+
+def _decimal(value, field):
+    try:
+        number = Decimal(value)
+    except InvalidOperation:
+        raise ValueError(f'{field} must be a number, got "{value}"')
+    if not number.is_finite() or number < 0:
+        raise ValueError(f'{field} must be a non-negative number, got "{value}"')
+    column_type = Product.__table__.c[field].type
+    if number >= 10 ** (column_type.precision - column_type.scale):
+        raise ValueError(f'{field} is too large, got "{value}"')
+    return number.quantize(Decimal('0.01'))
+
+
+def _text(row, field, required=True, default=None):
+    value = (row.get(field) or '').strip() or default
+    if not value:
+        if required:
+            raise ValueError(f'{field} is required')
+        return None
+    if len(value) > _LENGTHS[field]:
+        raise ValueError(f'{field} is longer than {_LENGTHS[field]} characters')
+    return value
+
+
+def parse_product_row(row, default_category=None):
+    """
+    Validate one CSV row and convert it to Product column values.
+
+    Args:
+        row: Dict of raw CSV values keyed by column name
+        default_category: Category used when the row leaves it blank
+
+    Returns:
+        dict: name, price, cost_price, stock_qty, category, image_url and sku
+
+    Raises:
+        ValueError: If a required field is missing or a value is invalid
+    """
+    name = _text(row, 'name')
+    category = _text(row, 'category', default=default_category)
+
+    price = (row.get('price') or '').strip()
+    if not price:
+        raise ValueError('price is required')
+    cost_price = (row.get('cost_price') or '').strip()
+
+    stock_qty = (row.get('stock_qty') or '').strip()
+    try:
+        stock_qty = int(stock_qty)
+    except ValueError:
+        raise ValueError(f'stock_qty must be a whole number, got "{stock_qty}"')
+    if stock_qty < 0:
+        raise ValueError(f'stock_qty must not be negative, got {stock_qty}')
+
+    return {
+        'name': name,
+        'price': _decimal(price, 'price'),
+        'cost_price': _decimal(cost_price, 'cost_price') if cost_price else None,
+        'stock_qty': stock_qty,
+        'category': category,
+        'image_url': _text(row, 'image_url', required=False),
+        'sku': _text(row, 'sku', required=False)
+    }
+
+
+def read_product_csv(lines, has_headers=True):
+    """
+    Open a DictReader over a product CSV and check its columns.
+
+    Raises:
+        ValueError: If the header row lacks a required column
+    """
+    if not has_headers:
+        return csv.DictReader(lines, fieldnames=PRODUCT_COLUMNS)
+
+    reader = csv.DictReader(lines)
+    fieldnames = [name.strip().lstrip('\ufeff').lower() for name in reader.fieldnames or []]
+    missing = [name for name in REQUIRED_COLUMNS if name not in fieldnames]
+    if missing:
+        raise ValueError(f'Missing required columns: {", ".join(missing)}')
+    reader.fieldnames = fieldnames
+    return reader
+
+
+def _natural_key(key, values):
+    """
+    Key of a product for upsert matching, or None if it has no value for it.
+
+    Names and categories match case-insensitively, SKUs exactly.
+    """
+    if key == 'sku':
+        return values['sku']
+    return values['name'].casefold(), values['category'].casefold()
+
+
+def _existing_products(key, columns):
+    """
+    Map the natural key of every product to its id and current ``columns`` values.
+
+    One query for the whole table; where name+category is not unique the
+    oldest product wins.
+    """
+    statement = select(Product.id, Product.name, Product.category, Product.sku,
+                       *[Product.__table__.c[column] for column in columns])\
+        .order_by(Product.id)
+    existing = {}
+    for row in db.session.execute(statement):
+        values = row._mapping
+        product_key = _natural_key(key, values)
+        if product_key is not None:
+            existing.setdefault(product_key, (row.id, tuple(values[column] for column in columns)))
+    return existing
+
+
+def import_products(lines, batch_size=1000, has_headers=True, skip_duplicates=False,
+                    default_category=None, upsert=None, progress=None, errors=None):
+    """
+    Stream a product CSV into the products table in batches.
+
+    Rows are validated one at a time and written with one executemany
+    INSERT (and, when upserting, one executemany UPDATE) per ``batch_size``
+    rows, each batch in its own commit, so memory stays bounded by the batch
+    whatever the file size. A failure part-way keeps the batches already
+    committed.
+
+    In upsert mode the existing products are loaded once, keyed on
+    ``upsert``. Rows with a new key are inserted; rows matching a product
+    update the columns the file provides if any of them differ, and are
+    counted as unchanged otherwise without touching the database.
+
+    Args:
+        lines: Iterable of CSV text lines, e.g. an open text file
+        batch_size: Rows per INSERT/UPDATE and commit
+        has_headers: Whether the first line names the columns
+        skip_duplicates: Insert mode only: skip rows whose name already
+            exists in the table or earlier in the file
+        default_category: Category for rows that leave it blank
+        upsert: None to insert every row, or a key from UPSERT_KEYS
+        progress: Optional Progress counting imported/updated/unchanged/
+            skipped/errors rows
+        errors: Optional csv writer receiving one ERROR_REPORT_HEADER row
+            per rejected line
+
+    Returns:
+        Progress: The row counts
+
+    Raises:
+        ValueError: If the header row lacks a required column
+    """
+    progress = progress or Progress()
+    reader = read_product_csv(lines, has_headers)
+    has_sku = 'sku' in reader.fieldnames
+
+    if upsert:
+        key_columns = UPSERT_KEYS[upsert]
+        if 'sku' in key_columns and not has_sku:
+            raise ValueError('Missing required columns: sku')
+        # Columns the file provides and may change; everything else is left as it is
+        columns = [column for column in PRODUCT_COLUMNS
+                   if column in reader.fieldnames and column not in key_columns]
+        # One query up front instead of a lookup per row
+        existing = _existing_products(upsert, columns)
+        seen = {}
+    else:
+        names = set(db.session.scalars(select(Product.name))) if skip_duplicates else None
+
+    # SKU -> owning product id (or -line for new rows), so a clash is reported
+    # on its row instead of failing a whole batch on the unique constraint
+    skus = None
+    if has_sku and upsert != 'sku':
+        skus = dict(db.session.execute(select(Product.sku, Product.id).where(Product.sku.isnot(None))).all())
+
+    def sku_taken(values, product_id):
+        if skus is None or values['sku'] is None:
+            return False
+        return skus.setdefault(values['sku'], product_id) != product_id
+
+    inserts = []
+    updates = []
+
+    def reject(row, message):
+        if errors is not None:
+            errors.writerow([reader.line_num, message] + [row.get(column) or '' for column in PRODUCT_COLUMNS])
+        progress.add('errors', 1)
+
+    def flush():
+        now = datetime.utcnow()
+        # Category ids for the batch and the changes to the categories' totals
+        ids = category_ids([values['category'] for values in inserts + updates if 'category' in values])
+        totals = {}
+        if inserts:
+            for values in inserts:
+                values['created_at'] = values['updated_at'] = now
+                values['category_id'] = ids[values['category']]
+                tally(totals, None, (values['category_id'], values['price'], values['stock_qty']))
+            db.session.execute(insert(Product), inserts)
+        if updates:
+            before = {row.id: row for row in db.session.execute(
+                select(Product.id, Product.category_id, Product.price, Product.stock_qty)
+                .where(Product.id.in_([values['id'] for values in updates]))
+            )}
+            for values in updates:
+                values['updated_at'] = now
+                row = before[values['id']]
+                if 'category' in values:
+                    values['category_id'] = ids[values['category']]
+                tally(totals, (row.category_id, row.price, row.stock_qty),
+                      (values.get('category_id', row.category_id), values.get('price', row.price),
+                       values.get('stock_qty', row.stock_qty)))
+            db.session.execute(update(Product), updates)
+        add_to_totals(totals)
+        db.session.commit()
+        progress.add('imported', len(inserts))
+        progress.add('updated', len(updates))
+        inserts.clear()
+        updates.clear()
+
+    for row in reader:
+        try:
+            values = parse_product_row(row, default_category)
+        except ValueError as e:
+            reject(row, str(e))
+            continue
+
+        if upsert:
+            product_key = _natural_key(upsert, values)
+            if product_key is None:
+                reject(row, 'sku is required to upsert by SKU')
+                continue
+            if product_key in seen:
+                reject(row, f'duplicate of row {seen[product_key]}')
+                continue
+            seen[product_key] = reader.line_num
+
+            product_id, current = existing.get(product_key, (None, None))
+            if sku_taken(values, product_id or -reader.line_num):
+                reject(row, f'sku {values["sku"]} belongs to another product')
+                continue
+            if product_id is None:
+                inserts.append(values)
+            else:
+                changed = tuple(values[column] for column in columns)
+                if changed == current:
+                    progress.add('unchanged', 1)
+                    continue
+                updates.append(dict(zip(columns, changed), id=product_id))
+        else:
+            if names is not None:
+                if values['name'] in names:
+                    progress.add('skipped', 1)
+                    continue
+                names.add(values['name'])
+            if sku_taken(values, -reader.line_num):
+                reject(row, f'sku {values["sku"]} already exists (use an upsert mode to update it)')
+                continue
+            inserts.append(values)
+
+        if len(inserts) + len(updates) >= batch_size:
+            flush()
+
+    if inserts or updates:
+        flush()
+    return progress
+
+
+def error_report_path(token):
+    """
+    Path of the error report for ``token``, or None if the token is malformed.
+
+    Reports live in IMPORT_ERROR_DIR (created on demand).
+    """
+    if not _TOKEN.match(token or ''):
+        return None
+    from flask import current_app
+    directory = current_app.config.get('IMPORT_ERROR_DIR') or \
+        os.path.join(tempfile.gettempdir(), 'gsms_import_errors')
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, f'import_errors_{token}.csv')
+
+
+def new_error_report():
+    """Return a fresh (token, path) pair for an import's error report."""
+    token = uuid.uuid4().hex
+    return token, error_report_path(token)
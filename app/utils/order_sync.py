@@ -0,0 +1,235 @@
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from sqlalchemy import insert, or_, select
+from sqlalchemy.exc import IntegrityError
+from ..models import db, Order, OrderItem, Product
+from ..analytics.rollups import record_orders
+from ..analytics.product_sales import record_sold_items
+from .helpers import calculate_tax
+from .stock import decrement_stock_many
+
+PAYMENT_METHODS = ('cash', 'upi')
+
+# Client ids double as Order.idempotency_key, so a re-uploaded batch is not sold twice
+_KEY_LENGTH = Order.__table__.c.idempotency_key.type.length
+
+# Till clocks drift; sales stamped further in the future than this are rejected
+_CLOCK_SKEW = timedelta(minutes=5)
+
+# Tries of a batch that collides with a concurrent upload of the same client ids
+_ATTEMPTS = 3
+
+
+def _timestamp(value, now):
+    """Parse an ISO 8601 sale time into naive UTC, the form Order.created_at is stored in."""
+    if value in (None, ''):
+        return now
+    try:
+        moment = datetime.fromisoformat(str(value))
+    except ValueError:
+        raise ValueError(f'created_at must be an ISO 8601 timestamp, got "{value}"')
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    if moment > now + _CLOCK_SKEW:
+        raise ValueError(f'created_at {value} is in the future')
+    return moment
+
+
+def _parse_order(data, now):
+    """Validate the shape of one uploaded order; returns (created_at, payment_method, lines)."""
+    if not isinstance(data, dict):
+        raise ValueError('each order must be an object')
+
+    payment_method = data.get('payment_method')
+    if payment_method not in PAYMENT_METHODS:
+        raise ValueError(f'payment_method must be one of {", ".join(PAYMENT_METHODS)}')
+
+    items = data.get('items')
+    if not isinstance(items, list) or not items:
+        raise ValueError('items must be a non-empty list')
+    lines = []
+    for item in items:
+        if not isinstance(item, dict):
+            raise ValueError('each item must be an object')
+        quantity = item.get('quantity')
+        if not isinstance(quantity, int) or isinstance(quantity, bool) or quantity <= 0:
+            raise ValueError(f'quantity must be a positive whole number, got {quantity!r}')
+        product_id, sku = item.get('product_id'), item.get('sku')
+        if product_id is not None:
+            if not isinstance(product_id, int) or isinstance(product_id, bool):
+                raise ValueError(f'product_id must be a whole number, got {product_id!r}')
+            sku = None
+        elif not isinstance(sku, str) or not sku.strip():
+            raise ValueError('each item needs a product_id or sku')
+        lines.append((product_id, sku.strip() if sku else None, quantity))
+
+    return _timestamp(data.get('created_at'), now), payment_method, lines
+
+
+def sync_orders(orders, employee_id):
+    """
+    Record a batch of sales made offline by a till, in one transaction.
+
+    Each order carries a ``client_id`` unique to the till's sale, which is
+    stored as the order's idempotency key: orders already uploaded are
+    reported as duplicates, so a till can safely retry a whole batch. Prices
+    and tax come from the catalog as at checkout. An order is rejected if
+    it is malformed or, replayed in upload order against the running stock,
+    would take a product below zero.
+
+    The accepted orders are then written with a fixed number of set-based
+    statements, whatever the batch size:
+    - the conditional stock UPDATE of decrement_stock_many,
+    - one executemany INSERT for the orders, and one SELECT for their ids,
+    - one executemany INSERT for their items,
+    - one upsert per sales rollup table.
+    If the stock changed between the read and the UPDATE, nothing is saved
+    and the accepted orders are reported as 'conflict'. If a concurrent
+    upload of the same client ids commits first, the insert hits the unique
+    key: the batch is rolled back and run again, its orders now reported as
+    duplicates.
+
+    Args:
+        orders: Dicts with client_id, created_at (ISO 8601, default now),
+            payment_method and items [{product_id or sku, quantity}]
+        employee_id: User the sales are recorded for
+
+    Returns:
+        list: One dict per order with client_id, status ('created',
+        'duplicate', 'rejected' or 'conflict'), order_id, total and error
+    """
+    now = datetime.utcnow()
+    results = []
+    parsed = {}
+    for data in orders:
+        client_id = data.get('client_id') if isinstance(data, dict) else None
+        result = {'client_id': client_id, 'status': 'rejected', 'order_id': None, 'total': None, 'error': None}
+        results.append(result)
+        try:
+            if not isinstance(client_id, str) or not client_id.strip():
+                raise ValueError('client_id is required')
+            if len(client_id) > _KEY_LENGTH:
+                raise ValueError(f'client_id is longer than {_KEY_LENGTH} characters')
+            if client_id in parsed:
+                raise ValueError('client_id appears more than once in the batch')
+            parsed[client_id] = _parse_order(data, now)
+        except ValueError as e:
+            result['error'] = str(e)
+
+    valid = [result for result in results if result['error'] is None]
+    for _ in range(_ATTEMPTS):
+        try:
+            return _record(results, parsed, employee_id)
+        except IntegrityError:
+            # Another request got orders with these keys in first; start over
+            db.session.rollback()
+            for result in valid:
+                result.update(status='rejected', order_id=None, total=None, error=None)
+    for result in valid:
+        result['status'] = 'conflict'
+        result['error'] = 'a concurrent upload kept colliding; nothing was saved, retry'
+    return results
+
+
+def _record(results, parsed, employee_id):
+    """Write the valid orders of ``results`` (see sync_orders), filling in their statuses."""
+    # Orders uploaded by an earlier attempt: one probe of the unique key index
+    existing = {}
+    if parsed:
+        existing = dict(db.session.execute(
+            select(Order.idempotency_key, Order.id).where(Order.idempotency_key.in_(list(parsed)))
+        ).all())
+
+    pending = [result for result in results if result['error'] is None]
+    for result in pending:
+        if result['client_id'] in existing:
+            result['status'], result['order_id'] = 'duplicate', existing[result['client_id']]
+    pending = [result for result in pending if result['status'] != 'duplicate']
+
+    ids = {product_id for result in pending for product_id, _, _ in parsed[result['client_id']][2] if product_id}
+    skus = {sku for result in pending for _, sku, _ in parsed[result['client_id']][2] if sku}
+    products = by_sku = {}
+    if pending:
+        rows = db.session.scalars(
+            select(Product).where(or_(Product.id.in_(ids), Product.sku.in_(skus))).with_for_update()
+        ).all()
+        products = {product.id: product for product in rows}
+        by_sku = {product.sku: product for product in rows if product.sku is not None}
+
+    # Replay the orders against the running stock and price their lines
+    stock = {}
+    accepted = []
+    for result in pending:
+        created_at, payment_method, lines = parsed[result['client_id']]
+        taken = {}
+        items = []
+        try:
+            for product_id, sku, quantity in lines:
+                product = products.get(product_id) if sku is None else by_sku.get(sku)
+                if product is None:
+                    raise ValueError(f'unknown product {product_id or sku}')
+                taken[product.id] = taken.get(product.id, 0) + quantity
+                items.append((product, quantity))
+            for product_id, quantity in taken.items():
+                available = stock.get(product_id, products[product_id].stock_qty)
+                if quantity > available:
+                    raise ValueError(f'insufficient stock for {products[product_id].name} ({available} available)')
+        except ValueError as e:
+            result['error'] = str(e)
+            continue
+
+        for product_id, quantity in taken.items():
+            stock[product_id] = stock.get(product_id, products[product_id].stock_qty) - quantity
+        subtotal = sum((product.price * quantity for product, quantity in items), Decimal('0.00'))
+        tax = calculate_tax(subtotal)
+        result['status'], result['total'] = 'created', subtotal + tax
+        accepted.append((result, created_at, payment_method, tax, items))
+
+    if not accepted:
+        db.session.rollback()
+        return results
+
+    sold = {product_id: products[product_id].stock_qty - left for product_id, left in stock.items()}
+    if not decrement_stock_many(sold):
+        db.session.rollback()
+        for result, *_ in accepted:
+            result['status'], result['total'] = 'conflict', None
+            result['error'] = 'stock changed while saving; nothing was saved, retry'
+        return results
+
+    order_rows = [{
+        'idempotency_key': result['client_id'],
+        'created_at': created_at,
+        'employee_id': employee_id,
+        'total_amount': result['total'],
+        'tax_amount': tax,
+        'discount_amount': Decimal('0.00'),
+        'payment_method': payment_method,
+        'status': 'completed'
+    } for result, created_at, payment_method, tax, _ in accepted]
+    db.session.execute(insert(Order.__table__), order_rows)
+    order_ids = dict(db.session.execute(
+        select(Order.idempotency_key, Order.id).where(Order.idempotency_key.in_([row['idempotency_key'] for row in order_rows]))
+    ).all())
+
+    item_rows = []
+    sold_items = []
+    for result, created_at, _, _, items in accepted:
+        result['order_id'] = order_ids[result['client_id']]
+        for product, quantity in items:
+            item_rows.append({
+                'order_id': result['order_id'],
+                'product_id': product.id,
+                'product_name_snapshot': product.name,
+                'unit_price_snapshot': product.price,
+                'unit_cost_snapshot': product.unit_cost,
+                'quantity': quantity,
+                'line_total': product.price * quantity
+            })
+            sold_items.append(dict(item_rows[-1], created_at=created_at))
+    db.session.execute(insert(OrderItem.__table__), item_rows)
+
+    record_orders(order_rows)
+    record_sold_items(sold_items)
+    db.session.commit()
+    return results
@@ -0,0 +1,142 @@
+from datetime import date, datetime
+from flask import current_app, request
+from itsdangerous import BadSignature, URLSafeSerializer
+from sqlalchemy import and_, or_
+from .cache import report_cache
+
+
+class KeysetPagination:
+    """
+    One page of a listing fetched by keyset (cursor) rather than OFFSET.
+
+    The listing is ordered on ``keys``, a tuple of columns ending in a
+    unique one such as (Order.created_at, Order.id). A page is the first
+    ``per_page`` rows after (or before) the key of the last (or first) row
+    of the page the visitor came from, so the database seeks into the index
+    instead of counting past every earlier row: deep pages cost what the
+    first one does. The cursors are signed, opaque tokens.
+
+    Offers the attributes the templates use on Flask-SQLAlchemy's
+    Pagination where they make sense (items, has_prev, has_next, total,
+    per_page) plus prev_token and next_token; there are no page numbers.
+    ``total`` is an approximate count, see paginate_listing.
+    """
+
+    cursor_based = True
+
+    def __init__(self, query, keys, descending=False, cursor=None, per_page=10, total=None):
+        self.keys = keys
+        self.descending = descending
+        self.per_page = per_page
+        self.total = total
+
+        direction, values = self._decode(cursor)
+        backwards = direction == 'prev'
+        ascending = descending == backwards  # Scan order of this fetch
+        ordering = [key.asc() if ascending else key.desc() for key in keys]
+        if values is not None:
+            query = query.filter(self._seek(values, forwards=ascending))
+        rows = query.order_by(*ordering).limit(per_page + 1).all()
+
+        more = len(rows) > per_page
+        rows = rows[:per_page]
+        if backwards:
+            rows.reverse()
+        self.items = rows
+        self.has_prev = more if backwards else values is not None
+        self.has_next = values is not None if backwards else more
+
+    def __iter__(self):
+        return iter(self.items)
+
+    @property
+    def prev_token(self):
+        return self._encode('prev', self.items[0]) if self.has_prev and self.items else None
+
+    @property
+    def next_token(self):
+        return self._encode('next', self.items[-1]) if self.has_next and self.items else None
+
+    def _serializer(self):
+        # Salted with the key columns, so a cursor of one listing is not accepted by another
+        salt = 'keyset:' + ','.join(str(key) for key in self.keys)
+        return URLSafeSerializer(current_app.config['SECRET_KEY'], salt=salt)
+
+    def _encode(self, direction, row):
+        values = [getattr(row, key.key) for key in self.keys]
+        return self._serializer().dumps([direction, [
+            value.isoformat() if isinstance(value, (datetime, date)) else value for value in values
+        ]])
+
+    def _decode(self, cursor):
+        """(direction, key values) of a cursor; (None, None), the first page, if it is missing or invalid."""
+        if not cursor:
+            return None, None
+        try:
+            direction, raw = self._serializer().loads(cursor)
+            if direction not in ('prev', 'next') or len(raw) != len(self.keys):
+                return None, None
+            values = []
+            for key, value in zip(self.keys, raw):
+                kind = key.type.python_type
+                if value is not None and kind in (datetime, date):
+                    value = kind.fromisoformat(value)
+                values.append(value)
+        except (BadSignature, TypeError, ValueError, NotImplementedError):
+            return None, None
+        return direction, values
+
+    def _seek(self, values, forwards):
+        """
+        Rows strictly after ``values`` in the scan order, written as
+        k1 >= v1 AND (k1 > v1 OR (k1 = v1 AND k2 > v2) ...): the leading bound
+        is a plain range on the index's first column, which every optimizer
+        turns into an index seek, where a row-value comparison may not be.
+        """
+        def beyond(key, value):
+            return key > value if forwards else key < value
+
+        leading = self.keys[0] >= values[0] if forwards else self.keys[0] <= values[0]
+        exact = []
+        alternatives = []
+        for key, value in zip(self.keys, values):
+            alternatives.append(and_(*exact, beyond(key, value)))
+            exact.append(key == value)
+        return and_(leading, or_(*alternatives))
+
+
+def paginate_listing(query, keys, descending=False, total_key=None, per_page=None):
+    """
+    Paginate a listing the way LISTING_PAGINATION says.
+
+    'keyset' (the default) returns a KeysetPagination at the request's
+    ``cursor``; 'offset' returns a numbered Flask-SQLAlchemy page at its
+    ``page``, ordered on the same keys.
+
+    Args:
+        query: Query with the listing's filters applied and no ORDER BY
+        keys: Columns to order on, ending in a unique one
+        descending: Order newest/highest first
+        total_key: Hashable identifying the listing and its filters; when
+            given, keyset pages carry a COUNT(*) cached for
+            LISTING_TOTAL_TTL seconds, so it lags recent writes
+        per_page: Rows per page, default ITEMS_PER_PAGE
+
+    Returns:
+        KeysetPagination or Pagination
+    """
+    per_page = per_page or current_app.config['ITEMS_PER_PAGE']
+
+    if current_app.config.get('LISTING_PAGINATION', 'keyset') == 'offset':
+        ordering = [key.desc() if descending else key.asc() for key in keys]
+        return query.order_by(*ordering).paginate(page=request.args.get('page', 1, type=int),
+                                                  per_page=per_page, error_out=False)
+
+    total = None
+    if total_key is not None:
+        # Tables are left out on purpose: writes do not invalidate the count, the TTL does
+        total = report_cache.get_or_compute('listing_total', total_key, (),
+                                            lambda: query.order_by(None).count(),
+                                            ttl=current_app.config.get('LISTING_TOTAL_TTL', 60))
+    return KeysetPagination(query, keys, descending=descending, cursor=request.args.get('cursor'),
+                            per_page=per_page, total=total)
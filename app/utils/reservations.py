@@ -0,0 +1,144 @@
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import delete, func, select
+from ..models import db, StockHold
+from .sql import upsert_increment
+
+
+def _ttl():
+    from flask import current_app
+    return timedelta(seconds=current_app.config.get('STOCK_HOLD_TTL', 900))
+
+
+def held_quantities(product_ids, exclude_user=None, now=None):
+    """
+    Units of each product held by active (unexpired) holds.
+
+    One grouped SUM answered from the (product_id, expires_at, quantity)
+    index; expired holds are ignored whether or not the sweeper has removed
+    them yet.
+
+    Args:
+        product_ids: Products to sum holds for
+        exclude_user: Optional user whose own holds are not counted
+        now: Reference time, defaults to utcnow
+
+    Returns:
+        dict: {product_id: held quantity}, products without holds omitted
+    """
+    if not product_ids:
+        return {}
+    conditions = [StockHold.product_id.in_(product_ids), StockHold.expires_at > (now or datetime.utcnow())]
+    if exclude_user is not None:
+        conditions.append(StockHold.user_id != exclude_user)
+    rows = db.session.execute(
+        select(StockHold.product_id, func.sum(StockHold.quantity))
+        .where(*conditions)
+        .group_by(StockHold.product_id)
+    )
+    return {product_id: int(quantity) for product_id, quantity in rows}
+
+
+def held_by_others(product_id, user_id, now=None):
+    """
+    Correlated scalar subquery of the units of ``product_id`` (a column or
+    value) held by users other than ``user_id``, for use inside a SELECT.
+    """
+    return select(func.coalesce(func.sum(StockHold.quantity), 0))\
+        .where(StockHold.product_id == product_id,
+               StockHold.user_id != user_id,
+               StockHold.expires_at > (now or datetime.utcnow()))\
+        .scalar_subquery()
+
+
+def hold_stock(user_id, product_id, quantity):
+    """
+    Add ``quantity`` to the user's hold on a product and restart its TTL.
+
+    A single upsert on the user's own row: placing a hold takes no lock on
+    the product, so concurrent cart actions never wait on each other. Holds
+    are enforced at checkout: the conditional UPDATE there
+    (utils.stock.decrement_stock) only takes stock other carts do not hold.
+    The caller commits.
+    """
+    upsert_increment(StockHold.__table__,
+                     key={'user_id': user_id, 'product_id': int(product_id)},
+                     deltas={'quantity': quantity},
+                     assign={'expires_at': datetime.utcnow() + _ttl()})
+
+
+def set_hold(user_id, product_id, quantity):
+    """Hold exactly ``quantity`` of a product for the user, restarting its TTL. The caller commits."""
+    upsert_increment(StockHold.__table__,
+                     key={'user_id': user_id, 'product_id': int(product_id)},
+                     deltas={},
+                     assign={'quantity': quantity, 'expires_at': datetime.utcnow() + _ttl()})
+
+
+def release_holds(user_id, product_ids=None):
+    """
+    Drop the user's holds on ``product_ids`` (all of them if None).
+
+    Checkout calls this inside its transaction, so the held units turn into
+    the sale's stock decrement atomically. The caller commits.
+    """
+    statement = delete(StockHold).where(StockHold.user_id == user_id)
+    if product_ids is not None:
+        statement = statement.where(StockHold.product_id.in_([int(product_id) for product_id in product_ids]))
+    db.session.execute(statement.execution_options(synchronize_session=False))
+
+
+def expire_holds(now=None):
+    """
+    Delete holds whose TTL has passed.
+
+    Returns:
+        int: Number of holds removed
+    """
+    removed = db.session.execute(
+        delete(StockHold)
+        .where(StockHold.expires_at <= (now or datetime.utcnow()))
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    return removed
+
+
+class HoldSweeper:
+    """
+    Background thread deleting expired holds every STOCK_HOLD_SWEEP_INTERVAL seconds.
+
+    Expiry itself does not depend on it, since availability only counts
+    unexpired holds; sweeping keeps the table and its index small. Every
+    worker runs its own sweeper and the DELETE is idempotent. Set the
+    interval to 0 to disable it, e.g. when `flask expire-holds` runs from cron.
+    """
+
+    def __init__(self):
+        self.interval = 0
+        self._thread = None
+        self._stop = threading.Event()
+
+    def init_app(self, app):
+        self.interval = app.config.get('STOCK_HOLD_SWEEP_INTERVAL', 60)
+        app.extensions['hold_sweeper'] = self
+        if self.interval and self._thread is None:
+            self._thread = threading.Thread(target=self._run, args=(app,), name='hold-sweeper', daemon=True)
+            self._thread.start()
+
+    def _run(self, app):
+        while not self._stop.wait(self.interval):
+            with app.app_context():
+                try:
+                    removed = expire_holds()
+                    if removed:
+                        app.logger.info(f'Expired {removed} stock holds')
+                except Exception as e:
+                    db.session.rollback()
+                    app.logger.warning(f'Stock hold sweep failed: {e}')
+
+    def stop(self):
+        self._stop.set()
+
+
+hold_sweeper = HoldSweeper()
@@ -0,0 +1,445 @@
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import timedelta
+from flask import current_app
+from flask_sqlalchemy.pagination import Pagination
+from sqlalchemy import DDL, column, event, or_, select, table
+from sqlalchemy.dialects.mysql import match
+from sqlalchemy.orm import Session
+from ..models import db, Product
+from .cache import table_versions
+from .sql import dialect_name
+
+_WORD = re.compile(r'\w+')
+
+# Minimum trigram similarity for a misspelt word to match, tried only when a
+# search word matches nothing exactly
+_FUZZY_THRESHOLD = 0.4
+
+# A refresh re-reads rows changed this long before the last one it saw, so a
+# transaction that committed late with an earlier updated_at is not missed
+_REFRESH_OVERLAP = timedelta(seconds=60)
+
+
+def _words(text):
+    return _WORD.findall(text.lower()) if text else []
+
+
+def _trigrams(word):
+    """Trigrams of a word padded pg_trgm style, two spaces before and one after."""
+    padded = f'  {word} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class ProductSearchIndex:
+    """
+    In-memory product search index, one per worker.
+
+    Product names are split into words with a posting set of product ids
+    each, and the distinct words are indexed by trigram, so a search word is
+    looked up in the vocabulary (whole word, prefix, substring, then
+    misspelling) rather than against every product. Categories and SKUs are
+    matched from their own maps, and a numeric search or a SKU matches its
+    product exactly.
+
+    Results are ranked by the weakest match among the search words: exact
+    id/SKU first, then whole words, word prefixes, substrings or category
+    matches, and misspellings, by name within a rank. Words of one or two
+    letters only match word prefixes.
+
+    The index is loaded on the first search. Commits of this worker that
+    write products (see cache.table_versions), and every PRODUCT_SEARCH_REFRESH
+    seconds for other workers, trigger a refresh of the rows whose
+    updated_at moved, which every product write sets. Products deleted
+    through the ORM are dropped on commit; a bulk DELETE reloads the index.
+    """
+
+    def __init__(self, max_results=1000, refresh_interval=30):
+        self.max_results = max_results
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._names = {}       # id -> lowercased name, also the order within a rank
+        self._fields = {}      # id -> (lowercased category, lowercased SKU)
+        self._postings = {}    # name word -> ids
+        self._grams = {}       # trigram -> name words containing it
+        self._categories = {}  # lowercased category -> ids
+        self._skus = {}        # lowercased SKU -> id
+        self._watermark = None
+        self._version = None
+        self._checked_at = 0.0
+        self._rebuild = True
+
+    def __len__(self):
+        return len(self._names)
+
+    def _put(self, product_id, name, sku, category):
+        if product_id in self._names:
+            self._drop(product_id)
+        name = (name or '').lower()
+        for word in set(_words(name)):
+            ids = self._postings.get(word)
+            if ids is None:
+                ids = self._postings[word] = set()
+                for gram in _trigrams(word):
+                    self._grams.setdefault(gram, set()).add(word)
+            ids.add(product_id)
+        category, sku = sys.intern((category or '').lower()), (sku or '').lower()
+        self._names[product_id] = name
+        self._fields[product_id] = (category, sku)
+        self._categories.setdefault(category, set()).add(product_id)
+        if sku:
+            self._skus[sku] = product_id
+
+    def _drop(self, product_id):
+        name = self._names.pop(product_id, None)
+        if name is None:
+            return
+        category, sku = self._fields.pop(product_id)
+        for word in set(_words(name)):
+            ids = self._postings[word]
+            ids.discard(product_id)
+            if not ids:
+                del self._postings[word]
+                for gram in _trigrams(word):
+                    self._grams[gram].discard(word)
+                    if not self._grams[gram]:
+                        del self._grams[gram]
+        ids = self._categories[category]
+        ids.discard(product_id)
+        if not ids:
+            del self._categories[category]
+        if sku and self._skus.get(sku) == product_id:
+            del self._skus[sku]
+
+    def _load(self, statement):
+        for product_id, name, sku, category, updated_at in db.session.execute(
+                statement.execution_options(yield_per=5000)):
+            self._put(product_id, name, sku, category)
+            if updated_at is not None and (self._watermark is None or updated_at > self._watermark):
+                self._watermark = updated_at
+
+    def _sync(self):
+        version = table_versions.get('products', 0)
+        now = time.monotonic()
+        if self._rebuild:
+            self._reset()
+            self._load(select(Product.id, Product.name, Product.sku, Product.category, Product.updated_at))
+            self._rebuild = False
+        elif version != self._version or now - self._checked_at >= self.refresh_interval:
+            statement = select(Product.id, Product.name, Product.sku, Product.category, Product.updated_at)
+            if self._watermark is not None:
+                statement = statement.where(Product.updated_at >= self._watermark - _REFRESH_OVERLAP)
+            self._load(statement)
+        else:
+            return
+        self._version, self._checked_at = version, now
+
+    def forget(self, product_ids=(), rebuild=False):
+        """Drop deleted products, or reload everything on the next search if ``rebuild``."""
+        with self._lock:
+            if rebuild:
+                self._rebuild = True
+            for product_id in product_ids:
+                self._drop(product_id)
+
+    def _word_matches(self, token):
+        """Vocabulary words matching a search word: (prefix words, substring words)."""
+        if len(token) < 3:
+            words = self._grams.get(('  ' + token)[-3:], set())
+            return [word for word in words if word != token], []
+        grams = sorted((self._grams.get(token[i:i + 3], set()) for i in range(len(token) - 2)), key=len)
+        candidates = grams[0].intersection(*grams[1:])
+        prefix, inside = [], []
+        for word in candidates:
+            if word != token and token in word:
+                (prefix if word.startswith(token) else inside).append(word)
+        return prefix, inside
+
+    def _misspellings(self, token):
+        """Vocabulary words similar enough to ``token`` by shared trigrams."""
+        grams = _trigrams(token)
+        shared = Counter(word for gram in grams for word in self._grams.get(gram, ()))
+        return [word for word, count in shared.items()
+                if count / (len(grams) + len(word) + 1 - count) >= _FUZZY_THRESHOLD]
+
+    def _match(self, token):
+        """Products matching one search word, as cumulative sets per rank."""
+        def union(words):
+            return set().union(*(self._postings[word] for word in words))
+
+        prefix, inside = self._word_matches(token)
+        exact = set(self._postings.get(token, ()))
+        by_prefix = exact | union(prefix)
+        by_substring = by_prefix | union(inside)
+        for category, ids in self._categories.items():
+            if token in category if len(token) >= 3 else any(word.startswith(token) for word in _words(category)):
+                by_substring |= ids
+        if by_substring or len(token) < 3:
+            return [exact, by_prefix, by_substring, by_substring]
+        return [exact, by_prefix, by_substring, union(self._misspellings(token))]
+
+    def search(self, text, category=None):
+        """
+        Ids of the products matching ``text``, best first.
+
+        Args:
+            text: Search words; every word must match the name, category or SKU
+            category: Optional category the products must be in
+
+        Returns:
+            list: At most max_results product ids
+        """
+        query = text.strip().lower()
+        tokens = _words(query)
+        with self._lock:
+            self._sync()
+            exact = []
+            if query.isdigit() and int(query) in self._names:
+                exact.append(int(query))
+            if query in self._skus and self._skus[query] not in exact:
+                exact.append(self._skus[query])
+
+            ranks = None
+            for token in tokens:
+                matches = self._match(token)
+                ranks = matches if ranks is None else [a & b for a, b in zip(ranks, matches)]
+            if category and ranks:
+                allowed = self._categories.get(category.lower(), set())
+                ranks = [rank & allowed for rank in ranks]
+
+            ranked = exact
+            seen = set(exact)
+            for rank in ranks or ():
+                room = self.max_results - len(ranked)
+                if room <= 0:
+                    break
+                bucket = rank - seen
+                seen |= bucket
+                ranked.extend(sorted(bucket, key=self._names.__getitem__)[:room])
+        return ranked[:self.max_results]
+
+    def paginate(self, query, text, page, per_page, category=None):
+        """
+        Paginate ``query`` (a Product query with the page's own filters)
+        over the products matching ``text``, in rank order.
+
+        Two queries by primary key: the ranked ids that pass the filters,
+        then the current page's products.
+        """
+        ids = self.search(text, category)
+        if ids:
+            matching = {product_id for (product_id,) in
+                        query.filter(Product.id.in_(ids)).with_entities(Product.id).order_by(None)}
+            ids = [product_id for product_id in ids if product_id in matching]
+        return RankedPagination(page=page, per_page=per_page, error_out=False, query=query, ids=ids)
+
+
+class RankedPagination(Pagination):
+    """Page of a Product query over a list of ids in the order given."""
+
+    def _query_items(self):
+        ids = self._query_args['ids'][self._query_offset:self._query_offset + self.per_page]
+        if not ids:
+            return []
+        products = {product.id: product for product in
+                    self._query_args['query'].filter(Product.id.in_(ids)).order_by(None)}
+        return [products[product_id] for product_id in ids if product_id in products]
+
+    def _query_count(self):
+        return len(self._query_args['ids'])
+
+
+class IlikeSearch:
+    """Search by scanning name, id, SKU and category with ILIKE; no state to keep."""
+
+    def paginate(self, query, text, page, per_page, category=None):
+        pattern = f'%{text}%'
+        return query.filter(or_(Product.name.ilike(pattern),
+                                Product.id.ilike(pattern),
+                                Product.sku.ilike(pattern),
+                                Product.category.ilike(pattern)))\
+                    .order_by(Product.name)\
+                    .paginate(page=page, per_page=per_page, error_out=False)
+
+    def forget(self, product_ids=(), rebuild=False):
+        pass
+
+
+class FullTextSearch:
+    """
+    Search with the database's own full-text index over name, category and
+    SKU: the products_fts FTS5 table on SQLite, the ft_products_search
+    FULLTEXT index on MySQL. Every search word must match the start of a
+    word; results are ordered by relevance (bm25, or the MATCH score), then
+    name.
+
+    Falls back to IlikeSearch when the database has no such index (checked
+    once per worker), for numeric searches (product ids), and on MySQL for
+    words shorter than innodb_ft_min_token_size (3 by default).
+    """
+
+    def __init__(self):
+        self.fallback = IlikeSearch()
+        self._dialect = None  # dialect whose index was found, or False
+
+    def _indexed_dialect(self):
+        if self._dialect is None:
+            name = dialect_name()
+            found = None
+            if name == 'sqlite':
+                found = db.session.execute(db.text(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'products_fts'"
+                )).first()
+            elif name == 'mysql':
+                found = db.session.execute(db.text(
+                    "SELECT 1 FROM information_schema.statistics "
+                    "WHERE table_schema = DATABASE() AND table_name = 'products' AND index_name = :name"
+                ), {'name': FULLTEXT_INDEX}).first()
+            self._dialect = name if found else False
+            if not found:
+                current_app.logger.warning(f'No full-text index on products ({name}); searching with ILIKE')
+        return self._dialect
+
+    def paginate(self, query, text, page, per_page, category=None):
+        words = _words(text)
+        dialect = self._indexed_dialect() if words and not text.strip().isdigit() else False
+
+        if dialect == 'sqlite':
+            terms = ' '.join(f'"{word}"*' for word in words)
+            query = query.join(_fts, _fts.c.rowid == Product.id)\
+                         .filter(_fts.c.products_fts.op('MATCH')(terms))\
+                         .order_by(_fts.c.rank, Product.name)
+        elif dialect == 'mysql' and min(len(word) for word in words) >= 3:
+            score = match(Product.name, Product.category, Product.sku,
+                          against=' '.join(f'+{word}*' for word in words)).in_boolean_mode()
+            query = query.filter(score > 0).order_by(score.desc(), Product.name)
+        else:
+            return self.fallback.paginate(query, text, page, per_page, category=category)
+
+        return query.paginate(page=page, per_page=per_page, error_out=False)
+
+    def forget(self, product_ids=(), rebuild=False):
+        pass
+
+
+class ProductSearch:
+    """
+    Product search for the product listings, backed by PRODUCT_SEARCH_BACKEND:
+    'index' (ProductSearchIndex), 'fulltext' (FullTextSearch) or 'ilike'.
+    """
+
+    def __init__(self):
+        self.backend = None
+
+    def init_app(self, app):
+        kind = app.config.get('PRODUCT_SEARCH_BACKEND', 'index')
+
+        if kind == 'index':
+            self.backend = ProductSearchIndex(app.config.get('PRODUCT_SEARCH_MAX_RESULTS', 1000),
+                                              app.config.get('PRODUCT_SEARCH_REFRESH', 30))
+        elif kind == 'fulltext':
+            self.backend = FullTextSearch()
+        elif kind == 'ilike':
+            self.backend = IlikeSearch()
+        else:
+            raise ValueError(f'Unknown PRODUCT_SEARCH_BACKEND "{kind}" (expected "index", "fulltext" or "ilike")')
+
+        app.extensions['product_search'] = self
+
+    def paginate(self, query, text, page, per_page, category=None):
+        """
+        Page ``page`` of the products of ``query`` matching ``text``.
+
+        Args:
+            query: Product query with the listing's other filters applied
+            text: Search text as typed
+            page: 1-based page number
+            per_page: Products per page
+            category: Category ``query`` is filtered on, if any, to narrow the search
+
+        Returns:
+            Pagination: Same interface as Query.paginate()
+        """
+        return self.backend.paginate(query, text, page, per_page, category=category)
+
+    def forget(self, product_ids=(), rebuild=False):
+        if self.backend is not None:
+            self.backend.forget(product_ids, rebuild)
+
+
+product_search = ProductSearch()
+
+
+# Full-text index for FullTextSearch, created along with the products table by
+# create_all; migration b8e1d5c3a0f9 adds it to existing databases. On SQLite
+# it is an external-content FTS5 table, kept in step by triggers so bulk
+# imports and restores are indexed too; stock updates do not touch it.
+
+FULLTEXT_INDEX = 'ft_products_search'
+
+_fts = table('products_fts', column('rowid'), column('rank'), column('products_fts'))
+
+_SQLITE_FTS_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5("
+    "name, category, sku, content='products', content_rowid='id', prefix='2 3')",
+    "CREATE TRIGGER IF NOT EXISTS products_fts_insert AFTER INSERT ON products BEGIN "
+    "INSERT INTO products_fts (rowid, name, category, sku) VALUES (new.id, new.name, new.category, new.sku); END",
+    "CREATE TRIGGER IF NOT EXISTS products_fts_delete AFTER DELETE ON products BEGIN "
+    "INSERT INTO products_fts (products_fts, rowid, name, category, sku) "
+    "VALUES ('delete', old.id, old.name, old.category, old.sku); END",
+    "CREATE TRIGGER IF NOT EXISTS products_fts_update AFTER UPDATE OF name, category, sku ON products BEGIN "
+    "INSERT INTO products_fts (products_fts, rowid, name, category, sku) "
+    "VALUES ('delete', old.id, old.name, old.category, old.sku); "
+    "INSERT INTO products_fts (rowid, name, category, sku) VALUES (new.id, new.name, new.category, new.sku); END",
+]
+
+
+def _sqlite_has_fts5(ddl, target, bind, **kw):
+    return bool(bind.exec_driver_sql("SELECT sqlite_compileoption_used('ENABLE_FTS5')").scalar())
+
+
+for _statement in _SQLITE_FTS_DDL:
+    event.listen(Product.__table__, 'after_create',
+                 DDL(_statement).execute_if(dialect='sqlite', callable_=_sqlite_has_fts5))
+event.listen(Product.__table__, 'after_create',
+             DDL(f'ALTER TABLE products ADD FULLTEXT INDEX {FULLTEXT_INDEX} (name, category, sku)')
+             .execute_if(dialect='mysql'))
+event.listen(Product.__table__, 'after_drop',
+             DDL('DROP TABLE IF EXISTS products_fts').execute_if(dialect='sqlite'))
+
+
+# Deleted products leave no updated_at behind for a refresh to find, so the
+# index is told about them when the deleting transaction commits.
+
+@event.listens_for(Session, 'after_flush')
+def _track_deleted_products(session, flush_context):
+    deleted = [obj.id for obj in session.deleted if isinstance(obj, Product)]
+    if deleted:
+        session.info.setdefault('deleted_products', set()).update(deleted)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _track_bulk_delete(orm_execute_state):
+    table = getattr(orm_execute_state.statement, 'table', None)
+    if orm_execute_state.is_delete and table is not None and table.name == Product.__tablename__:
+        orm_execute_state.session.info['products_bulk_deleted'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _forget_on_commit(session):
+    deleted = session.info.pop('deleted_products', None)
+    rebuild = session.info.pop('products_bulk_deleted', False)
+    if deleted or rebuild:
+        product_search.forget(deleted or (), rebuild)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_on_rollback(session):
+    session.info.pop('deleted_products', None)
+    session.info.pop('products_bulk_deleted', None)
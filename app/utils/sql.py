@@ -0,0 +1,102 @@
+from sqlalchemy import update, text
+from ..models import db
+
+
+def dialect_name():
+    """Return the name of the active database dialect ('mysql', 'sqlite', ...)."""
+    return db.engine.dialect.name
+
+
+def explain(statement):
+    """
+    Return the database's query plan for a SELECT statement.
+
+    Runs EXPLAIN QUERY PLAN on SQLite and EXPLAIN elsewhere, with parameters
+    rendered inline. Useful for checking that a query can use an index.
+
+    Returns:
+        list: One dict per plan row, keyed by the columns of the EXPLAIN output
+    """
+    dialect = db.engine.dialect
+    sql = str(statement.compile(dialect=dialect, compile_kwargs={'literal_binds': True}))
+    prefix = 'EXPLAIN QUERY PLAN ' if dialect.name == 'sqlite' else 'EXPLAIN '
+    return [dict(row._mapping) for row in db.session.execute(text(prefix + sql))]
+
+
+def upsert_increment(table, key, deltas, assign=None):
+    """
+    Add ``deltas`` to the row identified by ``key``, inserting it if missing.
+
+    Uses the dialect's native upsert (ON DUPLICATE KEY / ON CONFLICT) so the
+    increment is a single statement and safe under concurrent checkouts. A
+    unique constraint must exist over the ``key`` columns.
+
+    Args:
+        table: SQLAlchemy Table object
+        key: dict of column name -> value identifying the row
+        deltas: dict of column name -> amount to add
+        assign: Optional dict of column name -> value to overwrite
+    """
+    assign = assign or {}
+    upsert_increment_many(table, list(key), [{**key, **deltas, **assign}], assign=list(assign))
+
+
+def upsert_increment_many(table, key_columns, rows, assign=()):
+    """
+    Batched form of upsert_increment: one executemany for all ``rows``.
+
+    Every row is a dict holding the ``key_columns``, the columns listed in
+    ``assign`` (overwritten on conflict) and the amounts to add to every
+    other column. All rows must have the same columns.
+
+    Args:
+        table: SQLAlchemy Table object
+        key_columns: Column names covered by a unique constraint
+        rows: list of dicts, one per row to insert or increment
+        assign: Column names overwritten instead of incremented
+    """
+    if not rows:
+        return
+
+    delta_columns = [col for col in rows[0] if col not in key_columns and col not in assign]
+    dialect = dialect_name()
+
+    if dialect == 'mysql':
+        from sqlalchemy.dialects.mysql import insert
+        stmt = insert(table)
+        new = stmt.inserted
+        stmt = stmt.on_duplicate_key_update(
+            {**{col: table.c[col] + new[col] for col in delta_columns},
+             **{col: new[col] for col in assign}}
+        )
+    elif dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        stmt = insert(table)
+        new = stmt.excluded
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(key_columns),
+            set_={**{col: table.c[col] + new[col] for col in delta_columns},
+                  **{col: new[col] for col in assign}}
+        )
+    else:
+        # Generic fallback: try to bump an existing row, insert otherwise
+        for row in rows:
+            conditions = [table.c[col] == row[col] for col in key_columns]
+            values = {col: table.c[col] + row[col] for col in delta_columns}
+            values.update({col: row[col] for col in assign})
+            result = db.session.execute(update(table).where(*conditions).values(values))
+            if not result.rowcount:
+                db.session.execute(table.insert().values(**row))
+        return
+
+    db.session.execute(stmt, rows)
+
+
+def upsert_rows(table, key_columns, rows):
+    """Insert ``rows``, overwriting every other column of rows whose key already exists."""
+    if rows:
+        assign = [col for col in rows[0] if col not in key_columns]
+        upsert_increment_many(table, key_columns, rows, assign=assign)
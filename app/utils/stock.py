@@ -0,0 +1,244 @@
+import csv
+from datetime import datetime
+from sqlalchemy import bindparam, case, or_, select, update
+from ..models import db, Product
+from .categories import add_stock
+from .reservations import held_by_others
+from .sql import dialect_name
+
+# Products per UPDATE ... CASE statement; keeps the bind count well under SQLite's limit
+UPDATE_CHUNK = 500
+
+
+def parse_change(value):
+    """
+    Parse a stock change: ``+5`` (or ``5``) adds, ``-3`` removes, ``=40`` or ``set 40`` sets.
+
+    Integers, as sent by the JSON API, are taken as deltas.
+
+    Returns:
+        tuple: ('add', signed quantity) or ('set', quantity)
+
+    Raises:
+        ValueError: If the change is malformed
+    """
+    if isinstance(value, int) and not isinstance(value, bool):
+        return 'add', value
+
+    text = str(value if value is not None else '').strip().lower()
+    mode = 'add'
+    for prefix in ('=', 'set'):
+        if text.startswith(prefix):
+            mode, text = 'set', text[len(prefix):].strip()
+            break
+    try:
+        quantity = int(text)
+    except ValueError:
+        raise ValueError(f'change must look like +5, -3 or =40, got "{value}"')
+    if mode == 'set' and quantity < 0:
+        raise ValueError('stock cannot be set below zero')
+    return mode, quantity
+
+
+def _product_ref(line):
+    """The (product_id, sku) a line refers to; exactly one is set."""
+    product_id = line.get('product_id')
+    if product_id not in (None, ''):
+        try:
+            return int(product_id), None
+        except (TypeError, ValueError):
+            raise ValueError(f'product_id must be a whole number, got "{product_id}"')
+    sku = str(line.get('sku') or '').strip()
+    if not sku:
+        raise ValueError('product_id or sku is required')
+    return None, sku
+
+
+def read_adjustment_csv(lines):
+    """
+    Read stock adjustment lines from CSV text with a ``change`` column and a
+    ``product_id`` or ``sku`` column.
+
+    Raises:
+        ValueError: If the header lacks the required columns
+    """
+    reader = csv.DictReader(lines)
+    fieldnames = [name.strip().lstrip('\ufeff').lower() for name in reader.fieldnames or []]
+    if 'change' not in fieldnames or not {'product_id', 'sku'} & set(fieldnames):
+        raise ValueError('The CSV needs a change column and a product_id or sku column')
+    reader.fieldnames = fieldnames
+    return list(reader)
+
+
+def apply_stock_adjustments(lines, all_or_nothing=False):
+    """
+    Apply many stock changes in one transaction with set-based UPDATEs.
+
+    The referenced products are read (and locked where the database supports
+    it) in one query, each line is checked in order against the running
+    stock, and every touched product is then written by a single
+    ``UPDATE ... SET stock_qty = CASE id ...`` per UPDATE_CHUNK products.
+    Relative changes are applied as ``stock_qty + delta`` and guarded by
+    ``>= 0``; if a guarded row no longer matches, nothing is committed.
+
+    Args:
+        lines: Dicts with ``product_id`` or ``sku`` and ``change``
+        all_or_nothing: Apply nothing if any line is rejected
+
+    Returns:
+        list: One dict per line with line (1-based), product_id, sku, name,
+        change, before, after, status ('applied', 'rejected', 'skipped' or
+        'conflict') and error
+    """
+    results = []
+    for number, line in enumerate(lines, start=1):
+        result = {'line': number, 'product_id': None, 'sku': None, 'name': None,
+                  'change': line.get('change'), 'before': None, 'after': None,
+                  'status': 'rejected', 'error': None}
+        try:
+            result['product_id'], result['sku'] = _product_ref(line)
+            result['mode'], result['quantity'] = parse_change(line.get('change'))
+        except ValueError as e:
+            result['error'] = str(e)
+        results.append(result)
+
+    pending = [result for result in results if result['error'] is None]
+    ids = {result['product_id'] for result in pending if result['product_id'] is not None}
+    skus = {result['sku'] for result in pending if result['sku'] is not None}
+
+    products = by_sku = {}
+    if pending:
+        rows = db.session.execute(
+            select(Product.id, Product.sku, Product.name, Product.stock_qty)
+            .where(or_(Product.id.in_(ids), Product.sku.in_(skus)))
+            .with_for_update()
+        ).all()
+        by_sku = {row.sku: row for row in rows if row.sku is not None}
+        products = {row.id: row for row in rows}
+
+    # Replay the lines against the running stock of each product
+    stock = {}
+    absolute = set()
+    for result in pending:
+        row = products.get(result['product_id']) if result['sku'] is None else by_sku.get(result['sku'])
+        if row is None:
+            result['error'] = f'unknown product {result["product_id"] or result["sku"]}'
+            continue
+        result['product_id'], result['sku'], result['name'] = row.id, row.sku, row.name
+
+        before = stock.get(row.id, row.stock_qty)
+        after = result['quantity'] if result['mode'] == 'set' else before + result['quantity']
+        result['before'], result['after'] = before, after
+        if after < 0:
+            result['error'] = f'would leave {after} in stock ({before} available)'
+            continue
+        stock[row.id] = after
+        if result['mode'] == 'set':
+            absolute.add(row.id)
+        result['status'] = 'applied'
+
+    for result in results:
+        result.pop('mode', None)
+        result.pop('quantity', None)
+
+    applied = [result for result in results if result['status'] == 'applied']
+    if all_or_nothing and len(applied) < len(results):
+        for result in applied:
+            result['status'], result['error'] = 'skipped', 'not applied because another line was rejected'
+        db.session.rollback()
+        return results
+
+    changed = [product_id for product_id, after in stock.items() if after != products[product_id].stock_qty]
+    now = datetime.utcnow()
+    for offset in range(0, len(changed), UPDATE_CHUNK):
+        chunk = changed[offset:offset + UPDATE_CHUNK]
+        new_stock = case(
+            {product_id: stock[product_id] if product_id in absolute
+             else Product.stock_qty + (stock[product_id] - products[product_id].stock_qty)
+             for product_id in chunk},
+            value=Product.id
+        )
+        matched = db.session.execute(
+            update(Product)
+            .where(Product.id.in_(chunk), new_stock >= 0)
+            .values(stock_qty=new_stock, updated_at=now)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if matched != len(chunk):
+            db.session.rollback()
+            for result in applied:
+                result['status'], result['error'] = 'conflict', 'stock changed while applying; nothing was saved, retry'
+            return results
+
+    add_stock({product_id: stock[product_id] - products[product_id].stock_qty for product_id in changed})
+    db.session.commit()
+    return results
+
+
+def decrement_stock(quantities, holder=None):
+    """
+    Take ``quantities`` out of stock inside the current transaction.
+
+    All products are decremented by one conditional statement,
+    ``UPDATE products SET stock_qty = stock_qty - CASE id ... END
+    WHERE id IN (...) AND stock_qty >= CASE id ... END``, so two sessions
+    selling the last unit cannot both succeed: the second matches fewer rows
+    than it asked for. The primary-key range is locked in id order, so
+    concurrent checkouts cannot deadlock on each other. On False the caller
+    must roll back, since the rows that did match were decremented. On True
+    the categories' stock totals have been brought down too.
+
+    Args:
+        quantities: Dict {product_id: quantity}
+        holder: User checking out a cart: the units other users' carts hold
+            (utils.reservations) are not available to them. None for sales
+            that already happened, such as uploads from offline tills.
+
+    Returns:
+        bool: Whether every product had enough stock
+    """
+    taken = case(quantities, value=Product.id)
+    available = Product.stock_qty
+    if holder is not None:
+        available = Product.stock_qty - held_by_others(Product.id, holder)
+    matched = db.session.execute(
+        update(Product)
+        .where(Product.id.in_(sorted(quantities)), available >= taken)
+        .values(stock_qty=Product.stock_qty - taken, updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if matched != len(quantities):
+        return False
+    add_stock({product_id: -quantity for product_id, quantity in quantities.items()})
+    return True
+
+
+def decrement_stock_many(quantities):
+    """
+    Batch form of decrement_stock for the thousands of products a bulk
+    upload can touch, with the same guarantees and contract.
+
+    On SQLite, where a statement costs no network round trip, one
+    executemany of a per-product conditional UPDATE is an order of magnitude
+    cheaper than building a CASE over every id. Elsewhere decrement_stock is
+    applied per UPDATE_CHUNK products.
+
+    Returns:
+        bool: Whether every product had enough stock
+    """
+    ids = sorted(quantities)
+    if dialect_name() != 'sqlite':
+        return all(decrement_stock({product_id: quantities[product_id] for product_id in ids[offset:offset + UPDATE_CHUNK]})
+                   for offset in range(0, len(ids), UPDATE_CHUNK))
+
+    products = Product.__table__
+    matched = db.session.execute(
+        update(products)
+        .where(products.c.id == bindparam('b_id'), products.c.stock_qty >= bindparam('b_quantity'))
+        .values(stock_qty=products.c.stock_qty - bindparam('b_quantity'), updated_at=datetime.utcnow()),
+        [{'b_id': product_id, 'b_quantity': quantities[product_id]} for product_id in ids]
+    ).rowcount
+    if matched != len(ids):
+        return False
+    add_stock({product_id: -quantity for product_id, quantity in quantities.items()})
+    return True
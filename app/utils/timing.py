@@ -0,0 +1,31 @@
+import time
+
+
+class PhaseTimer:
+    """
+    Wall-clock time per named phase of a request, for logs and Server-Timing.
+
+    Call ``mark(name)`` at the end of each phase; the phase covers the time
+    since the previous mark, or since the timer was created.
+    """
+
+    def __init__(self):
+        self.phases = []
+        self._last = time.perf_counter()
+
+    def mark(self, name):
+        now = time.perf_counter()
+        self.phases.append((name, now - self._last))
+        self._last = now
+
+    @property
+    def total(self):
+        return sum(seconds for _, seconds in self.phases)
+
+    def summary(self):
+        phases = ', '.join(f'{name}={seconds * 1000:.1f}ms' for name, seconds in self.phases)
+        return f'{self.total * 1000:.1f}ms [{phases}]'
+
+    def server_timing(self):
+        """Value for a Server-Timing response header, shown by browser dev tools."""
+        return ', '.join(f'{name};dur={seconds * 1000:.2f}' for name, seconds in self.phases)
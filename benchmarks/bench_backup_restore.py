@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+"""
+Benchmark NDJSON backup and restore throughput and peak memory.
+
+Seeds a scratch database, writes a gzip backup with backup_chunks, then
+restores it into the emptied tables with restore_backup.
+
+    python benchmarks/bench_backup_restore.py --orders 200000
+"""
+import argparse
+import gzip
+import os
+import tempfile
+import tracemalloc
+
+from common import add_db_arguments, make_app, seed_users, seed_products, seed_orders, seed_order_items
+
+
+def peak_heap():
+    """Peak traced heap since the last call, as a suffix for the report line."""
+    if not tracemalloc.is_tracing():
+        return ''
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    return f', peak heap {peak / 2**20:.1f} MiB'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_db_arguments(parser)
+    parser.add_argument('--orders', type=int, default=200000, help='Number of orders to seed')
+    parser.add_argument('--products', type=int, default=2000, help='Number of products to seed')
+    parser.add_argument('--chunk-size', type=int, default=5000, help='Rows per backup chunk / restore batch')
+    parser.add_argument('--trace-memory', action='store_true',
+                        help='Also report peak Python heap (tracing slows everything down)')
+    args = parser.parse_args()
+
+    app = make_app(args.db_url)
+    with app.app_context():
+        from app.models import db
+        from app.utils.backup import Progress, backup_chunks, restore_backup
+
+        print(f'Seeding {args.products} products and {args.orders} orders with items...')
+        employee_ids = seed_users(db)
+        seed_products(db, args.products)
+        seed_orders(db, args.orders, employee_ids)
+        seed_order_items(db, args.products)
+
+        handle, path = tempfile.mkstemp(prefix='gsms_backup_', suffix='.ndjson.gz')
+        os.close(handle)
+
+        if args.trace_memory:
+            tracemalloc.start()
+        progress = Progress()
+        with gzip.open(path, 'wt', encoding='utf-8') as f:
+            for chunk in backup_chunks(chunk_size=args.chunk_size, progress=progress):
+                f.write(chunk)
+        print(f'\nBackup  ({os.path.getsize(path) / 2**20:.1f} MiB gz): {progress.summary()}{peak_heap()}')
+
+        progress = Progress()
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            restore_backup(f, batch_size=args.chunk_size, truncate=True, progress=progress)
+        print(f'Restore: {progress.summary()}{peak_heap()}')
+
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
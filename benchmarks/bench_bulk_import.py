@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+"""
+Benchmark the bulk product import on a generated supplier catalog.
+
+Compares the previous import (whole upload decoded into a StringIO, one
+Product ORM object per row, a single commit at the end) against
+app.utils.importer.import_products, which streams the file and inserts
+batches with executemany, committing per batch. Then re-syncs the same
+catalog in upsert mode, unchanged and with a fraction of prices changed.
+
+    python benchmarks/bench_bulk_import.py --rows 500000
+"""
+import argparse
+import csv
+import io
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+from common import add_db_arguments, make_app, CATEGORIES, WORDS
+
+
+def write_catalog(path, rows, error_every, changed=0.0, seed=42):
+    """
+    Write a product CSV with a malformed price every ``error_every`` rows.
+
+    The same seed always gives the same catalog; ``changed`` is the fraction
+    of rows whose price is then bumped, as in a supplier's nightly update.
+    """
+    rnd = random.Random(seed)
+    bumps = random.Random(seed + 1)
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['sku', 'name', 'price', 'stock_qty', 'category', 'image_url', 'cost_price'])
+        for i in range(rows):
+            cents = rnd.randint(50, 5000)
+            if bumps.random() < changed:
+                cents += 1
+            price = f'{cents / 100:.2f}'
+            if error_every and i % error_every == error_every - 1:
+                price = 'n/a'
+            writer.writerow([f'SKU{i:08d}', ' '.join(rnd.sample(WORDS, 3)).title() + f' {i}', price,
+                             rnd.randint(0, 200), rnd.choice(CATEGORIES),
+                             f'https://example.com/{i}.jpg', ''])
+
+
+def legacy_import(db, path):
+    """The import as it was built before streaming."""
+    from app.models import Product
+    with open(path, 'rb') as f:
+        stream = io.StringIO(f.read().decode('UTF8'), newline=None)
+    imported = 0
+    errors = []
+    for row_num, row in enumerate(csv.DictReader(stream), start=2):
+        try:
+            db.session.add(Product(
+                name=row['name'].strip(),
+                price=float(row['price']),
+                cost_price=float(row['cost_price']) if (row.get('cost_price') or '').strip() else None,
+                stock_qty=int(row['stock_qty']),
+                category=row['category'].strip(),
+                image_url=row.get('image_url', '').strip() or None
+            ))
+            imported += 1
+        except Exception as e:
+            errors.append(f'Row {row_num}: {str(e)}')
+    db.session.commit()
+    return imported
+
+
+def streamed_import(db, path, batch_size, upsert=None):
+    from app.utils.importer import ERROR_REPORT_HEADER, import_products
+    with open(path, newline='', encoding='utf-8') as lines, io.StringIO() as report:
+        errors = csv.writer(report)
+        errors.writerow(ERROR_REPORT_HEADER)
+        progress = import_products(lines, batch_size=batch_size, upsert=upsert, errors=errors)
+    return progress.counts.get('imported', 0) + progress.counts.get('updated', 0)
+
+
+def profile(db, fn, trace, empty=True):
+    """Run ``fn`` (on emptied tables by default), returning (seconds, peak heap or None, rows written)."""
+    from app.models import Product
+    if empty:
+        db.session.query(Product).delete()
+        db.session.commit()
+    db.session.expunge_all()
+
+    if trace:
+        tracemalloc.start()
+    start = time.perf_counter()
+    imported = fn()
+    seconds = time.perf_counter() - start
+    peak = None
+    if trace:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return seconds, peak, imported
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_db_arguments(parser)
+    parser.add_argument('--rows', type=int, default=500000, help='Rows in the generated catalog')
+    parser.add_argument('--batch-size', type=int, default=1000, help='Rows per INSERT/commit')
+    parser.add_argument('--error-every', type=int, default=1000, help='Make every Nth row invalid (0: none)')
+    parser.add_argument('--changed', type=float, default=0.01, help='Fraction of prices changed for the upsert re-sync')
+    parser.add_argument('--skip-legacy', action='store_true', help='Only run the streamed import')
+    parser.add_argument('--trace-memory', action='store_true',
+                        help='Also report peak Python heap (tracing slows everything down)')
+    args = parser.parse_args()
+
+    app = make_app(args.db_url)
+    with app.app_context():
+        from app.models import db
+
+        handle, path = tempfile.mkstemp(prefix='gsms_catalog_', suffix='.csv')
+        os.close(handle)
+        write_catalog(path, args.rows, args.error_every)
+        print(f'Catalog: {args.rows} rows, {os.path.getsize(path) / 2**20:.1f} MiB')
+
+        runs = [('after: streamed import_products()', lambda: streamed_import(db, path, args.batch_size))]
+        if not args.skip_legacy:
+            runs.insert(0, ('before: ORM add + single commit', lambda: legacy_import(db, path)))
+
+        for label, fn in runs:
+            seconds, peak, imported = profile(db, fn, args.trace_memory)
+            memory = f'{peak / 2**20:>9.1f} MiB peak ' if peak is not None else ''
+            print(f'  {label:<36} {memory}{seconds:>8.2f} s  {imported} rows ({imported / seconds:,.0f} rows/s)')
+
+        # Nightly re-sync of the catalog just imported: rows written scale with what changed
+        print(f'\nUpsert by SKU over the {args.rows} imported products:')
+        changed_path = path + '.changed'
+        write_catalog(changed_path, args.rows, args.error_every, changed=args.changed)
+        for label, catalog in (('unchanged catalog', path),
+                               (f'{args.changed:.0%} of prices changed', changed_path)):
+            seconds, peak, written = profile(db, lambda: streamed_import(db, catalog, args.batch_size, 'sku'),
+                                             args.trace_memory, empty=False)
+            memory = f'{peak / 2**20:>9.1f} MiB peak ' if peak is not None else ''
+            print(f'  {label:<36} {memory}{seconds:>8.2f} s  {written} rows written')
+
+        os.remove(path)
+        os.remove(changed_path)
+
+
+if __name__ == '__main__':
+    main()
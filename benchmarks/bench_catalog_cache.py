@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+"""
+Benchmark the employee product grid with and without the catalog cache.
+
+Seeds a catalog, then replays the same skewed mix of grid requests (mostly
+the first pages, a few popular searches and category filters) through the
+test client with CATALOG_CACHE_MAX_ENTRIES=0 and with the cache on, a
+checkout every --checkout-every requests bumping the catalog version.
+Reports requests per second, the cache's hit rate, and how long stock
+written by another worker takes to show.
+
+    python benchmarks/bench_catalog_cache.py --products 200000 --requests 2000
+"""
+import argparse
+import random
+import time
+
+from common import CATEGORIES, add_db_arguments, make_app, seed_catalog, seed_users
+
+SEARCHES = ['milk', 'organic', 'choc', 'bread', 'apple']
+
+
+def make_requests(count, seed=42):
+    """Grid URLs: page 1 most of the time, then searches, categories and page 2."""
+    rnd = random.Random(seed)
+    urls = []
+    for _ in range(count):
+        pick = rnd.random()
+        if pick < 0.5:
+            urls.append('/employee/products')
+        elif pick < 0.75:
+            urls.append(f'/employee/products?search={rnd.choice(SEARCHES)}')
+        elif pick < 0.95:
+            urls.append(f'/employee/products?category={rnd.choice(CATEGORIES[:3])}')
+        else:
+            urls.append(f'/employee/products?search={rnd.choice(SEARCHES)}&page=2')
+    return urls
+
+
+def replay(client, urls, checkout_every, product_ids):
+    """Request ``urls``, checking out one unit every ``checkout_every`` requests; return seconds."""
+    start = time.perf_counter()
+    for number, url in enumerate(urls, start=1):
+        response = client.get(url)
+        assert response.status_code == 200, response.status_code
+        if checkout_every and number % checkout_every == 0:
+            client.post(f'/employee/cart/add/{product_ids[number % len(product_ids)]}', data={'quantity': 1})
+            response = client.post('/employee/checkout', data={'payment_method': 'cash'})
+            assert response.status_code == 302, response.status_code
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_db_arguments(parser)
+    parser.add_argument('--products', type=int, default=200000, help='Number of products to seed')
+    parser.add_argument('--requests', type=int, default=2000, help='Grid requests per run')
+    parser.add_argument('--checkout-every', type=int, default=100, help='Grid requests per checkout (0 for none)')
+    parser.add_argument('--stock-ttl', type=float, default=1, help='CATALOG_CACHE_STOCK_TTL for the cached run')
+    args = parser.parse_args()
+
+    app = make_app(args.db_url, STOCK_HOLD_SWEEP_INTERVAL=0, WTF_CSRF_ENABLED=False,
+                   CATALOG_CACHE_STOCK_TTL=args.stock_ttl)
+    with app.app_context():
+        from app.models import db, Product
+        from app.utils.catalog_cache import catalog_cache
+
+        print(f'\nSeeding {args.products} products...')
+        employee_id = seed_users(db, employees=1)[0]
+        seed_catalog(db, args.products)
+        product_ids = list(db.session.scalars(db.select(Product.id).where(Product.stock_qty > 100).limit(1000)))
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(employee_id)
+        session['_fresh'] = True
+
+    urls = make_requests(args.requests)
+    client.get('/employee/products?search=warmup')  # Build the search index outside the timings
+
+    print(f'\n{args.requests} grid requests, a checkout every {args.checkout_every}:')
+    results = {}
+    for label, entries in (('uncached', 0), ('cached', app.config['CATALOG_CACHE_MAX_ENTRIES'])):
+        catalog_cache.max_entries = entries
+        catalog_cache.clear()
+        catalog_cache.hits = catalog_cache.misses = catalog_cache.stock_refreshes = 0
+        seconds = replay(client, urls, args.checkout_every, product_ids)
+        results[label] = seconds
+        stats = catalog_cache.stats()
+        extra = f'hit rate {stats["hit_rate"]}%, {stats["stock_refreshes"]} stock refreshes' if entries else ''
+        print(f'  {label:<10} {args.requests / seconds:>8.0f} requests/s ({seconds:.2f}s)  {extra}')
+    print(f'  speed-up   {results["uncached"] / results["cached"]:>8.1f}x')
+
+    # Stock written by another worker (no session events here) shows within the bound
+    with app.app_context():
+        from app.models import db
+        first = client.get('/employee/products').data.decode()
+        product_id = int(first.split('/employee/cart/add/')[1].split('"')[0])
+        with db.engine.begin() as conn:
+            conn.exec_driver_sql(f'UPDATE products SET stock_qty = 4321 WHERE id = {product_id}')
+    start = time.perf_counter()
+    while '4321 available' not in client.get('/employee/products').data.decode():
+        time.sleep(0.05)
+    print(f'\nStock written by another worker shown after {time.perf_counter() - start:.2f}s '
+          f'(CATALOG_CACHE_STOCK_TTL={args.stock_ttl})')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+"""
+Benchmark the categories table against grouping the products table.
+
+Seeds a catalog, then times the category filter list (SELECT DISTINCT
+category over products, the categories table, and the cached list the
+product pages use) and the inventory report's per-category breakdown
+(GROUP BY over products against reading the maintained totals). Also
+reports what keeping the totals costs: the extra statement per checkout
+basket and a full rebuild, as the migration's backfill runs it.
+
+    python benchmarks/bench_categories.py --products 200000
+"""
+import argparse
+import random
+
+from sqlalchemy import func, select
+
+from common import add_db_arguments, make_app, measure, report, seed_catalog
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_db_arguments(parser)
+    parser.add_argument('--products', type=int, default=200000, help='Number of products to seed')
+    parser.add_argument('--basket', type=int, default=5, help='Products per checkout basket')
+    args = parser.parse_args()
+
+    app = make_app(args.db_url, STOCK_HOLD_SWEEP_INTERVAL=0)
+    with app.app_context():
+        from app.models import db, Category, Product
+        from app.utils.categories import add_stock, category_names, rebuild_categories
+        from app.utils.stock import decrement_stock
+
+        print(f'\nSeeding {args.products} products...')
+        seed_catalog(db, args.products)
+
+        print('\nCategory filter list:')
+        seconds, names = measure(lambda: list(db.session.scalars(
+            select(Product.category).distinct().order_by(Product.category))), args.repeat)
+        report('SELECT DISTINCT over products', seconds, extra=f'{len(names)} categories')
+        seconds, _ = measure(lambda: list(db.session.scalars(
+            select(Category.name).where(Category.product_count > 0).order_by(Category.name))), args.repeat)
+        report('categories table', seconds)
+        category_names()
+        seconds, cached = measure(category_names, args.repeat)
+        report('category_names() (cached)', seconds)
+        assert cached == names, 'category lists differ'
+
+        print('\nInventory by category:')
+        seconds, grouped = measure(lambda: db.session.query(
+            Product.category,
+            func.count(Product.id),
+            func.sum(Product.stock_qty),
+            func.sum(Product.price * Product.stock_qty)
+        ).group_by(Product.category).all(), args.repeat)
+        report('GROUP BY over products', seconds)
+        seconds, totals = measure(lambda: db.session.query(
+            Category.name, Category.product_count, Category.stock_units, Category.stock_value
+        ).filter(Category.product_count > 0).all(), args.repeat)
+        report('maintained totals', seconds)
+        assert sorted(map(tuple, grouped)) == sorted(map(tuple, totals)), 'totals differ from the products table'
+
+        print(f'\nUpkeep ({args.basket}-product basket):')
+        rnd = random.Random(7)
+        basket = {product_id: 1 for product_id in rnd.sample(range(1, args.products + 1), args.basket)}
+        seconds, _ = measure(lambda: add_stock({product_id: -1 for product_id in basket}), args.repeat)
+        report('category totals per checkout', seconds)
+        seconds, _ = measure(lambda: decrement_stock(basket), args.repeat)
+        report('whole stock decrement', seconds)
+        db.session.rollback()  # Nothing above is kept
+        seconds, _ = measure(rebuild_categories, repeat=1)
+        report('full rebuild', seconds)
+        db.session.commit()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+"""
+Benchmark checkout latency and statement count by basket size.
+
+Checks out baskets of 1 to several hundred lines through /employee/checkout
+and reports, per size, the SQL statements issued and the median time of each
+phase from the view's Server-Timing header (hydrate, validate, stock,
+insert, commit).
+
+    python benchmarks/bench_checkout_basket.py --sizes 1,10,100,300
+"""
+import argparse
+import statistics
+import uuid
+from collections import defaultdict
+
+from common import add_db_arguments, make_app, count_queries, seed_users, seed_products
+
+
+def parse_server_timing(header):
+    """{'phase': milliseconds} from a Server-Timing header."""
+    phases = {}
+    for entry in header.split(','):
+        name, _, duration = entry.strip().partition(';dur=')
+        if duration:
+            phases[name] = float(duration)
+    return phases
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_db_arguments(parser)
+    parser.add_argument('--sizes', default='1,10,100,300', help='Comma-separated basket sizes (lines per order)')
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(',')]
+
+    app = make_app(args.db_url)
+    with app.app_context():
+        from app.models import db, Product
+        employee_id = seed_users(db, employees=1)[0]
+        seed_products(db, max(sizes), stock=10 ** 6)
+        product_ids = list(db.session.scalars(db.select(Product.id).order_by(Product.id)))
+        engine = db.engine
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(employee_id)
+        session['_fresh'] = True
+
+    print(f'\n  {"lines":>5} {"queries":>8} {"total ms":>9}  per phase (median ms)')
+    for size in sizes:
+        phases = defaultdict(list)
+        queries = []
+        for _ in range(args.repeat):
+            with app.app_context():
+                from app.utils.cart_store import cart_store
+                for product_id in product_ids[:size]:
+                    cart_store.add(employee_id, product_id, 2)
+            with count_queries(engine) as counter:
+                response = client.post('/employee/checkout', data={'payment_method': 'cash',
+                                                                'idempotency_key': uuid.uuid4().hex})
+            assert '/employee/orders' in response.headers.get('Location', ''), 'checkout failed'
+            queries.append(counter[0])
+            for name, ms in parse_server_timing(response.headers['Server-Timing']).items():
+                phases[name].append(ms)
+
+        medians = {name: statistics.median(values) for name, values in phases.items()}
+        breakdown = '  '.join(f'{name} {ms:.1f}' for name, ms in medians.items())
+        print(f'  {size:>5} {statistics.median(queries):>8.0f} {sum(medians.values()):>9.1f}  {breakdown}')
+
+
+if __name__ == '__main__':
+    main()
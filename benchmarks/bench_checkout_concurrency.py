@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+"""
+Stress checkout from many threads on a few hot products and check for overselling.
+
+Each thread logs in as its own employee and repeatedly checks out a cart
+holding one of the hot products (plus a couple of cold ones) through the
+real /employee/checkout view. Afterwards every hot product must satisfy
+
+    stock_qty >= 0  and  initial stock - stock_qty == units in order_items
+
+Threads against SQLite mostly queue on the database lock; point --db-url at
+MySQL/PostgreSQL to exercise row locks the way gunicorn workers do.
+
+    python benchmarks/bench_checkout_concurrency.py --threads 8 --orders 200
+"""
+import argparse
+import random
+import statistics
+import threading
+import time
+from collections import Counter
+
+from common import add_db_arguments, make_app, seed_users, seed_products
+
+
+def worker(app, employee_id, hot_ids, cold_ids, orders, seed, outcomes, latencies, lock):
+    rnd = random.Random(seed)
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(employee_id)
+        session['_fresh'] = True
+
+    for _ in range(orders):
+        cart = {product_id: 1 for product_id in rnd.sample(cold_ids, 2)}
+        cart[rnd.choice(hot_ids)] = rnd.randint(1, 3)
+        with app.app_context():
+            from app.utils.cart_store import cart_store
+            for product_id, quantity in cart.items():
+                cart_store.add(employee_id, product_id, quantity)
+
+        start = time.perf_counter()
+        response = client.post('/employee/checkout', data={'payment_method': 'cash'})
+        seconds = time.perf_counter() - start
+
+        location = response.headers.get('Location', '')
+        if '/employee/orders' in location:
+            outcome = 'completed'
+        elif '/employee/cart' in location:
+            outcome = 'out of stock'
+        else:
+            outcome = 'failed'
+        with lock:
+            outcomes[outcome] += 1
+            latencies.append(seconds)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_db_arguments(parser)
+    parser.add_argument('--threads', type=int, default=8, help='Concurrent cashiers (4 workers x 2 threads in Docker)')
+    parser.add_argument('--orders', type=int, default=200, help='Checkouts attempted per thread')
+    parser.add_argument('--hot', type=int, default=3, help='Number of hot products every cart contains one of')
+    parser.add_argument('--hot-stock', type=int, default=300, help='Initial stock of each hot product')
+    args = parser.parse_args()
+
+    overrides = {}
+    if args.db_url is None or args.db_url.startswith('sqlite'):
+        # Let writers wait for the database lock instead of failing after 5s
+        overrides['SQLALCHEMY_ENGINE_OPTIONS'] = {'connect_args': {'timeout': 60}}
+    app = make_app(args.db_url, **overrides)
+
+    with app.app_context():
+        from app.models import db, Product, OrderItem
+        employee_ids = seed_users(db, employees=args.threads)
+        seed_products(db, 200, stock=100000)
+        product_ids = list(db.session.scalars(db.select(Product.id).order_by(Product.id)))
+        hot_ids, cold_ids = product_ids[:args.hot], product_ids[args.hot:]
+        db.session.execute(db.update(Product).where(Product.id.in_(hot_ids)).values(stock_qty=args.hot_stock))
+        db.session.commit()
+
+    demand = args.threads * args.orders * 2
+    print(f'{args.threads} threads x {args.orders} checkouts; {args.hot} hot products with {args.hot_stock} '
+          f'units each (~{demand} units demanded)')
+
+    outcomes = Counter()
+    latencies = []
+    lock = threading.Lock()
+    threads = [threading.Thread(target=worker,
+                                args=(app, employee_id, hot_ids, cold_ids, args.orders, seed,
+                                      outcomes, latencies, lock))
+               for seed, employee_id in enumerate(employee_ids)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - start
+
+    latencies.sort()
+    print(f'\n  {dict(outcomes)}')
+    print(f'  {outcomes["completed"] / seconds:,.1f} orders/s over {seconds:.1f}s; latency '
+          f'p50 {statistics.median(latencies) * 1000:.1f} ms, '
+          f'p95 {latencies[int(len(latencies) * 0.95)] * 1000:.1f} ms')
+
+    with app.app_context():
+        from app.models import db, Product, OrderItem
+        sold = dict(db.session.execute(
+            db.select(OrderItem.product_id, db.func.sum(OrderItem.quantity))
+            .where(OrderItem.product_id.in_(hot_ids))
+            .group_by(OrderItem.product_id)
+        ).all())
+        oversold = False
+        for product in db.session.scalars(db.select(Product).where(Product.id.in_(hot_ids))):
+            units = sold.get(product.id, 0)
+            ok = product.stock_qty >= 0 and args.hot_stock - product.stock_qty == units
+            oversold = oversold or not ok
+            print(f'  product {product.id}: sold {units}, stock left {product.stock_qty} '
+                  f'{"OK" if ok else "OVERSOLD / LOST UPDATE"}')
+
+    assert not oversold, 'stock invariant violated'
+    print('\nNo overselling.')
+
+
+if __name__ == '__main__':
+    main()
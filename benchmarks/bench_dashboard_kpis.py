@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+"""
+Benchmark the admin dashboard header counters.
+
+Compares the previous implementation (separate COUNT queries plus loading
+today's/yesterday's/week's/month's orders as ORM objects and summing them in
+Python) against app.analytics.kpi.dashboard_kpis, which issues one
+conditional-aggregation query per table.
+
+    python benchmarks/bench_dashboard_kpis.py --orders 1000000
+"""
+import argparse
+from datetime import datetime, timedelta
+
+from common import add_db_arguments, make_app, count_queries, measure, report, seed_users, seed_products, seed_orders
+from sqlalchemy import func
+
+
+def legacy_dashboard_kpis(db):
+    """The dashboard header as it was computed before the KPI service."""
+    from app.models import Product, Order, User
+
+    total_products = Product.query.count()
+    total_employees = User.query.filter_by(role='employee').count()
+    total_orders = Order.query.count()
+    low_stock_count = Product.query.filter(Product.stock_qty <= 10).count()
+
+    today = datetime.utcnow().date()
+    today_orders = Order.query.filter(func.date(Order.created_at) == today).all()
+    today_sales = float(sum(order.total_amount for order in today_orders))
+
+    month_start = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    month_orders = Order.query.filter(Order.created_at >= month_start).all()
+    month_sales = float(sum(order.total_amount for order in month_orders))
+
+    week_start = datetime.utcnow() - timedelta(days=datetime.utcnow().weekday())
+    week_start = week_start.replace(hour=0, minute=0, second=0, microsecond=0)
+    week_orders = Order.query.filter(Order.created_at >= week_start).all()
+    week_sales = float(sum(order.total_amount for order in week_orders))
+
+    yesterday = today - timedelta(days=1)
+    yesterday_orders = Order.query.filter(func.date(Order.created_at) == yesterday).all()
+    yesterday_sales = float(sum(order.total_amount for order in yesterday_orders))
+
+    out_of_stock = Product.query.filter(Product.stock_qty == 0).count()
+    inventory_value = float(db.session.query(func.sum(Product.price * Product.stock_qty)).scalar() or 0)
+    avg_order_value = float(db.session.query(func.avg(Order.total_amount)).scalar() or 0)
+
+    result = {
+        'total_products': total_products, 'total_employees': total_employees,
+        'total_orders': total_orders, 'low_stock_count': low_stock_count,
+        'out_of_stock': out_of_stock, 'today_sales': today_sales,
+        'month_sales': month_sales, 'week_sales': week_sales,
+        'yesterday_sales': yesterday_sales, 'inventory_value': inventory_value,
+        'avg_order_value': avg_order_value
+    }
+    db.session.expunge_all()  # Don't let the identity map make later runs cheaper
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_db_arguments(parser)
+    parser.add_argument('--orders', type=int, default=1000000, help='Number of orders to seed')
+    parser.add_argument('--products', type=int, default=2000, help='Number of products to seed')
+    args = parser.parse_args()
+
+    app = make_app(args.db_url)
+    with app.app_context():
+        from app.models import db
+        from app.analytics.kpi import dashboard_kpis
+        from app.analytics.rollups import rebuild_sales_daily
+
+        print(f'Seeding {args.products} products and {args.orders} orders...')
+        employee_ids = seed_users(db)
+        seed_products(db, args.products, stock=None)
+        seed_orders(db, args.orders, employee_ids)
+        rebuild_sales_daily()
+        db.session.commit()
+
+        today = datetime.utcnow().date()
+        print('\nDashboard header KPIs (median of {} runs):'.format(args.repeat))
+
+        with count_queries(db.engine) as queries:
+            legacy_seconds, legacy = measure(lambda: legacy_dashboard_kpis(db), args.repeat)
+        report('before: per-metric queries + .all()', legacy_seconds, queries[0] // args.repeat)
+
+        with count_queries(db.engine) as queries:
+            kpi_seconds, kpis = measure(lambda: dashboard_kpis(today), args.repeat)
+        report('after: dashboard_kpis()', kpi_seconds, queries[0] // args.repeat,
+               f'({legacy_seconds / kpi_seconds:.0f}x faster)')
+
+        # Sanity check: both paths agree on the figures they share
+        for key in ('total_products', 'total_employees', 'total_orders', 'low_stock_count',
+                    'out_of_stock', 'today_sales', 'yesterday_sales', 'week_sales', 'month_sales'):
+            assert abs(float(legacy[key]) - float(kpis[key])) < 0.01, (key, legacy[key], kpis[key])
+        print('\nResults match between both implementations.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+"""
+Benchmark peak memory and time of the CSV data export.
+
+Compares the previous export (Product/Order.query.all() into one StringIO,
+with a lazy employee load per order) against app.utils.export.csv_chunks,
+which streams batches from a server-side cursor with the employee joined in.
+
+    python benchmarks/bench_export_memory.py --orders 500000
+"""
+import argparse
+import csv
+import io
+import time
+import tracemalloc
+
+from common import add_db_arguments, make_app, seed_users, seed_products, seed_orders
+
+
+def legacy_export(db):
+    """The export as it was built before streaming."""
+    from app.models import Product, Order
+    output = io.StringIO()
+    writer = csv.writer(output)
+
+    writer.writerow(['Products'])
+    writer.writerow(['ID', 'Name', 'Price', 'Stock', 'Category', 'Created'])
+    for product in Product.query.all():
+        writer.writerow([product.id, product.name, float(product.price), product.stock_qty,
+                         product.category,
+                         product.created_at.strftime('%Y-%m-%d %H:%M:%S') if product.created_at else ''])
+
+    writer.writerow([])
+    writer.writerow(['Orders'])
+    writer.writerow(['ID', 'Employee', 'Total', 'Payment Method', 'Status', 'Created'])
+    for order in Order.query.all():
+        writer.writerow([order.id, order.employee.username if order.employee else '',
+                         float(order.total_amount), order.payment_method, order.status,
+                         order.created_at.strftime('%Y-%m-%d %H:%M:%S') if order.created_at else ''])
+
+    output.seek(0)
+    return len(output.getvalue())
+
+
+def streamed_export(batch_size):
+    """Consume the streamed export the way a WSGI server would, chunk by chunk."""
+    from app.utils.export import csv_chunks
+    size = 0
+    for chunk in csv_chunks(['products', 'orders'], batch_size=batch_size):
+        size += len(chunk)
+    return size
+
+
+def profile(db, fn):
+    """Time an untraced run, then measure peak heap in a traced one (tracing slows Python down)."""
+    db.session.expunge_all()
+    start = time.perf_counter()
+    result = fn()
+    seconds = time.perf_counter() - start
+
+    db.session.expunge_all()
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return seconds, peak, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_db_arguments(parser)
+    parser.add_argument('--orders', type=int, default=500000, help='Number of orders to seed')
+    parser.add_argument('--products', type=int, default=5000, help='Number of products to seed')
+    parser.add_argument('--batch-size', type=int, default=1000, help='Rows per streamed chunk')
+    args = parser.parse_args()
+
+    app = make_app(args.db_url)
+    with app.app_context():
+        from app.models import db
+
+        print(f'Seeding {args.products} products and {args.orders} orders...')
+        employee_ids = seed_users(db)
+        seed_products(db, args.products)
+        seed_orders(db, args.orders, employee_ids)
+
+        print('\nCSV export of products + orders (peak Python heap, wall time):')
+        for label, fn in (('before: StringIO + query.all()', lambda: legacy_export(db)),
+                          ('after: streamed csv_chunks()', lambda: streamed_export(args.batch_size))):
+            seconds, peak, size = profile(db, fn)
+            print(f'  {label:<34} {peak / 2**20:>9.1f} MiB peak {seconds:>8.2f} s  {size / 2**20:.1f} MiB of CSV')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+"""
+Benchmark deep pages of the order history: OFFSET pagination against keyset cursors.
+
+Seeds orders, then times page N of the admin order list (all orders,
+newest first) and of one employee's history, with Flask-SQLAlchemy's
+paginate() (COUNT(*) plus LIMIT/OFFSET) and with KeysetPagination from a
+cursor pointing at the same place. Offset pages slow down linearly with
+depth; keyset pages should not.
+
+    python benchmarks/bench_keyset_pagination.py --orders 1000000 --pages 1,100,1000,5000,20000
+"""
+import argparse
+
+from common import add_db_arguments, make_app, measure, seed_users, seed_orders
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_db_arguments(parser)
+    parser.add_argument('--orders', type=int, default=1000000, help='Number of orders to seed')
+    parser.add_argument('--employees', type=int, default=20, help='Employees the orders are spread over')
+    parser.add_argument('--pages', default='1,100,1000,5000,20000', help='Comma-separated page numbers to time')
+    args = parser.parse_args()
+
+    app = make_app(args.db_url, STOCK_HOLD_SWEEP_INTERVAL=0)
+    with app.app_context():
+        from app.models import db, Order
+        from app.utils.pagination import KeysetPagination
+
+        print(f'\nSeeding {args.orders} orders...')
+        employee_ids = seed_users(db, employees=args.employees)
+        seed_orders(db, args.orders, employee_ids)
+        per_page = app.config['ITEMS_PER_PAGE']
+        keys = (Order.created_at, Order.id)
+
+        listings = [
+            ('All orders', Order.query),
+            (f'Employee {employee_ids[0]}', Order.query.filter_by(employee_id=employee_ids[0])),
+        ]
+        for label, query in listings:
+            total = query.order_by(None).count()
+            print(f'\n{label} ({total} orders, {per_page} per page)')
+            print(f'  {"page":>8} {"offset":>12} {"keyset":>12}')
+            for page in [int(page) for page in args.pages.split(',')]:
+                if (page - 1) * per_page >= total:
+                    continue
+                offset_seconds, _ = measure(lambda: query.order_by(Order.created_at.desc(), Order.id.desc())
+                                            .paginate(page=page, per_page=per_page, error_out=False), args.repeat)
+
+                # Cursor of the last row of the previous page, as the Next link would carry it
+                cursor = None
+                if page > 1:
+                    last = query.order_by(Order.created_at.desc(), Order.id.desc())\
+                                .offset((page - 1) * per_page - 1).first()
+                    cursor = KeysetPagination(query, keys, descending=True, per_page=per_page)._encode('next', last)
+                keyset_seconds, keyset = measure(lambda: KeysetPagination(query, keys, descending=True, cursor=cursor,
+                                                                          per_page=per_page), args.repeat)
+                offset_items = query.order_by(Order.created_at.desc(), Order.id.desc())\
+                                    .paginate(page=page, per_page=per_page, error_out=False).items
+                assert [order.id for order in keyset.items] == [order.id for order in offset_items], 'pages differ'
+                print(f'  {page:>8} {offset_seconds * 1000:>9.2f} ms {keyset_seconds * 1000:>9.2f} ms')
+
+        seconds, _ = measure(lambda: Order.query.order_by(None).count(), args.repeat)
+        print(f'\nCOUNT(*) of all orders, cached for LISTING_TOTAL_TTL on keyset pages: {seconds * 1000:.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+"""
+Benchmark the offline-till batch upload, POST /orders/api/batch.
+
+Replays a day of queued till sales in batches and reports orders per second
+and SQL statements per batch, then uploads the same batches again, as a till
+retrying after a lost response would, to show every order comes back as a
+duplicate without being sold twice.
+
+    python benchmarks/bench_order_sync.py --orders 20000 --batch-size 1000
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from common import add_db_arguments, make_app, count_queries, seed_users, seed_products
+
+
+def make_orders(count, product_ids, seed=42):
+    """Queued till sales: client ids, timestamps over the last day and 1-8 lines each."""
+    rnd = random.Random(seed)
+    start = datetime.utcnow() - timedelta(days=1)
+    return [{
+        'client_id': f'till{rnd.randint(1, 8)}-{number:08d}',
+        'created_at': (start + timedelta(seconds=number * 86400 // count)).isoformat() + 'Z',
+        'payment_method': rnd.choice(['cash', 'upi']),
+        'items': [{'product_id': product_id, 'quantity': rnd.randint(1, 3)}
+                  for product_id in rnd.sample(product_ids, rnd.randint(1, 8))]
+    } for number in range(count)]
+
+
+def upload(client, engine, orders, batch_size, headers):
+    """Post ``orders`` in batches; return (seconds, statements per batch, status counts)."""
+    statuses = {}
+    statements = []
+    start = time.perf_counter()
+    for offset in range(0, len(orders), batch_size):
+        with count_queries(engine) as counter:
+            response = client.post('/orders/api/batch', json={'orders': orders[offset:offset + batch_size]},
+                                   headers=headers)
+        assert response.status_code == 200, response.get_json()
+        statements.append(counter[0])
+        for result in response.get_json()['results']:
+            statuses[result['status']] = statuses.get(result['status'], 0) + 1
+    return time.perf_counter() - start, max(statements), statuses
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_db_arguments(parser)
+    parser.add_argument('--orders', type=int, default=20000, help='Number of queued orders to upload')
+    parser.add_argument('--batch-size', type=int, default=1000, help='Orders per upload')
+    parser.add_argument('--products', type=int, default=2000, help='Number of products to seed')
+    args = parser.parse_args()
+
+    app = make_app(args.db_url, ORDER_SYNC_MAX_BATCH=args.batch_size, STOCK_HOLD_SWEEP_INTERVAL=0,
+                   WTF_CSRF_ENABLED=True)
+    with app.app_context():
+        from app.models import db, Product
+        employee_id = seed_users(db, employees=1)[0]
+        seed_products(db, args.products, stock=10 ** 6)
+        product_ids = list(db.session.scalars(db.select(Product.id).order_by(Product.id)))
+        stock_before = db.session.scalar(db.select(db.func.sum(Product.stock_qty)))
+        engine = db.engine
+
+    orders = make_orders(args.orders, product_ids)
+    units = sum(item['quantity'] for order in orders for item in order['items'])
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(employee_id)
+        session['_fresh'] = True
+    # The till's path: CSRF stays on and the session's token goes in a header
+    headers = {'X-CSRFToken': client.get('/csrf-token').get_json()['csrf_token']}
+
+    print(f'\nUploading {args.orders} orders ({units} units) in batches of {args.batch_size}...')
+    for label in ('First upload', 'Replay'):
+        seconds, statements, statuses = upload(client, engine, orders, args.batch_size, headers)
+        print(f'  {label + ":":<14} {args.orders / seconds:>8.0f} orders/s ({seconds:.2f}s), '
+              f'at most {statements} statements per batch, {statuses}')
+
+    with app.app_context():
+        from app.models import db, Order, Product
+        assert db.session.scalar(db.select(db.func.count(Order.id))) == args.orders, 'orders created twice or missing'
+        assert stock_before - db.session.scalar(db.select(db.func.sum(Product.stock_qty))) == units, 'stock mismatch'
+    print('\nEvery order recorded once; stock down by exactly the units sold.')
+
+
+if __name__ == '__main__':
+    main()
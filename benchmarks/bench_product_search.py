@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+"""
+Benchmark product search: the in-memory trigram index against ILIKE scans.
+
+Seeds a catalog of generated grocery names, then times, for a mix of
+searches (common and rare words, prefixes, several words, a misspelling, a
+SKU), the index lookup alone and a full first page of the employee product
+listing with each backend. Also reports the index's build time and memory,
+and the cost of the first search after a batch of product edits.
+
+    python benchmarks/bench_product_search.py --products 200000
+"""
+import argparse
+import random
+import tracemalloc
+from datetime import datetime
+
+from sqlalchemy import update
+
+from common import add_db_arguments, make_app, measure, report, seed_catalog
+
+SEARCHES = [
+    ('common word', 'milk'),
+    ('word prefix', 'choc'),
+    ('two words', 'organic apple'),
+    ('rare brand', None),  # filled in with a generated brand
+    ('misspelt', 'chocolte'),
+    ('sku', 'SKU-0012345'),
+    ('one letter', 'b'),
+    ('no match', 'zzzz'),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_db_arguments(parser)
+    parser.add_argument('--products', type=int, default=200000, help='Number of products to seed')
+    parser.add_argument('--edits', type=int, default=500, help='Products renamed before the refresh measurement')
+    args = parser.parse_args()
+
+    app = make_app(args.db_url, STOCK_HOLD_SWEEP_INTERVAL=0)
+    with app.app_context():
+        from app.models import db, Product
+        from app.utils.search import IlikeSearch, ProductSearchIndex
+
+        print(f'\nSeeding {args.products} products...')
+        brands = seed_catalog(db, args.products)
+        searches = [(label, text or brands[len(brands) // 2]) for label, text in SEARCHES]
+
+        index = ProductSearchIndex(app.config['PRODUCT_SEARCH_MAX_RESULTS'], refresh_interval=3600)
+        seconds, _ = measure(lambda: index.search('milk'), repeat=1)
+        tracemalloc.start()
+        traced = ProductSearchIndex()
+        traced.search('milk')
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del traced
+        print(f'\nIndex: {len(index)} products, {len(index._postings)} distinct words, '
+              f'built in {seconds:.2f}s, about {memory / 2 ** 20:.0f} MiB')
+
+        print('\nIndex lookup only (ids best first):')
+        for label, text in searches:
+            seconds, ids = measure(lambda: index.search(text), args.repeat)
+            report(f'{label} "{text}"', seconds, extra=f'{len(ids)} matches')
+
+        in_stock = Product.query.filter(Product.stock_qty > 0)
+        ilike = IlikeSearch()
+        per_page = app.config['ITEMS_PER_PAGE']
+        print(f'\nFirst page of the in-stock listing ({per_page} per page):')
+        print(f'  {"":<38} {"index":>13} {"ILIKE":>13}')
+        for label, text in searches:
+            index_seconds, page = measure(lambda: index.paginate(in_stock, text, 1, per_page), args.repeat)
+            ilike_seconds, ilike_page = measure(lambda: ilike.paginate(in_stock, text, 1, per_page), args.repeat)
+            print(f'  {label + " " + repr(text):<38} {index_seconds * 1000:>10.2f} ms {ilike_seconds * 1000:>10.2f} ms'
+                  f'   {page.total} / {ilike_page.total} matches')
+
+        # Rename a batch of products the way the importer does, then search again
+        rnd = random.Random(7)
+        ids = rnd.sample(range(1, args.products + 1), min(args.edits, args.products))
+        db.session.execute(update(Product), [
+            {'id': product_id, 'name': f'Renamed Product {product_id}', 'updated_at': datetime.utcnow()}
+            for product_id in ids
+        ])
+        db.session.commit()
+        seconds, found = measure(lambda: index.search('renamed'), repeat=1)
+        print(f'\nFirst search after renaming {len(ids)} products (incremental refresh): '
+              f'{seconds * 1000:.2f} ms, {len(found)} found')
+        assert len(found) == min(len(ids), index.max_results), 'renamed products missing from the index'
+
+
+if __name__ == '__main__':
+    main()
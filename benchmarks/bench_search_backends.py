@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+"""
+Benchmark product search latency against catalog size for each backend.
+
+For every catalog size, seeds a fresh database and times the first page of
+the in-stock product listing for a few searches with PRODUCT_SEARCH_BACKEND
+'ilike' (table scan), 'fulltext' (FTS5 on SQLite, FULLTEXT on MySQL) and
+'index' (in-memory trigram index). ILIKE grows with the catalog; the two
+indexes grow with the number of matches instead (the in-memory index ranks
+at most PRODUCT_SEARCH_MAX_RESULTS of them).
+
+    python benchmarks/bench_search_backends.py --sizes 10000,50000,200000
+"""
+import argparse
+import time
+
+from common import add_db_arguments, make_app, measure, seed_catalog
+
+BACKENDS = ('ilike', 'fulltext', 'index')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_db_arguments(parser)
+    parser.add_argument('--sizes', default='10000,50000,200000', help='Comma-separated catalog sizes')
+    args = parser.parse_args()
+
+    for size in [int(size) for size in args.sizes.split(',')]:
+        app = make_app(args.db_url, STOCK_HOLD_SWEEP_INTERVAL=0)
+        with app.app_context():
+            from app.models import db, Product
+            from app.utils.search import FullTextSearch, IlikeSearch, ProductSearchIndex
+
+            start = time.perf_counter()
+            brands = seed_catalog(db, size)
+            print(f'\n{size} products (seeded in {time.perf_counter() - start:.1f}s, full-text index kept by the database)')
+            searches = ['milk', 'choc', 'organic apple', brands[len(brands) // 2]]
+
+            backends = {'ilike': IlikeSearch(), 'fulltext': FullTextSearch(),
+                        'index': ProductSearchIndex(app.config['PRODUCT_SEARCH_MAX_RESULTS'])}
+            in_stock = Product.query.filter(Product.stock_qty > 0)
+            per_page = app.config['ITEMS_PER_PAGE']
+            for backend in backends.values():
+                backend.paginate(in_stock, 'warm up', 1, per_page)  # Builds the index, finds the FTS table
+
+            print(f'  {"first page of":<22}' + ''.join(f'{name:>14}' for name in BACKENDS) + '   matches')
+            for text in searches:
+                timings, totals = [], []
+                for name in BACKENDS:
+                    seconds, page = measure(lambda: backends[name].paginate(in_stock, text, 1, per_page), args.repeat)
+                    timings.append(seconds)
+                    totals.append(str(page.total))
+                print(f'  {repr(text):<22}' + ''.join(f'{seconds * 1000:>11.2f} ms' for seconds in timings)
+                      + '   ' + ' / '.join(totals))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,224 @@
+"""
+Shared helpers for the benchmark scripts in this directory.
+
+Benchmarks run against a throwaway SQLite file by default; pass --db-url to
+point them at a MySQL/PostgreSQL database instead.
+"""
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+# Make the application importable when run as `python benchmarks/<script>.py`
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event, insert  # noqa: E402
+from app import create_app  # noqa: E402
+from config import Config  # noqa: E402
+
+
+def add_db_arguments(parser):
+    parser.add_argument('--db-url', default=None,
+                        help='URL of a scratch database whose tables are DROPPED and recreated '
+                             '(default: a temporary SQLite file)')
+    parser.add_argument('--repeat', type=int, default=5, help='Timed repetitions per measurement')
+
+
+def make_app(db_url=None, **overrides):
+    """Create the app against ``db_url`` (or a fresh SQLite file) with empty tables."""
+    if db_url is None:
+        handle, path = tempfile.mkstemp(prefix='gsms_bench_', suffix='.db')
+        os.close(handle)
+        db_url = f'sqlite:///{path}'
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = db_url
+        WTF_CSRF_ENABLED = False
+        TESTING = True
+
+    for key, value in overrides.items():
+        setattr(BenchConfig, key, value)
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        from app.models import db
+        db.drop_all()
+        db.create_all()
+    print(f'Database: {db_url}')
+    return app
+
+
+@contextmanager
+def count_queries(engine):
+    """Count statements sent to ``engine`` inside the block (yields a one-item list)."""
+    counter = [0]
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        counter[0] += 1
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def measure(fn, repeat=5):
+    """Run ``fn`` ``repeat`` times; return (median seconds, result of last run)."""
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), result
+
+
+def report(label, seconds, queries=None, extra=''):
+    queries_text = f'{queries:>7} queries' if queries is not None else ' ' * 15
+    print(f'  {label:<38} {seconds * 1000:>10.2f} ms {queries_text} {extra}')
+
+
+def seed_users(db, employees=20):
+    """Create one admin and ``employees`` employee accounts; returns employee ids."""
+    from app.models import User
+    admin = User(username='bench_admin', role='admin')
+    admin.set_password('bench')
+    db.session.add(admin)
+    users = []
+    for i in range(employees):
+        user = User(username=f'bench_employee_{i}', role='employee')
+        user.password_hash = admin.password_hash  # Hashing is slow and irrelevant here
+        users.append(user)
+    db.session.add_all(users)
+    db.session.commit()
+    return [user.id for user in users]
+
+
+CATEGORIES = ['fruits', 'vegetables', 'dairy', 'meat', 'bakery', 'beverages', 'snacks', 'household', 'other']
+WORDS = ['organic', 'fresh', 'red', 'green', 'whole', 'wheat', 'milk', 'apple', 'banana', 'rice',
+         'chicken', 'bread', 'juice', 'orange', 'tomato', 'potato', 'cheese', 'yogurt', 'butter', 'tea',
+         'coffee', 'cookie', 'chips', 'soap', 'detergent', 'honey', 'almond', 'oat', 'pasta', 'sauce']
+
+
+def seed_products(db, count, stock=100, batch_size=10000, seed=42):
+    """Bulk insert ``count`` products with pseudo-random names; returns nothing."""
+    from app.models import Product
+    from app.utils.categories import rebuild_categories
+    rnd = random.Random(seed)
+    now = datetime.utcnow()
+    for offset in range(0, count, batch_size):
+        rows = []
+        for i in range(offset, min(offset + batch_size, count)):
+            name = ' '.join(rnd.sample(WORDS, 3)).title() + f' {i}'
+            rows.append({
+                'name': name[:100],
+                'price': Decimal(rnd.randint(50, 5000)) / 100,
+                'stock_qty': stock if stock is not None else rnd.randint(0, 200),
+                'category': rnd.choice(CATEGORIES),
+                'created_at': now,
+                'updated_at': now
+            })
+        db.session.execute(insert(Product), rows)
+    # Bulk inserts bypass the ORM hook that counts products into their categories
+    rebuild_categories()
+    db.session.commit()
+
+
+# Vocabulary of seed_catalog: product names of the form '<brand> <variant> <item> <size>'
+ITEMS = ['milk', 'bread', 'butter', 'cheese', 'yogurt', 'apple', 'banana', 'orange', 'mango', 'grapes',
+         'tomato', 'potato', 'onion', 'garlic', 'rice', 'pasta', 'noodles', 'flour', 'sugar', 'salt',
+         'tea', 'coffee', 'juice', 'water', 'soda', 'chips', 'cookies', 'crackers', 'chocolate', 'candy',
+         'chicken', 'beef', 'fish', 'eggs', 'honey', 'jam', 'cereal', 'oats', 'almonds', 'cashews',
+         'soap', 'shampoo', 'detergent', 'tissue', 'sponge', 'ketchup', 'mustard', 'vinegar', 'oil', 'spinach']
+VARIANTS = ['organic', 'fresh', 'whole', 'low fat', 'sugar free', 'gluten free', 'classic', 'premium',
+            'family pack', 'spicy', 'salted', 'unsalted', 'dark', 'toasted', 'frozen', 'smoked', 'sweet', 'natural']
+SIZES = ['100g', '250g', '500g', '1kg', '2kg', '250ml', '500ml', '1l', '2l', '6 pack', '12 pack']
+SYLLABLES = ['ka', 'lo', 'mi', 'ra', 'ven', 'to', 'sa', 'nu', 'bel', 'dor', 'fi', 'gro', 'pa', 'zen', 'ri', 'ta']
+
+
+def seed_catalog(db, count, batch_size=10000, seed=42):
+    """
+    Bulk insert ``count`` products with generated grocery names and SKUs,
+    last updated over the month before; returns the brand names used.
+    """
+    from app.models import Product
+    from app.utils.categories import rebuild_categories
+    rnd = random.Random(seed)
+    brands = sorted({''.join(rnd.sample(SYLLABLES, 3)).title() for _ in range(3000)})
+    added = datetime.utcnow() - timedelta(days=30)
+    for offset in range(0, count, batch_size):
+        rows = []
+        for i in range(offset, min(offset + batch_size, count)):
+            name = f'{rnd.choice(brands)} {rnd.choice(VARIANTS)} {rnd.choice(ITEMS)} {rnd.choice(SIZES)}'.title()
+            rows.append({
+                'name': name[:100],
+                'sku': f'SKU-{i:07d}',
+                'price': Decimal(rnd.randint(50, 5000)) / 100,
+                'stock_qty': rnd.randint(0, 200),
+                'category': rnd.choice(CATEGORIES),
+                'created_at': added + timedelta(seconds=i),
+                'updated_at': added + timedelta(seconds=i)
+            })
+        db.session.execute(insert(Product), rows)
+    # Bulk inserts bypass the ORM hook that counts products into their categories
+    rebuild_categories()
+    db.session.commit()
+    return brands
+
+
+def seed_orders(db, count, employee_ids, days=365, batch_size=50000, seed=42):
+    """Bulk insert ``count`` orders spread over the last ``days`` days (no items)."""
+    from app.models import Order
+    rnd = random.Random(seed)
+    now = datetime.utcnow()
+    for offset in range(0, count, batch_size):
+        rows = []
+        for _ in range(offset, min(offset + batch_size, count)):
+            total = Decimal(rnd.randint(100, 20000)) / 100
+            rows.append({
+                'created_at': now - timedelta(seconds=rnd.randint(0, days * 86400)),
+                'employee_id': rnd.choice(employee_ids),
+                'total_amount': total,
+                'tax_amount': (total * Decimal('0.085')).quantize(Decimal('0.01')),
+                'discount_amount': Decimal('0.00'),
+                'payment_method': rnd.choice(('cash', 'upi')),
+                'status': 'completed'
+            })
+        db.session.execute(insert(Order), rows)
+        db.session.commit()
+
+
+def seed_order_items(db, product_count, max_lines=4, batch_size=50000, seed=42):
+    """Bulk insert 1..``max_lines`` items for every seeded order; returns the item count."""
+    from app.models import Order, OrderItem
+    rnd = random.Random(seed)
+    order_ids = [order_id for (order_id,) in db.session.query(Order.id)]
+    rows = []
+    count = 0
+    for order_id in order_ids:
+        for product_id in rnd.sample(range(1, product_count + 1), rnd.randint(1, max_lines)):
+            quantity = rnd.randint(1, 5)
+            price = Decimal(rnd.randint(50, 5000)) / 100
+            rows.append({
+                'order_id': order_id,
+                'product_id': product_id,
+                'product_name_snapshot': f'Product {product_id}',
+                'unit_price_snapshot': price,
+                'quantity': quantity,
+                'line_total': price * quantity
+            })
+        if len(rows) >= batch_size:
+            db.session.execute(insert(OrderItem), rows)
+            count += len(rows)
+            rows = []
+    if rows:
+        db.session.execute(insert(OrderItem), rows)
+        count += len(rows)
+    db.session.commit()
+    return count
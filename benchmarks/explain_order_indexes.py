@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+"""
+Check with EXPLAIN that the hot order queries can use their indexes.
+
+Seeds a scratch database, asks the planner for the plan of each query the
+app runs against orders/order_items and checks that the expected index is
+chosen. Exits with status 1 if any check fails, so it can run in CI against
+SQLite (default) or MySQL (--db-url mysql+pymysql://...).
+
+    python benchmarks/explain_order_indexes.py
+"""
+import argparse
+import sys
+from datetime import datetime, timedelta
+
+from common import add_db_arguments, make_app, seed_users, seed_products, seed_orders, seed_order_items
+from sqlalchemy import select, func, desc, text
+
+
+def uses_index(plan, index_name):
+    """True if any plan row names ``index_name`` as the index being used."""
+    for row in plan:
+        if 'key' in row:  # MySQL: the chosen index, as opposed to possible_keys
+            if row['key'] == index_name:
+                return True
+        elif any(index_name in str(value) for value in row.values()):
+            return True
+    return False
+
+
+def plan_text(plan):
+    return '; '.join(' '.join(str(value) for value in row.values() if value is not None) for row in plan)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_db_arguments(parser)
+    parser.add_argument('--orders', type=int, default=50000, help='Number of orders to seed')
+    parser.add_argument('--products', type=int, default=500, help='Number of products to seed')
+    args = parser.parse_args()
+
+    app = make_app(args.db_url)
+    with app.app_context():
+        from app.models import db, Order, OrderItem
+        from app.utils.sql import explain
+
+        print(f'Seeding {args.products} products and {args.orders} orders with items...')
+        employee_ids = seed_users(db)
+        seed_products(db, args.products)
+        seed_orders(db, args.orders, employee_ids)
+        seed_order_items(db, args.products)
+        if db.engine.dialect.name == 'sqlite':
+            db.session.execute(text('ANALYZE'))
+        else:
+            db.session.execute(text('ANALYZE TABLE orders, order_items'))
+
+        day_start = datetime.combine(datetime.utcnow().date(), datetime.min.time())
+        day_end = day_start + timedelta(days=1)
+
+        checks = [
+            ('orders in a half-open date range',
+             select(Order).where(Order.created_at >= day_start, Order.created_at < day_end),
+             'ix_orders_created_at'),
+            ('most recent orders',
+             select(Order).order_by(desc(Order.created_at)).limit(10),
+             'ix_orders_created_at'),
+            ("one employee's order history",
+             select(Order).where(Order.employee_id == employee_ids[0])
+                          .order_by(desc(Order.created_at)).limit(20),
+             'ix_orders_employee_id_created_at'),
+            ("one employee's orders in a date range",
+             select(Order).where(Order.employee_id == employee_ids[0],
+                                 Order.created_at >= day_start, Order.created_at < day_end),
+             'ix_orders_employee_id_created_at'),
+            ('items of an order',
+             select(OrderItem).where(OrderItem.order_id == 1),
+             'ix_order_items_order_id'),
+            ('sales of one product',
+             select(func.sum(OrderItem.quantity)).where(OrderItem.product_id == 1),
+             'ix_order_items_product_id_order_id'),
+        ]
+
+        failures = 0
+        print('\nIndex usage:')
+        for label, statement, index_name in checks:
+            plan = explain(statement)
+            ok = uses_index(plan, index_name)
+            failures += not ok
+            print(f"  {'PASS' if ok else 'FAIL'}  {label:<40} expects {index_name}")
+            if not ok:
+                print(f'        plan: {plan_text(plan)}')
+
+        # For comparison: wrapping the column in DATE() hides it from the index
+        legacy = select(Order).where(func.date(Order.created_at) == day_start.date())
+        print(f'\n  Non-sargable DATE(created_at) = :day plan: {plan_text(explain(legacy))}')
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
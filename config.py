@@ -48,8 +48,53 @@ class Config:
     # Tax rate (in percentage)
     TAX_RATE = 8.5
 
-    # Pagination
+    # Cost as a fraction of selling price, used for products without a cost price
+    DEFAULT_COST_RATIO = 0.7
+
+    # Pagination: listings page by 'keyset' cursor (fast at any depth) or numbered 'offset'
+    # pages; the approximate total shown with keyset pages is cached for LISTING_TOTAL_TTL seconds
     ITEMS_PER_PAGE = 10
+    LISTING_PAGINATION = os.environ.get('LISTING_PAGINATION', 'keyset')
+    LISTING_TOTAL_TTL = 60
+
+    # Rows fetched per round-trip when streaming exports and backups
+    EXPORT_BATCH_SIZE = 1000
+    BACKUP_CHUNK_SIZE = 5000
+
+    # Bulk product import: rows per INSERT/commit, and where row error reports are kept
+    IMPORT_BATCH_SIZE = 1000
+    IMPORT_ERROR_DIR = os.environ.get('IMPORT_ERROR_DIR')  # default: <tmp>/gsms_import_errors
+
+    # Server-side carts: 'database' (cart_items table) or 'memory' (per process, development only)
+    CART_BACKEND = os.environ.get('CART_BACKEND', 'database')
+
+    # Stock held by a cart line, in seconds since its last change, and how often
+    # expired holds are deleted (0 disables the sweeper thread; see `flask expire-holds`)
+    STOCK_HOLD_TTL = int(os.environ.get('STOCK_HOLD_TTL', 900))
+    STOCK_HOLD_SWEEP_INTERVAL = int(os.environ.get('STOCK_HOLD_SWEEP_INTERVAL', 60))
+
+    # Orders accepted per upload from offline tills (POST /orders/api/batch)
+    ORDER_SYNC_MAX_BATCH = 1000
+
+    # Product search: 'index' (in-memory trigram index per worker), 'fulltext' (the database's
+    # FTS5/FULLTEXT index, ILIKE where there is none) or 'ilike' (scan the table); matches
+    # ranked per indexed search, and seconds before a worker picks up other workers' product edits
+    PRODUCT_SEARCH_BACKEND = os.environ.get('PRODUCT_SEARCH_BACKEND', 'index')
+    PRODUCT_SEARCH_MAX_RESULTS = 1000
+    PRODUCT_SEARCH_REFRESH = 30
+
+    # Employee product grid pages cached per worker (0 entries disables). Emptied when the worker
+    # writes products, recomputed after CATALOG_CACHE_TTL seconds; stock figures are re-read after
+    # CATALOG_CACHE_STOCK_TTL seconds, the most they can lag other workers' sales
+    CATALOG_CACHE_MAX_ENTRIES = 1024
+    CATALOG_CACHE_TTL = 60
+    CATALOG_CACHE_STOCK_TTL = int(os.environ.get('CATALOG_CACHE_STOCK_TTL', 5))
+
+    # Report cache: 'memory' (per worker), 'redis' (shared across workers) or 'none'
+    REPORT_CACHE_BACKEND = os.environ.get('REPORT_CACHE_BACKEND', 'memory')
+    REPORT_CACHE_URL = os.environ.get('REPORT_CACHE_URL')  # e.g. redis://localhost:6379/0
+    REPORT_CACHE_TTL = 300  # seconds
+    REPORT_CACHE_MAX_ENTRIES = 256
 
 
 class DevelopmentConfig(Config):
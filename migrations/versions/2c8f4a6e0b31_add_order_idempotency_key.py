@@ -0,0 +1,29 @@
+"""Add orders.idempotency_key so a resubmitted checkout returns its order
+
+Revision ID: 2c8f4a6e0b31
+Revises: e3a7c5b90d14
+Create Date: 2026-10-17 19:11:37.582916
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2c8f4a6e0b31'
+down_revision = 'e3a7c5b90d14'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing orders have no key; NULLs do not collide in the unique constraint
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('idempotency_key', sa.String(length=64), nullable=True))
+        batch_op.create_unique_constraint('uq_orders_idempotency_key', ['idempotency_key'])
+
+
+def downgrade():
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_orders_idempotency_key', type_='unique')
+        batch_op.drop_column('idempotency_key')
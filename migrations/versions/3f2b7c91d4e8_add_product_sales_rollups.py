@@ -0,0 +1,74 @@
+"""Add product_sales_daily and product_sales_stats rollup tables
+
+Revision ID: 3f2b7c91d4e8
+Revises: ba0e0540c390
+Create Date: 2026-10-17 13:26:08.412637
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from config import Config
+
+
+# revision identifiers, used by Alembic.
+revision = '3f2b7c91d4e8'
+down_revision = 'ba0e0540c390'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('product_sales_daily',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('units_sold', sa.Integer(), nullable=False),
+    sa.Column('revenue', sa.Numeric(precision=12, scale=2), nullable=False),
+    sa.Column('cost', sa.Numeric(precision=12, scale=2), nullable=False),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('product_id', 'day', name='uq_product_sales_daily_key')
+    )
+    with op.batch_alter_table('product_sales_daily', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_product_sales_daily_day'), ['day'], unique=False)
+
+    op.create_table('product_sales_stats',
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('units_sold', sa.Integer(), nullable=False),
+    sa.Column('revenue', sa.Numeric(precision=12, scale=2), nullable=False),
+    sa.Column('cost', sa.Numeric(precision=12, scale=2), nullable=False),
+    sa.Column('last_sold_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ),
+    sa.PrimaryKeyConstraint('product_id')
+    )
+
+    # Backfill from existing order items in set-based statements; items without
+    # a cost snapshot are costed at DEFAULT_COST_RATIO like the profit reports
+    item_cost = (
+        "oi.quantity * COALESCE(oi.unit_cost_snapshot, oi.unit_price_snapshot * {})"
+        .format(float(Config.DEFAULT_COST_RATIO))
+    )
+    op.execute(
+        "INSERT INTO product_sales_daily (product_id, day, units_sold, revenue, cost) "
+        "SELECT oi.product_id, DATE(o.created_at), SUM(oi.quantity), SUM(oi.line_total), "
+        "SUM({}) ".format(item_cost) +
+        "FROM order_items oi JOIN orders o ON o.id = oi.order_id "
+        "WHERE o.created_at IS NOT NULL "
+        "GROUP BY oi.product_id, DATE(o.created_at)"
+    )
+    op.execute(
+        "INSERT INTO product_sales_stats (product_id, units_sold, revenue, cost, last_sold_at) "
+        "SELECT oi.product_id, SUM(oi.quantity), SUM(oi.line_total), "
+        "SUM({}), MAX(o.created_at) ".format(item_cost) +
+        "FROM order_items oi JOIN orders o ON o.id = oi.order_id "
+        "GROUP BY oi.product_id"
+    )
+
+
+def downgrade():
+    op.drop_table('product_sales_stats')
+
+    with op.batch_alter_table('product_sales_daily', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_product_sales_daily_day'))
+
+    op.drop_table('product_sales_daily')
@@ -0,0 +1,29 @@
+"""Add products.sku for keying catalog imports
+
+Revision ID: 5e8a1c3d9f27
+Revises: a4c9e2f7b813
+Create Date: 2026-10-17 15:20:43.118502
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e8a1c3d9f27'
+down_revision = 'a4c9e2f7b813'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing products have no SKU; NULLs do not collide in the unique constraint
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('sku', sa.String(length=64), nullable=True))
+        batch_op.create_unique_constraint('uq_products_sku', ['sku'])
+
+
+def downgrade():
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_products_sku', type_='unique')
+        batch_op.drop_column('sku')
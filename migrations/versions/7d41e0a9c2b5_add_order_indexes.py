@@ -0,0 +1,36 @@
+"""Add indexes for date-ranged and per-employee/per-product order queries
+
+Revision ID: 7d41e0a9c2b5
+Revises: 3f2b7c91d4e8
+Create Date: 2026-10-17 14:02:51.730914
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7d41e0a9c2b5'
+down_revision = '3f2b7c91d4e8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_orders_created_at'), ['created_at'], unique=False)
+        batch_op.create_index('ix_orders_employee_id_created_at', ['employee_id', 'created_at'], unique=False)
+
+    with op.batch_alter_table('order_items', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_order_items_order_id'), ['order_id'], unique=False)
+        batch_op.create_index('ix_order_items_product_id_order_id', ['product_id', 'order_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('order_items', schema=None) as batch_op:
+        batch_op.drop_index('ix_order_items_product_id_order_id')
+        batch_op.drop_index(batch_op.f('ix_order_items_order_id'))
+
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.drop_index('ix_orders_employee_id_created_at')
+        batch_op.drop_index(batch_op.f('ix_orders_created_at'))
@@ -0,0 +1,35 @@
+"""Add cart_items for server-side carts
+
+Revision ID: 9b6d2e4f1a08
+Revises: 5e8a1c3d9f27
+Create Date: 2026-10-17 16:42:19.305871
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9b6d2e4f1a08'
+down_revision = '5e8a1c3d9f27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Carts held in session cookies are moved in on each employee's next request
+    op.create_table('cart_items',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'product_id', name='uq_cart_items_user_product')
+    )
+
+
+def downgrade():
+    op.drop_table('cart_items')
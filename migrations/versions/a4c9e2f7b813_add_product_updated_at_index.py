@@ -0,0 +1,30 @@
+"""Index products.updated_at for incremental backups
+
+Incremental backups select the products changed since the previous backup's
+high-water mark and read that mark as MAX(updated_at); the search index's
+refresh of recently changed products uses the same range.
+
+Revision ID: a4c9e2f7b813
+Revises: 7d41e0a9c2b5
+Create Date: 2026-10-17 21:02:14.306518
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4c9e2f7b813'
+down_revision = '7d41e0a9c2b5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_products_updated_at'), ['updated_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_products_updated_at'))
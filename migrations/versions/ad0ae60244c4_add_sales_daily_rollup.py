@@ -0,0 +1,53 @@
+"""Add sales_daily rollup table
+
+Revision ID: ad0ae60244c4
+Revises: c6ffeea9d528
+Create Date: 2026-10-17 09:12:41.518203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'ad0ae60244c4'
+down_revision = 'c6ffeea9d528'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('sales_daily',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('payment_method', sa.String(length=20), nullable=False),
+    sa.Column('employee_id', sa.Integer(), nullable=False),
+    sa.Column('order_count', sa.Integer(), nullable=False),
+    sa.Column('gross_amount', sa.Numeric(precision=12, scale=2), nullable=False),
+    sa.Column('tax_amount', sa.Numeric(precision=12, scale=2), nullable=False),
+    sa.Column('discount_amount', sa.Numeric(precision=12, scale=2), nullable=False),
+    sa.ForeignKeyConstraint(['employee_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('day', 'payment_method', 'employee_id', name='uq_sales_daily_key')
+    )
+    with op.batch_alter_table('sales_daily', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_sales_daily_day'), ['day'], unique=False)
+        batch_op.create_index(batch_op.f('ix_sales_daily_employee_id'), ['employee_id'], unique=False)
+
+    # Backfill from existing orders in a single set-based statement
+    op.execute(
+        "INSERT INTO sales_daily (day, payment_method, employee_id, order_count, "
+        "gross_amount, tax_amount, discount_amount) "
+        "SELECT DATE(created_at), payment_method, employee_id, COUNT(id), "
+        "SUM(total_amount), SUM(tax_amount), SUM(discount_amount) "
+        "FROM orders WHERE created_at IS NOT NULL "
+        "GROUP BY DATE(created_at), payment_method, employee_id"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('sales_daily', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_sales_daily_employee_id'))
+        batch_op.drop_index(batch_op.f('ix_sales_daily_day'))
+
+    op.drop_table('sales_daily')
@@ -0,0 +1,59 @@
+"""Add a full-text index over product name, category and SKU
+
+FULLTEXT index on MySQL; on SQLite an external-content FTS5 table kept in
+step with products by triggers. Other databases are left alone and search
+with ILIKE.
+
+Revision ID: b8e1d5c3a0f9
+Revises: 2c8f4a6e0b31
+Create Date: 2026-10-17 22:34:51.118203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8e1d5c3a0f9'
+down_revision = '2c8f4a6e0b31'
+branch_labels = None
+depends_on = None
+
+
+SQLITE_FTS = [
+    "CREATE VIRTUAL TABLE products_fts USING fts5("
+    "name, category, sku, content='products', content_rowid='id', prefix='2 3')",
+    "CREATE TRIGGER products_fts_insert AFTER INSERT ON products BEGIN "
+    "INSERT INTO products_fts (rowid, name, category, sku) VALUES (new.id, new.name, new.category, new.sku); END",
+    "CREATE TRIGGER products_fts_delete AFTER DELETE ON products BEGIN "
+    "INSERT INTO products_fts (products_fts, rowid, name, category, sku) "
+    "VALUES ('delete', old.id, old.name, old.category, old.sku); END",
+    "CREATE TRIGGER products_fts_update AFTER UPDATE OF name, category, sku ON products BEGIN "
+    "INSERT INTO products_fts (products_fts, rowid, name, category, sku) "
+    "VALUES ('delete', old.id, old.name, old.category, old.sku); "
+    "INSERT INTO products_fts (rowid, name, category, sku) VALUES (new.id, new.name, new.category, new.sku); END",
+]
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'mysql':
+        # Built from the existing rows as part of the ALTER
+        op.create_index('ft_products_search', 'products', ['name', 'category', 'sku'], mysql_prefix='FULLTEXT')
+    elif bind.dialect.name == 'sqlite':
+        if not bind.exec_driver_sql("SELECT sqlite_compileoption_used('ENABLE_FTS5')").scalar():
+            return
+        for statement in SQLITE_FTS:
+            op.execute(statement)
+        # Index the existing products in one pass
+        op.execute("INSERT INTO products_fts (products_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'mysql':
+        op.drop_index('ft_products_search', table_name='products')
+    elif bind.dialect.name == 'sqlite':
+        for trigger in ('products_fts_insert', 'products_fts_delete', 'products_fts_update'):
+            op.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+        op.execute('DROP TABLE IF EXISTS products_fts')
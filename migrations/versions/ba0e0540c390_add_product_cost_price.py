@@ -0,0 +1,33 @@
+"""Add products.cost_price and order_items.unit_cost_snapshot
+
+Revision ID: ba0e0540c390
+Revises: ad0ae60244c4
+Create Date: 2026-10-17 11:03:27.904115
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'ba0e0540c390'
+down_revision = 'ad0ae60244c4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('cost_price', sa.Numeric(precision=10, scale=2), nullable=True))
+
+    # Existing order items keep a NULL cost; reports fall back to DEFAULT_COST_RATIO
+    with op.batch_alter_table('order_items', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('unit_cost_snapshot', sa.Numeric(precision=10, scale=2), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('order_items', schema=None) as batch_op:
+        batch_op.drop_column('unit_cost_snapshot')
+
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.drop_column('cost_price')
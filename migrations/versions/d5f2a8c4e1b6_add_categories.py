@@ -0,0 +1,83 @@
+"""Add categories table with maintained totals and products.category_id
+
+Revision ID: d5f2a8c4e1b6
+Revises: b8e1d5c3a0f9
+Create Date: 2026-10-17 23:41:07.582913
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5f2a8c4e1b6'
+down_revision = 'b8e1d5c3a0f9'
+branch_labels = None
+depends_on = None
+
+
+# On SQLite, batch mode rebuilds products as a copy and drops its triggers,
+# among them the ones keeping the FTS5 index in step (b8e1d5c3a0f9)
+SQLITE_FTS_TRIGGERS = [
+    "CREATE TRIGGER products_fts_insert AFTER INSERT ON products BEGIN "
+    "INSERT INTO products_fts (rowid, name, category, sku) VALUES (new.id, new.name, new.category, new.sku); END",
+    "CREATE TRIGGER products_fts_delete AFTER DELETE ON products BEGIN "
+    "INSERT INTO products_fts (products_fts, rowid, name, category, sku) "
+    "VALUES ('delete', old.id, old.name, old.category, old.sku); END",
+    "CREATE TRIGGER products_fts_update AFTER UPDATE OF name, category, sku ON products BEGIN "
+    "INSERT INTO products_fts (products_fts, rowid, name, category, sku) "
+    "VALUES ('delete', old.id, old.name, old.category, old.sku); "
+    "INSERT INTO products_fts (rowid, name, category, sku) VALUES (new.id, new.name, new.category, new.sku); END",
+]
+
+
+def restore_sqlite_fts():
+    """Re-create the full-text triggers after a batch rebuild of products, and reindex."""
+    bind = op.get_bind()
+    if bind.dialect.name != 'sqlite' or not bind.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'products_fts'").scalar():
+        return
+    for trigger in ('products_fts_insert', 'products_fts_delete', 'products_fts_update'):
+        op.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+    for statement in SQLITE_FTS_TRIGGERS:
+        op.execute(statement)
+    op.execute("INSERT INTO products_fts (products_fts) VALUES ('rebuild')")
+
+
+def upgrade():
+    op.create_table('categories',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('product_count', sa.Integer(), nullable=False),
+    sa.Column('stock_units', sa.Integer(), nullable=False),
+    sa.Column('stock_value', sa.Numeric(precision=14, scale=2), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('category_id', sa.Integer(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_products_category_id'), ['category_id'], unique=False)
+        batch_op.create_foreign_key('fk_products_category_id_categories', 'categories', ['category_id'], ['id'])
+    restore_sqlite_fts()
+
+    # Backfill from the existing category strings in two set-based statements:
+    # one row per distinct name with its totals, then every product's id
+    op.execute(
+        "INSERT INTO categories (name, product_count, stock_units, stock_value) "
+        "SELECT category, COUNT(id), COALESCE(SUM(stock_qty), 0), COALESCE(SUM(price * stock_qty), 0) "
+        "FROM products GROUP BY category"
+    )
+    op.execute(
+        "UPDATE products SET category_id = "
+        "(SELECT categories.id FROM categories WHERE categories.name = products.category)"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_products_category_id_categories', type_='foreignkey')
+        batch_op.drop_index(batch_op.f('ix_products_category_id'))
+        batch_op.drop_column('category_id')
+    restore_sqlite_fts()
+
+    op.drop_table('categories')
@@ -0,0 +1,42 @@
+"""Add stock_holds for cart reservations
+
+Revision ID: e3a7c5b90d14
+Revises: 9b6d2e4f1a08
+Create Date: 2026-10-17 17:58:02.640193
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e3a7c5b90d14'
+down_revision = '9b6d2e4f1a08'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing cart lines get no hold; they are held again when next changed
+    op.create_table('stock_holds',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'product_id', name='uq_stock_holds_user_product')
+    )
+    with op.batch_alter_table('stock_holds', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_stock_holds_expires_at'), ['expires_at'], unique=False)
+        batch_op.create_index('ix_stock_holds_product_expires', ['product_id', 'expires_at', 'quantity'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('stock_holds', schema=None) as batch_op:
+        batch_op.drop_index('ix_stock_holds_product_expires')
+        batch_op.drop_index(batch_op.f('ix_stock_holds_expires_at'))
+
+    op.drop_table('stock_holds')
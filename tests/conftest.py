@@ -0,0 +1,35 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app  # noqa: E402
+from config import Config  # noqa: E402
+
+
+@pytest.fixture
+def app(tmp_path):
+    """App on a throwaway SQLite database with an admin and an employee."""
+    class TestConfig(Config):
+        TESTING = True
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{tmp_path / "test.db"}'
+        STOCK_HOLD_SWEEP_INTERVAL = 0
+
+    app = create_app(TestConfig)
+    from app.models import db, User
+    with app.app_context():
+        db.create_all()
+        for username, role in (('admin', 'admin'), ('till', 'employee')):
+            user = User(username=username, role=role)
+            user.set_password('secret')
+            db.session.add(user)
+        db.session.commit()
+        yield app
+        db.session.remove()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
@@ -0,0 +1,59 @@
+import json
+import os
+
+from app.models import db, Order
+from app.utils.backup import create_backup
+
+
+def add_order(order_id):
+    db.session.add(Order(id=order_id, employee_id=2, total_amount=1, tax_amount=0, payment_method='cash'))
+    db.session.commit()
+
+
+def backed_up_ids(directory, entry, table):
+    ids, current = [], None
+    with open(os.path.join(directory, entry['file'])) as f:
+        for line in f:
+            record = json.loads(line)
+            if isinstance(record, dict):
+                current = record.get('name')
+            elif current == table:
+                ids.append(record[0])
+    return ids
+
+
+def test_incremental_picks_up_rows_committed_below_the_mark(app, tmp_path):
+    for order_id in (1, 2, 3, 5):
+        add_order(order_id)
+    full = create_backup(str(tmp_path))
+    # Order 4 was still being written when the marks were read
+    assert full['watermarks']['orders'] == 5
+    assert full['holes']['orders'] == [[4, 4]]
+
+    add_order(4)
+    add_order(6)
+    incremental = create_backup(str(tmp_path), incremental=True)
+    assert backed_up_ids(str(tmp_path), incremental, 'orders') == [4, 6]
+    assert incremental['holes']['orders'] == []
+
+
+def test_download_leaves_out_password_hashes_unless_asked(app, client):
+    with client.session_transaction() as session:
+        session['_user_id'] = '1'
+        session['_fresh'] = True
+
+    plain = client.get('/admin/backup/download?gzip=0').get_data(as_text=True)
+    assert 'password_hash' not in plain and 'pbkdf2' not in plain and 'scrypt' not in plain
+    full = client.get('/admin/backup/download?gzip=0&credentials=1').get_data(as_text=True)
+    assert '"password_hash"' in full
+
+
+def test_users_restored_without_hashes_cannot_log_in(app):
+    from app.models import User
+    from app.utils.backup import backup_chunks, restore_backup
+
+    data = ''.join(backup_chunks(credentials=False))
+    restore_backup(data.splitlines(True), truncate=True)
+    users = User.query.all()
+    assert len(users) == 2
+    assert not any(user.check_password('secret') for user in users)
@@ -0,0 +1,23 @@
+from app.models import db, Product
+from app.utils import catalog_cache as catalog_cache_module
+from app.utils.catalog_cache import catalog_cache
+
+
+def test_stock_is_never_older_than_stock_ttl(app, monkeypatch):
+    db.session.add(Product(name='Milk', category='dairy', price=2, stock_qty=10))
+    db.session.commit()
+    clock = [1000.0]
+    monkeypatch.setattr(catalog_cache_module.time, 'monotonic', lambda: clock[0])
+    catalog_cache.clear()
+
+    def get():
+        page = catalog_cache.get_page(('', '', 1, None), lambda: Product.query.paginate(page=1, per_page=10))
+        return page.items[0].stock_qty
+
+    assert get() == 10
+    # Another worker sells: no session event reaches this worker's cache
+    with db.engine.begin() as conn:
+        conn.execute(db.update(Product.__table__).values(stock_qty=3))
+    assert get() == 10
+    clock[0] += catalog_cache.stock_ttl
+    assert get() == 3
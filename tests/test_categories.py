@@ -0,0 +1,26 @@
+from decimal import Decimal
+
+from app.models import db, Category, Product
+
+
+def totals(name):
+    category = Category.query.filter_by(name=name).one()
+    return category.product_count, category.stock_units, category.stock_value
+
+
+def test_edit_after_commit_moves_totals(app):
+    product = Product(name='Milk', category='dairy', price=Decimal('2.00'), stock_qty=10)
+    db.session.add(product)
+    db.session.commit()
+    assert totals('dairy') == (1, 10, Decimal('20.00'))
+
+    # Attributes expired by the commit, then assigned without being read
+    product.price = Decimal('3.00')
+    product.stock_qty = 4
+    db.session.commit()
+    assert totals('dairy') == (1, 4, Decimal('12.00'))
+
+    product.category = 'fridge'
+    db.session.commit()
+    assert totals('dairy') == (0, 0, Decimal('0.00'))
+    assert totals('fridge') == (1, 4, Decimal('12.00'))
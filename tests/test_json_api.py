@@ -0,0 +1,43 @@
+from app.models import db, Product
+
+
+def login(client, username):
+    """Log in as a machine client would: fetch a token, post the login form with it."""
+    token = client.get('/csrf-token').get_json()['csrf_token']
+    response = client.post('/login', data={'username': username, 'password': 'secret', 'csrf_token': token})
+    assert response.status_code == 302
+    return {'X-CSRFToken': token}
+
+
+def add_product(stock_qty=10):
+    product = Product(name='Milk', category='dairy', price=2, stock_qty=stock_qty)
+    db.session.add(product)
+    db.session.commit()
+    return product.id
+
+
+def test_batch_orders_need_csrf_token(app, client):
+    product_id = add_product()
+    headers = login(client, 'till')
+    batch = {'orders': [{'client_id': 'till1-1', 'created_at': '2026-01-05T09:15:00Z',
+                         'payment_method': 'cash', 'items': [{'product_id': product_id, 'quantity': 2}]}]}
+
+    assert client.post('/orders/api/batch', json=batch).status_code == 400
+
+    response = client.post('/orders/api/batch', json=batch, headers=headers)
+    assert response.status_code == 200
+    assert response.get_json()['created'] == 1
+    assert db.session.get(Product, product_id).stock_qty == 8
+
+
+def test_stock_adjustments_need_csrf_token(app, client):
+    product_id = add_product()
+    headers = login(client, 'admin')
+    body = {'adjustments': [{'product_id': product_id, 'change': '+5'}]}
+
+    assert client.post('/admin/api/stock-adjustments', json=body).status_code == 400
+
+    response = client.post('/admin/api/stock-adjustments', json=body, headers=headers)
+    assert response.status_code == 200
+    assert response.get_json()['applied'] == 1
+    assert db.session.get(Product, product_id).stock_qty == 15
@@ -0,0 +1,31 @@
+from app.models import db, Order, Product
+from app.utils import order_sync
+
+
+def test_concurrent_upload_reports_duplicates(app, monkeypatch):
+    product = Product(name='Milk', category='dairy', price=2, stock_qty=10)
+    db.session.add(product)
+    db.session.commit()
+    product_id = product.id
+    batch = [{'client_id': f'till1-{number}', 'created_at': '2026-01-05T09:15:00Z', 'payment_method': 'cash',
+              'items': [{'product_id': product_id, 'quantity': 1}]} for number in (1, 2)]
+
+    # Another request commits till1-1 after this one probed the keys
+    decrement = order_sync.decrement_stock_many
+    raced = []
+
+    def racing_decrement(quantities):
+        if not raced:
+            raced.append(True)
+            with db.engine.begin() as conn:
+                conn.execute(db.insert(Order.__table__).values(
+                    idempotency_key='till1-1', employee_id=2, total_amount=2, tax_amount=0,
+                    discount_amount=0, payment_method='cash', status='completed'))
+        return decrement(quantities)
+
+    monkeypatch.setattr(order_sync, 'decrement_stock_many', racing_decrement)
+    results = order_sync.sync_orders(batch, employee_id=2)
+
+    assert [result['status'] for result in results] == ['duplicate', 'created']
+    assert Order.query.count() == 2
+    assert db.session.get(Product, product_id).stock_qty == 9
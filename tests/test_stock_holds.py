@@ -0,0 +1,35 @@
+from app.models import db, Product, StockHold
+from app.utils.reservations import hold_stock
+from app.utils.stock import decrement_stock
+
+
+def add_product(stock_qty=10):
+    product = Product(name='Milk', category='dairy', price=2, stock_qty=stock_qty)
+    db.session.add(product)
+    db.session.commit()
+    return product.id
+
+
+def test_checkout_cannot_take_units_other_carts_hold(app):
+    product_id = add_product()
+    hold_stock(1, product_id, 8)
+    db.session.commit()
+
+    assert not decrement_stock({product_id: 5}, holder=2)
+    db.session.rollback()
+    assert decrement_stock({product_id: 2}, holder=2)
+    assert decrement_stock({product_id: 8}, holder=1)
+    db.session.commit()
+    assert db.session.get(Product, product_id).stock_qty == 0
+
+
+def test_legacy_session_cart_is_held(app, client):
+    product_id = add_product()
+    with client.session_transaction() as session:
+        session['_user_id'] = '2'
+        session['_fresh'] = True
+        session['cart'] = {str(product_id): 3}
+
+    assert client.get('/employee/cart').status_code == 200
+    hold = db.session.scalars(db.select(StockHold)).one()
+    assert (hold.user_id, hold.product_id, hold.quantity) == (2, product_id, 3)